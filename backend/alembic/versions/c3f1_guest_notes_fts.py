@@ -0,0 +1,75 @@
+"""guest_notes table + full-text search (FTS5 on SQLite, tsvector/GIN on Postgres)"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c3f1_guest_notes_fts"
+down_revision = "9b1a_add_tenant"
+branch_labels = None
+depends_on = None
+
+# search objects as of this revision (a snapshot of app/search.py): table -> indexed column
+SOURCES = {"incidents": "title", "guest_notes": "note"}
+
+
+def _sqlite_ddl(table, col):
+    fts = f"{table}_fts"
+    ins = f"INSERT INTO {fts}(rowid, {col}, tenant_id) VALUES (new.id, new.{col}, new.tenant_id);"
+    dele = (
+        f"INSERT INTO {fts}({fts}, rowid, {col}, tenant_id) "
+        f"VALUES ('delete', old.id, old.{col}, old.tenant_id);"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{col}, tenant_id UNINDEXED, content='{table}', content_rowid='id', tokenize='unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {ins} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {dele} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col}, tenant_id ON {table} BEGIN {dele} {ins} END",
+    ]
+
+
+def _postgres_ddl(table, col):
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('simple', coalesce({col}, ''))) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_tsv ON {table} USING GIN (search_tsv)",
+    ]
+
+
+def upgrade():
+    op.create_table(
+        "guest_notes",
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("tenant_id", sa.String(length=64), nullable=False),
+        sa.Column("guest_name", sa.String(length=160), nullable=False),
+        sa.Column("room", sa.String(length=20), nullable=True),
+        sa.Column("note", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_guest_notes_id", "guest_notes", ["id"])
+    op.create_index("ix_guest_notes_tenant_id", "guest_notes", ["tenant_id"])
+    op.create_index("ix_guest_notes_created_at", "guest_notes", ["created_at"])
+    op.create_index("ix_guest_notes_tenant_created", "guest_notes", ["tenant_id", "created_at"])
+
+    bind = op.get_bind()
+    for table, col in SOURCES.items():
+        if bind.dialect.name == "sqlite":
+            for stmt in _sqlite_ddl(table, col):
+                bind.exec_driver_sql(stmt)
+            bind.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")  # existing incidents
+        elif bind.dialect.name == "postgresql":
+            for stmt in _postgres_ddl(table, col):
+                bind.exec_driver_sql(stmt)
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table in SOURCES:
+        if bind.dialect.name == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                bind.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            bind.exec_driver_sql(f"DROP TABLE IF EXISTS {table}_fts")
+        elif bind.dialect.name == "postgresql":
+            bind.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{table}_search_tsv")
+            bind.exec_driver_sql(f"ALTER TABLE IF EXISTS {table} DROP COLUMN IF EXISTS search_tsv")
+    op.drop_table("guest_notes")
@@ -0,0 +1,75 @@
+"""normalized handover_top_sales table (replaces parsing handovers.top_sales)"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "d4a7_handover_top_sales"
+down_revision = "c3f1_guest_notes_fts"
+branch_labels = None
+depends_on = None
+
+
+def _parse_top_sales(value):
+    """Snapshot of models.parse_top_sales: list, (double-)encoded JSON list or comma-joined text."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return []
+        try:
+            decoded = json.loads(text)
+        except ValueError:
+            return [p.strip() for p in text.split(",") if p.strip()]
+        if isinstance(decoded, str) and decoded != text:
+            return _parse_top_sales(decoded)
+        value = decoded if isinstance(decoded, list) else [decoded]
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return [str(v).strip() for v in value if v is not None and str(v).strip()]
+
+
+def _backfill_from_legacy(bind, top_sales, batch_size=1000):
+    """Copy items out of a legacy handovers.top_sales column, if the table has one."""
+    if "top_sales" not in {c["name"] for c in sa.inspect(bind).get_columns("handovers")}:
+        return
+    handovers = sa.table("handovers", sa.column("id"), sa.column("tenant_id"), sa.column("date", sa.Date),
+                         sa.column("top_sales"))
+    rows = bind.execute(
+        sa.select(handovers.c.id, handovers.c.tenant_id, handovers.c.date, handovers.c.top_sales)
+        .where(handovers.c.top_sales.isnot(None))
+    )
+    pending = []
+    for hid, tenant, day, raw in rows:
+        pending.extend({"handover_id": hid, "tenant_id": tenant, "date": day, "item": item}
+                       for item in _parse_top_sales(raw))
+        if len(pending) >= batch_size:
+            bind.execute(sa.insert(top_sales), pending)
+            pending = []
+    if pending:
+        bind.execute(sa.insert(top_sales), pending)
+
+
+def upgrade():
+    top_sales = op.create_table(
+        "handover_top_sales",
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("handover_id", sa.Integer(), sa.ForeignKey("handovers.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("tenant_id", sa.String(length=64), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("item", sa.String(length=160), nullable=False),
+    )
+    op.create_index("ix_handover_top_sales_handover_id", "handover_top_sales", ["handover_id"])
+    op.create_index(
+        "ix_handover_top_sales_tenant_item_date", "handover_top_sales", ["tenant_id", "item", "date"]
+    )
+
+    _backfill_from_legacy(op.get_bind(), top_sales)
+
+
+def downgrade():
+    op.drop_index("ix_handover_top_sales_tenant_item_date", table_name="handover_top_sales")
+    op.drop_index("ix_handover_top_sales_handover_id", table_name="handover_top_sales")
+    op.drop_table("handover_top_sales")
@@ -0,0 +1,26 @@
+"""covering indexes so common ?fields= list projections are index-only"""
+
+from alembic import op
+
+revision = "e5b2_covering_list_indexes"
+down_revision = "d4a7_handover_top_sales"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the two-column version was only declared in models.py (create_all), so may be missing
+    op.drop_index("ix_handovers_tenant_date", table_name="handovers", if_exists=True)
+    op.create_index(
+        "ix_handovers_tenant_date", "handovers", ["tenant_id", "date", "outlet", "shift", "covers"]
+    )
+    # keyed on id so the newest-first list needs no sort; status is filtered inside the index
+    op.create_index(
+        "ix_incidents_tenant_list", "incidents", ["tenant_id", "id", "status", "severity", "title"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_incidents_tenant_list", table_name="incidents")
+    # no earlier revision creates the two-column index, so there is nothing to restore
+    op.drop_index("ix_handovers_tenant_date", table_name="handovers")
@@ -0,0 +1,107 @@
+"""change_log outbox + consumer checkpoints, filled by triggers"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "f6c3_change_log"
+down_revision = "e5b2_covering_list_indexes"
+branch_labels = None
+depends_on = None
+
+# captured tables and their columns at this revision: the SQLite triggers name
+# every column, so they must not follow the models at HEAD
+CAPTURED_COLUMNS = {
+    "handovers": ("id", "tenant_id", "date", "outlet", "shift", "covers"),
+    "incidents": ("id", "tenant_id", "outlet", "severity", "title", "status", "created_at"),
+    "sale_items": ("id", "tenant_id", "name", "qty", "sold_on"),
+    "revenue_entries": ("id", "tenant_id", "outlet", "category", "amount_cents", "occurred_at", "description"),
+}
+
+# capture objects as of this revision (a snapshot of app/outbox.py)
+_OPS = (("ai", "INSERT", "I"), ("au", "UPDATE", "U"), ("ad", "DELETE", "D"))
+
+_PG_FUNCTION = """
+CREATE OR REPLACE FUNCTION change_log_capture() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO change_log (tenant_id, table_name, op, row_id, new_data)
+        VALUES (NEW.tenant_id, TG_TABLE_NAME, 'I', NEW.id, (to_jsonb(NEW) - 'search_tsv')::text);
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data, new_data)
+        VALUES (NEW.tenant_id, TG_TABLE_NAME, 'U', NEW.id,
+                (to_jsonb(OLD) - 'search_tsv')::text, (to_jsonb(NEW) - 'search_tsv')::text);
+        RETURN NEW;
+    END IF;
+    INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data)
+    VALUES (OLD.tenant_id, TG_TABLE_NAME, 'D', OLD.id, (to_jsonb(OLD) - 'search_tsv')::text);
+    RETURN OLD;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def _sqlite_image(columns, ref):
+    return "json_object(" + ", ".join(f"'{c}', {ref}.{c}" for c in columns) + ")"
+
+
+def _sqlite_ddl(name, columns):
+    stmts = []
+    for suffix, event_name, op_code in _OPS:
+        ref = "old" if op_code == "D" else "new"
+        old = _sqlite_image(columns, "old") if op_code != "I" else "NULL"
+        new = _sqlite_image(columns, "new") if op_code != "D" else "NULL"
+        stmts.append(
+            f"CREATE TRIGGER IF NOT EXISTS change_log_{name}_{suffix} AFTER {event_name} ON {name} BEGIN "
+            f"INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data, new_data) "
+            f"VALUES ({ref}.tenant_id, '{name}', '{op_code}', {ref}.id, {old}, {new}); END"
+        )
+    return stmts
+
+
+def upgrade():
+    op.create_table(
+        "change_log",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True, autoincrement=True),
+        sa.Column("tenant_id", sa.String(length=64), nullable=False),
+        sa.Column("table_name", sa.String(length=40), nullable=False),
+        sa.Column("op", sa.String(length=1), nullable=False),
+        sa.Column("row_id", sa.Integer(), nullable=False),
+        sa.Column("old_data", sa.Text(), nullable=True),
+        sa.Column("new_data", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+    )
+    op.create_index("ix_change_log_tenant_id", "change_log", ["tenant_id", "id"])
+    op.create_table(
+        "change_consumers",
+        sa.Column("name", sa.String(length=80), primary_key=True),
+        sa.Column("position", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        bind.exec_driver_sql(_PG_FUNCTION)
+    for name, columns in CAPTURED_COLUMNS.items():
+        if bind.dialect.name == "sqlite":
+            for stmt in _sqlite_ddl(name, columns):
+                bind.exec_driver_sql(stmt)
+        elif bind.dialect.name == "postgresql":
+            bind.exec_driver_sql(
+                f"CREATE TRIGGER change_log_{name} AFTER INSERT OR UPDATE OR DELETE ON {name} "
+                f"FOR EACH ROW EXECUTE FUNCTION change_log_capture()"
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    for name in CAPTURED_COLUMNS:
+        if bind.dialect.name == "sqlite":
+            for suffix, _, _ in _OPS:
+                bind.exec_driver_sql(f"DROP TRIGGER IF EXISTS change_log_{name}_{suffix}")
+        elif bind.dialect.name == "postgresql":
+            bind.exec_driver_sql(f"DROP TRIGGER IF EXISTS change_log_{name} ON {name}")
+    if bind.dialect.name == "postgresql":
+        bind.exec_driver_sql("DROP FUNCTION IF EXISTS change_log_capture()")
+    op.drop_table("change_consumers")
+    op.drop_index("ix_change_log_tenant_id", table_name="change_log")
+    op.drop_table("change_log")
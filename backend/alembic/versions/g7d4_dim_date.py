@@ -0,0 +1,111 @@
+"""dim_date calendar table (ISO weeks, months, fiscal periods, holidays)"""
+
+import os
+from datetime import date, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "g7d4_dim_date"
+down_revision = "f6c3_change_log"
+branch_labels = None
+depends_on = None
+
+# calendar fill as of this revision (a snapshot of app/dimdate.py)
+DIM_DATE_START = date.fromisoformat(os.getenv("DIM_DATE_START") or "2015-01-01")
+DIM_DATE_END = date.fromisoformat(os.getenv("DIM_DATE_END") or "2035-12-31")
+FISCAL_YEAR_START_MONTH = int(os.getenv("FISCAL_YEAR_START_MONTH") or 1)
+
+
+def _easter(year):
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _holidays(year):
+    easter = _easter(year)
+    out = {
+        date(year, 1, 1): "New Year's Day",
+        easter - timedelta(days=2): "Good Friday",
+        easter + timedelta(days=1): "Easter Monday",
+        date(year, 12, 25): "Christmas Day",
+        date(year, 12, 26): "Boxing Day",
+    }
+    for entry in (os.getenv("EXTRA_HOLIDAYS") or "").split(","):
+        when, _, name = entry.strip().partition(":")
+        if not when:
+            continue
+        day = date(year, int(when[:2]), int(when[3:])) if len(when) == 5 else date.fromisoformat(when)
+        if day.year == year:
+            out[day] = name.strip() or "Holiday"
+    return out
+
+
+def _rows(start, end):
+    hol = {}
+    for y in range(start.year, end.year + 1):
+        hol.update(_holidays(y))
+    d = start
+    while d <= end:
+        iso_year, iso_week, iso_day = d.isocalendar()
+        fp = (d.month - FISCAL_YEAR_START_MONTH) % 12 + 1
+        fy = d.year + 1 if FISCAL_YEAR_START_MONTH > 1 and d.month >= FISCAL_YEAR_START_MONTH else d.year
+        yield {
+            "date": d,
+            "next_day": d + timedelta(days=1),
+            "year": d.year,
+            "quarter": (d.month - 1) // 3 + 1,
+            "month": d.month,
+            "month_label": f"{d.year}-{d.month:02d}",
+            "iso_year": iso_year,
+            "iso_week": iso_week,
+            "iso_week_label": f"{iso_year}-W{iso_week:02d}",
+            "week_start": d - timedelta(days=iso_day - 1),
+            "weekday": iso_day - 1,
+            "is_weekend": iso_day >= 6,
+            "fiscal_year": fy,
+            "fiscal_quarter": (fp - 1) // 3 + 1,
+            "fiscal_period": fp,
+            "fiscal_label": f"FY{fy}-P{fp:02d}",
+            "is_holiday": d in hol,
+            "holiday_name": hol.get(d),
+        }
+        d += timedelta(days=1)
+
+
+def upgrade():
+    dim_date = op.create_table(
+        "dim_date",
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("next_day", sa.Date(), nullable=False),
+        sa.Column("year", sa.SmallInteger(), nullable=False),
+        sa.Column("quarter", sa.SmallInteger(), nullable=False),
+        sa.Column("month", sa.SmallInteger(), nullable=False),
+        sa.Column("month_label", sa.String(length=7), nullable=False),
+        sa.Column("iso_year", sa.SmallInteger(), nullable=False),
+        sa.Column("iso_week", sa.SmallInteger(), nullable=False),
+        sa.Column("iso_week_label", sa.String(length=8), nullable=False),
+        sa.Column("week_start", sa.Date(), nullable=False),
+        sa.Column("weekday", sa.SmallInteger(), nullable=False),
+        sa.Column("is_weekend", sa.Boolean(), nullable=False),
+        sa.Column("fiscal_year", sa.SmallInteger(), nullable=False),
+        sa.Column("fiscal_quarter", sa.SmallInteger(), nullable=False),
+        sa.Column("fiscal_period", sa.SmallInteger(), nullable=False),
+        sa.Column("fiscal_label", sa.String(length=10), nullable=False),
+        sa.Column("is_holiday", sa.Boolean(), nullable=False),
+        sa.Column("holiday_name", sa.String(length=60), nullable=True),
+    )
+
+    op.bulk_insert(dim_date, list(_rows(DIM_DATE_START, DIM_DATE_END)))
+
+
+def downgrade():
+    op.drop_table("dim_date")
@@ -0,0 +1,86 @@
+"""incident status-transition timestamps + SLA covering index"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "h8e5_incident_status_times"
+down_revision = "g7d4_dim_date"
+branch_labels = None
+depends_on = None
+
+
+# incidents columns before and after this revision (change-log triggers list them)
+INCIDENT_COLUMNS = ("id", "tenant_id", "outlet", "severity", "title", "status", "created_at")
+INCIDENT_COLUMNS_NEW = INCIDENT_COLUMNS + ("status_changed_at", "resolved_at")
+
+# incidents_fts sync triggers as c3f1_guest_notes_fts created them
+_FTS_INS = "INSERT INTO incidents_fts(rowid, title, tenant_id) VALUES (new.id, new.title, new.tenant_id);"
+_FTS_DEL = (
+    "INSERT INTO incidents_fts(incidents_fts, rowid, title, tenant_id) "
+    "VALUES ('delete', old.id, old.title, old.tenant_id);"
+)
+_FTS_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS incidents_fts_ai AFTER INSERT ON incidents BEGIN {_FTS_INS} END",
+    f"CREATE TRIGGER IF NOT EXISTS incidents_fts_ad AFTER DELETE ON incidents BEGIN {_FTS_DEL} END",
+    f"CREATE TRIGGER IF NOT EXISTS incidents_fts_au AFTER UPDATE OF title, tenant_id ON incidents "
+    f"BEGIN {_FTS_DEL} {_FTS_INS} END",
+)
+
+
+# incidents change-log triggers as f6c3_change_log created them (SQLite); the
+# Postgres trigger serializes the whole row and needs no change
+_OPS = (("ai", "INSERT", "I"), ("au", "UPDATE", "U"), ("ad", "DELETE", "D"))
+
+
+def _sqlite_image(columns, ref):
+    return "json_object(" + ", ".join(f"'{c}', {ref}.{c}" for c in columns) + ")"
+
+
+def _drop_triggers(bind):
+    if bind.dialect.name == "sqlite":
+        for suffix, _, _ in _OPS:
+            bind.exec_driver_sql(f"DROP TRIGGER IF EXISTS change_log_incidents_{suffix}")
+
+
+def _reinstall_triggers(columns):
+    # SQLite change-log triggers list the columns explicitly; rebuild them for this column set
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        return
+    _drop_triggers(bind)
+    for suffix, event_name, op_code in _OPS:
+        ref = "old" if op_code == "D" else "new"
+        old = _sqlite_image(columns, "old") if op_code != "I" else "NULL"
+        new = _sqlite_image(columns, "new") if op_code != "D" else "NULL"
+        bind.exec_driver_sql(
+            f"CREATE TRIGGER change_log_incidents_{suffix} AFTER {event_name} ON incidents BEGIN "
+            f"INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data, new_data) "
+            f"VALUES ({ref}.tenant_id, 'incidents', '{op_code}', {ref}.id, {old}, {new}); END"
+        )
+
+
+def upgrade():
+    op.add_column("incidents", sa.Column("status_changed_at", sa.DateTime(), nullable=True))
+    op.add_column("incidents", sa.Column("resolved_at", sa.DateTime(), nullable=True))
+    # transition times of existing rows are unknown; creation is the best lower bound
+    op.execute("UPDATE incidents SET status_changed_at = created_at")
+    op.drop_index("ix_incidents_tenant_status", table_name="incidents", if_exists=True)
+    op.create_index(
+        "ix_incidents_tenant_status", "incidents", ["tenant_id", "status", "severity", "created_at", "resolved_at"]
+    )
+    _reinstall_triggers(INCIDENT_COLUMNS_NEW)
+
+
+def downgrade():
+    # the upgrade's if_exists drop covers create_all() databases; no migration made a narrower one
+    op.drop_index("ix_incidents_tenant_status", table_name="incidents")
+    bind = op.get_bind()
+    _drop_triggers(bind)
+    with op.batch_alter_table("incidents") as batch:
+        batch.drop_column("resolved_at")
+        batch.drop_column("status_changed_at")
+    # SQLite rebuilds the table, which drops its triggers
+    if bind.dialect.name == "sqlite":
+        for stmt in _FTS_TRIGGERS:
+            bind.exec_driver_sql(stmt)
+    _reinstall_triggers(INCIDENT_COLUMNS)
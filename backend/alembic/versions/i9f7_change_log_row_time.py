@@ -0,0 +1,41 @@
+"""change_log.created_at from the row's clock time on Postgres (read horizon, see app/outbox.py)"""
+
+from alembic import op
+
+revision = "i9f7_change_log_row_time"
+down_revision = "h8e5_incident_status_times"
+branch_labels = None
+depends_on = None
+
+
+def _capture_function(created_at):
+    ts_col, ts_val = (", created_at", f", {created_at}") if created_at else ("", "")
+    return f"""
+CREATE OR REPLACE FUNCTION change_log_capture() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO change_log (tenant_id, table_name, op, row_id, new_data{ts_col})
+        VALUES (NEW.tenant_id, TG_TABLE_NAME, 'I', NEW.id, (to_jsonb(NEW) - 'search_tsv')::text{ts_val});
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data, new_data{ts_col})
+        VALUES (NEW.tenant_id, TG_TABLE_NAME, 'U', NEW.id,
+                (to_jsonb(OLD) - 'search_tsv')::text, (to_jsonb(NEW) - 'search_tsv')::text{ts_val});
+        RETURN NEW;
+    END IF;
+    INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data{ts_col})
+    VALUES (OLD.tenant_id, TG_TABLE_NAME, 'D', OLD.id, (to_jsonb(OLD) - 'search_tsv')::text{ts_val});
+    RETURN OLD;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    # SQLite stamps rows with CURRENT_TIMESTAMP, which is already per statement there
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(_capture_function("clock_timestamp()"))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(_capture_function(None))
@@ -0,0 +1,337 @@
+# app/anomaly.py
+"""
+Streaming revenue anomaly detection.
+
+For every tenant, outlet and hour-of-week slot (weekday x hour, 168 slots)
+the detector keeps Welford running count / mean / M2 of hourly revenue
+totals in (outlets x 168) numpy arrays. Hours with no entries count as 0,
+so an outlet that goes quiet at its busy time is flagged too.
+
+New RevenueEntry rows reach it through the change log (app/outbox.py),
+whichever way they were written; each change is O(1):
+  - it lands in the open hour's running total; a total already more than
+    ANOMALY_Z standard deviations above normal is flagged straight away
+  - when the clock moves past an hour, every outlet's total for it is
+    folded into its slot and checked in both directions
+  - late changes for one of the last RING_HOURS hours replace that hour's
+    sample in its slot (Welford remove + add); older ones are only counted
+
+A tenant's state is bootstrapped once per process from the last
+ANOMALY_HISTORY_WEEKS weeks with one GROUP BY hour query. Anomalies are
+kept per tenant for GET /api/analytics/anomalies and the SSE feed
+(/api/analytics/anomalies/stream, resumable via Last-Event-ID). Their ids
+are derived from (tenant, outlet, hour, kind), so every worker gives an
+anomaly the same id and a feed can resume on any of them: from the id's
+position when this worker has it, otherwise from its hour, replaying that
+hour's other anomalies (same ids, so a client can drop repeats).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+
+from . import outbox
+from .db import SessionLocal
+from .models import ChangeLog, RevenueEntry
+
+ANOMALY_Z = float(os.getenv("ANOMALY_Z") or 3.0)
+ANOMALY_MIN_SAMPLES = int(os.getenv("ANOMALY_MIN_SAMPLES") or 4)
+ANOMALY_MIN_STD_CENTS = float(os.getenv("ANOMALY_MIN_STD_CENTS") or 500)
+ANOMALY_HISTORY_WEEKS = int(os.getenv("ANOMALY_HISTORY_WEEKS") or 8)
+ANOMALY_POLL_SECONDS = float(os.getenv("ANOMALY_POLL_SECONDS") or 5)
+ANOMALY_FEED_SECONDS = float(os.getenv("ANOMALY_FEED_SECONDS") or 300)  # then the client reconnects
+SLOTS = 7 * 24
+RING_HOURS = 24
+KEEP_ANOMALIES = 500
+
+_EPOCH = datetime(1970, 1, 1)  # a Thursday
+
+
+def hour_number(ts: datetime) -> int:
+    return int((ts - _EPOCH).total_seconds() // 3600)
+
+
+def slot(hour: int) -> int:
+    """Hour-of-week index, Monday 00:00 = 0."""
+    return ((hour // 24 + 3) % 7) * 24 + hour % 24
+
+
+def _hour_start(hour: int) -> datetime:
+    return _EPOCH + timedelta(hours=hour)
+
+
+def anomaly_id(tenant: str, outlet: str, hour: int, kind: str) -> str:
+    """Stable id "<seq>-<outlet hash>"; seq orders anomalies as they are found (an hour's "running" before its "closed")."""
+    seq = hour * 2 + (kind == "closed")
+    return f"{seq}-{zlib.crc32(f'{tenant}/{outlet}'.encode()):08x}"
+
+
+def _seq(anomaly_id: str) -> Optional[int]:
+    head = anomaly_id.partition("-")[0]
+    return int(head) if head.isdigit() else None
+
+
+@dataclass
+class Anomaly:
+    id: str              # anomaly_id(tenant, outlet, hour, kind)
+    tenant: str
+    outlet: str
+    hour: str            # ISO start of the hour
+    kind: str            # "running" (open hour) or "closed"
+    direction: str       # "high" / "low"
+    actual: float        # currency units
+    expected: float
+    std: float
+    z: float
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class TenantDetector:
+    def __init__(self, tenant: str, open_hour: int):
+        self.tenant = tenant
+        self.outlets: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.n = np.zeros((0, SLOTS), dtype=np.int32)
+        self.mean = np.zeros((0, SLOTS))
+        self.m2 = np.zeros((0, SLOTS))
+        self.ring = np.zeros((0, RING_HOURS))   # hourly totals, hours open_hour-RING_HOURS+1 .. open_hour
+        self.open_hour = open_hour
+        self.position = 0                       # last change_log id applied
+        self.dropped = 0                        # changes too late (or future-dated) to fold in
+        self.anomalies: Deque[Anomaly] = deque(maxlen=KEEP_ANOMALIES)
+        self._flagged: set = set()              # (outlet index, hour) flagged while open
+        self.lock = threading.Lock()
+
+    # --- state ---------------------------------------------------------------
+
+    def _outlet(self, name: str) -> int:
+        i = self.outlets.get(name)
+        if i is None:
+            i = self.outlets[name] = len(self.names)
+            self.names.append(name)
+            if i >= len(self.n):  # grow the arrays geometrically
+                extra = max(4, len(self.n))
+                self.n = np.vstack([self.n, np.zeros((extra, SLOTS), dtype=np.int32)])
+                self.mean = np.vstack([self.mean, np.zeros((extra, SLOTS))])
+                self.m2 = np.vstack([self.m2, np.zeros((extra, SLOTS))])
+                self.ring = np.vstack([self.ring, np.zeros((extra, RING_HOURS))])
+        return i
+
+    def _std(self, i, s):
+        n = self.n[i, s]
+        var = np.where(n > 1, self.m2[i, s] / np.maximum(n - 1, 1), 0.0)
+        return np.maximum(np.sqrt(var), ANOMALY_MIN_STD_CENTS)
+
+    def _replace(self, i: int, s: int, old: float, new: float) -> None:
+        """Swap one sample of slot (i, s) from `old` to `new` (Welford remove, then add)."""
+        n = int(self.n[i, s])
+        mean, m2 = self.mean[i, s], self.m2[i, s]
+        if n <= 1:
+            n, mean, m2 = 0, 0.0, 0.0
+        else:
+            reduced = (n * mean - old) / (n - 1)
+            m2 -= (old - reduced) * (old - mean)
+            n, mean = n - 1, reduced
+        n += 1
+        d = new - mean
+        mean += d / n
+        m2 += d * (new - mean)
+        self.n[i, s], self.mean[i, s], self.m2[i, s] = n, mean, max(m2, 0.0)
+
+    def _close_open_hour(self) -> None:
+        """Fold every outlet's total for the open hour into its slot, flag outliers, open the next hour."""
+        h, s, k = self.open_hour, slot(self.open_hour), len(self.outlets)
+        if k:
+            x = self.ring[:k, h % RING_HOURS]
+            n, mean = self.n[:k, s], self.mean[:k, s]
+            z = (x - mean) / self._std(slice(0, k), s)
+            for i in np.flatnonzero((n >= ANOMALY_MIN_SAMPLES) & (np.abs(z) > ANOMALY_Z)).tolist():
+                if (i, h) not in self._flagged or z[i] < 0:  # a running "high" already reported it
+                    self._emit(i, h, "closed", float(x[i]))
+            n = self.n[:k, s] = n + 1
+            d = x - mean
+            self.mean[:k, s] = mean + d / n
+            self.m2[:k, s] += d * (x - self.mean[:k, s])
+        self._flagged = {f for f in self._flagged if f[1] > h}
+        self.open_hour = h + 1
+        self.ring[:, self.open_hour % RING_HOURS] = 0.0
+
+    def advance(self, hour: int) -> None:
+        while self.open_hour < hour:
+            self._close_open_hour()
+
+    def add(self, outlet: str, hour: int, cents: float) -> None:
+        """Apply one entry (or a negative delta for an update/delete) in O(1)."""
+        if hour > self.open_hour:
+            self.advance(hour)
+        i = self._outlet(outlet)
+        if hour == self.open_hour:
+            col = hour % RING_HOURS
+            self.ring[i, col] += cents
+            s = slot(hour)
+            if (self.n[i, s] >= ANOMALY_MIN_SAMPLES and (i, hour) not in self._flagged
+                    and self.ring[i, col] - self.mean[i, s] > ANOMALY_Z * self._std(i, s)):
+                self._flagged.add((i, hour))
+                self._emit(i, hour, "running", float(self.ring[i, col]))
+        elif hour > self.open_hour - RING_HOURS:
+            col = hour % RING_HOURS
+            old = self.ring[i, col]
+            self.ring[i, col] = old + cents
+            self._replace(i, slot(hour), old, old + cents)
+        else:
+            self.dropped += 1
+
+    def _emit(self, i: int, hour: int, kind: str, actual: float) -> None:
+        s = slot(hour)
+        mean, std = float(self.mean[i, s]), float(self._std(i, s))
+        self.anomalies.append(Anomaly(
+            id=anomaly_id(self.tenant, self.names[i], hour, kind),
+            tenant=self.tenant,
+            outlet=self.names[i],
+            hour=_hour_start(hour).isoformat(),
+            kind=kind,
+            direction="high" if actual > mean else "low",
+            actual=round(actual / 100.0, 2),
+            expected=round(mean / 100.0, 2),
+            std=round(std / 100.0, 2),
+            z=round((actual - mean) / std, 2),
+        ))
+
+    # --- bootstrap -----------------------------------------------------------
+
+    def load_history(self, totals: List[Tuple[str, int, float]]) -> None:
+        """Seed every slot from (outlet, hour, cents) totals of the ANOMALY_HISTORY_WEEKS weeks before now."""
+        weeks = ANOMALY_HISTORY_WEEKS
+        start = self.open_hour - weeks * SLOTS
+        for outlet, _, _ in totals:
+            self._outlet(outlet)
+        k = len(self.outlets)
+        dense = np.zeros((k, weeks * SLOTS + 1))  # last column: the open hour so far
+        for outlet, hour, cents in totals:
+            if start <= hour <= self.open_hour:
+                dense[self.outlets[outlet], hour - start] += cents
+        history = dense[:, :-1].reshape(k, weeks, SLOTS)
+        # column j of a week is hour-of-week slot(start + j); rotate so column == slot
+        history = np.roll(history, slot(start), axis=2)
+        self.n[:k] = weeks
+        self.mean[:k] = history.mean(axis=1)
+        self.m2[:k] = ((history - self.mean[:k, None, :]) ** 2).sum(axis=1)
+        for back in range(RING_HOURS):
+            h = self.open_hour - back
+            self.ring[:k, h % RING_HOURS] = dense[:, h - start]
+
+    def since(self, after: Optional[str] = None, hours: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Anomalies found after the one with id `after` (all of them without it)."""
+        found = list(self.anomalies)
+        if after:
+            ids = [a.id for a in found]
+            if after in ids:
+                found = found[ids.index(after) + 1:]
+            else:  # found by another worker, or before this one (re)built the state
+                seq = _seq(after)
+                found = [a for a in found if seq is None or (_seq(a.id) >= seq and a.id != after)]
+        cutoff = _hour_start(self.open_hour - hours).isoformat() if hours else ""
+        return [a.as_dict() for a in found if a.hour >= cutoff]
+
+
+_detectors: Dict[str, TenantDetector] = {}
+_detectors_lock = threading.Lock()
+
+
+def _hour_expr(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("hour", RevenueEntry.occurred_at)
+    return func.strftime("%Y-%m-%d %H:00:00", RevenueEntry.occurred_at)
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _bootstrap(db: Session, tenant: str, now: datetime) -> TenantDetector:
+    det = TenantDetector(tenant, hour_number(now))
+    # log position first: changes after it are replayed by sync(), so rows
+    # inserted after it are left out of the history even if already visible
+    det.position = db.execute(select(func.max(ChangeLog.id))).scalar() or 0
+    since = _hour_start(det.open_hour - ANOMALY_HISTORY_WEEKS * SLOTS)
+    replayed = exists().where(
+        ChangeLog.tenant_id == tenant, ChangeLog.id > det.position, ChangeLog.table_name == "revenue_entries",
+        ChangeLog.op == "I", ChangeLog.row_id == RevenueEntry.id,
+    )
+    bucket = _hour_expr(db)
+    rows = db.execute(
+        select(RevenueEntry.outlet, bucket, func.sum(RevenueEntry.amount_cents))
+        .where(RevenueEntry.tenant_id == tenant, RevenueEntry.occurred_at >= since, ~replayed)
+        .group_by(RevenueEntry.outlet, bucket)
+    ).all()
+    det.load_history([(outlet, hour_number(_as_datetime(h)), float(c or 0)) for outlet, h, c in rows])
+    return det
+
+
+def sync(db: Session, tenant: str, now: Optional[datetime] = None) -> TenantDetector:
+    """Apply revenue changes since the last call and close finished hours."""
+    now = now or datetime.utcnow()
+    now_hour = hour_number(now)
+    with _detectors_lock:
+        det = _detectors.get(tenant)
+        if det is None:
+            det = _detectors[tenant] = _bootstrap(db, tenant, now)
+    with det.lock:
+        while True:
+            changes = outbox.read_changes(db, det.position, 1000, tenant=tenant, tables=("revenue_entries",))
+            for c in changes:
+                for image, sign in ((c.old, -1.0), (c.new, 1.0)):
+                    if not image:
+                        continue
+                    hour = hour_number(_as_datetime(image["occurred_at"]))
+                    if hour > now_hour:  # future-dated: must not close hours early
+                        det.dropped += 1
+                        continue
+                    det.add(image["outlet"], hour, sign * float(image["amount_cents"]))
+            if changes:
+                det.position = changes[-1].id
+            if len(changes) < 1000:
+                break
+        det.advance(now_hour)
+    return det
+
+
+def anomalies(db: Session, tenant: str, hours: int = 24, now: Optional[datetime] = None) -> Dict[str, Any]:
+    det = sync(db, tenant, now)
+    with det.lock:
+        return {
+            "tenant": tenant,
+            "open_hour": _hour_start(det.open_hour).isoformat(),
+            "z_threshold": ANOMALY_Z,
+            "outlets": len(det.outlets),
+            "dropped_late_changes": det.dropped,
+            "anomalies": det.since(hours=hours),
+        }
+
+
+def poll(tenant: str, after: Optional[str]) -> List[Dict[str, Any]]:
+    """Anomalies found after the one with id `after` (for the live feed; opens its own session)."""
+    db = SessionLocal()
+    try:
+        det = sync(db, tenant)
+    finally:
+        db.close()
+    with det.lock:
+        return det.since(after)
+
+
+def reset() -> None:
+    """Forget all detector state (tests)."""
+    with _detectors_lock:
+        _detectors.clear()
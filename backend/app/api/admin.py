@@ -0,0 +1,105 @@
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .. import fanout
+from ..ratelimit import rate_limited
+from ..tenant import ALLOWED, require_admin
+from ..timeouts import statement_timeout
+from .analytics import SALES, item_totals, kpi_totals, revenue_by_period
+
+router = APIRouter(
+    prefix="/api/admin/analytics",
+    tags=["admin"],
+    dependencies=[
+        Depends(require_admin),
+        Depends(rate_limited("analytics", require_admin)),
+        Depends(statement_timeout("analytics")),
+    ],
+)
+
+
+def _tenants(requested: List[str]) -> List[str]:
+    if not requested:
+        return sorted(ALLOWED)
+    wanted = [t.strip().lower() for t in requested]
+    unknown = sorted(set(wanted) - ALLOWED)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"tenant not allowed: {', '.join(unknown)}")
+    return list(dict.fromkeys(wanted))
+
+
+def _ok(partials):
+    return [p for p in partials if p.error is None]
+
+
+@router.get("/kpi-summary")
+def chain_kpi_summary(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    target: float = Query(10_000),
+    tenant: List[str] = Query(default=[]),
+):
+    """
+    Chain-wide revenue totals and food/beverage split across every allowed
+    tenant (or the `tenant` subset), plus the per-tenant figures and timings.
+    """
+    amount = SALES.amount
+    partials = fanout.fan_out(_tenants(tenant), lambda db, t: kpi_totals(db, t, date_from, date_to, amount))
+    total = fanout.merge_sums(p.value for p in _ok(partials))
+    return {
+        "tenants": fanout.timings(partials),
+        "by_tenant": {p.tenant: p.value for p in _ok(partials)},
+        "total": {
+            "target": float(target),
+            "total": total.get("total", 0.0),
+            "food": total.get("food", 0.0),
+            "beverage": total.get("beverage", 0.0),
+            "progress": (total.get("total", 0.0) / float(target)) if target else 0.0,
+        },
+    }
+
+
+@router.get("/revenue-trend")
+def chain_revenue_trend(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    bucket: Literal["day", "week", "month", "fiscal_period"] = Query("day"),
+    tenant: List[str] = Query(default=[]),
+):
+    """Revenue per day (or week / month / fiscal period) summed across tenants."""
+    amount = SALES.amount
+
+    def per_tenant(db, t):
+        return [(str(d), float(v or 0.0)) for d, v in revenue_by_period(db, t, date_from, date_to, amount, bucket)]
+
+    partials = fanout.fan_out(_tenants(tenant), per_tenant)
+    key = "date" if bucket == "day" else "period"
+    return {
+        "tenants": fanout.timings(partials),
+        "trend": [{key: d, "total": v} for d, v in fanout.merge_series(p.value for p in _ok(partials))],
+    }
+
+
+@router.get("/top-items")
+def chain_top_items(
+    limit: int = Query(5, ge=1, le=50),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    tenant: List[str] = Query(default=[]),
+):
+    """Top items by revenue across tenants (per-item totals merged, then a heap top-K)."""
+    amount = SALES.amount
+
+    def per_tenant(db, t):
+        return [(name or "", float(u or 0), float(r or 0.0)) for name, u, r in item_totals(db, t, date_from, date_to, amount)]
+
+    partials = fanout.fan_out(_tenants(tenant), per_tenant)
+    return {
+        "tenants": fanout.timings(partials),
+        "items": [
+            {"name": name, "units_sold": int(units), "revenue": revenue}
+            for name, units, revenue in fanout.merge_top_k((p.value for p in _ok(partials)), limit)
+        ],
+    }
@@ -1,16 +1,43 @@
 # backend/app/api/analytics.py
 
+import asyncio
+import json
+import os
+import time
 from datetime import date
-from typing import Optional
+from typing import Any, Callable, Dict, List, Literal, Optional
+from urllib.parse import urlencode
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func, literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import case, event, func
 from sqlalchemy.orm import Session
 
-from ..db import get_db
-from ..models import SaleItem
+from .. import anomaly as anomaly_mode
+from .. import approx as approx_mode
+from .. import comparison
+from .. import dimdate
+from .. import forecast as forecasting
+from .. import outbox
+from .. import sla as sla_mode
+from .. import staffing as staffing_mode
+from .. import topsales
+from ..cache import get_cache
+from ..compression import Payload, accepted_encoding, cached_payload
+from ..db import SessionLocal, get_db
+from ..modelmeta import META
+from ..models import DimDate, Handover, HandoverTopSale, RevenueEntry, SaleItem
+from ..ratelimit import rate_limited
+from ..singleflight import flights
+from ..tenant import optional_tenant, require_tenant
+from ..timeouts import statement_timeout
 
-router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+router = APIRouter(
+    prefix="/api/analytics",
+    tags=["analytics"],
+    dependencies=[Depends(rate_limited("analytics", optional_tenant)), Depends(statement_timeout("analytics"))],
+)
 
 # --- simple name-based classification (no category field required) ---
 _BEVERAGE_HINTS = {
@@ -29,55 +56,29 @@ def _is_beverage(name: Optional[str]) -> bool:
     n = name.lower()
     return any(h in n for h in _BEVERAGE_HINTS)
 
-def _amount_expr():
-    """
-    Returns a SQLAlchemy column/expression for 'revenue' on a SaleItem.
-    Tries these in order:
-      1) qty * <unit price> if any of: unit_price, unitprice, rate, price
-      2) a total-like column if any of: amount, total, total_amount, total_price, line_total, subtotal
-      3) literal(0.0) as last resort (prevents crashes on unknown schemas)
-    """
-    # candidates for unit price (multiply by qty)
-    for unit_col in ("unit_price", "unitprice", "rate", "price"):
-        if hasattr(SaleItem, unit_col):
-            return func.coalesce(getattr(SaleItem, "qty"), 0) * func.coalesce(getattr(SaleItem, unit_col), 0)
-
-    # candidates that already represent a line total
-    for total_col in ("amount", "total", "total_amount", "total_price", "line_total", "subtotal"):
-        if hasattr(SaleItem, total_col):
-            return func.coalesce(getattr(SaleItem, total_col), 0)
-
-    # last resort: zero (keeps endpoints alive even if schema is different)
-    return literal(0.0)
+# resolved once at import (app/modelmeta.py)
+SALES = META[SaleItem]
 
 
-@router.get("/kpi-summary")
-def kpi_summary(
-    date_from: Optional[date] = Query(None),
-    date_to: Optional[date] = Query(None),
-    target: float = Query(10_000),
-    db: Session = Depends(get_db),
-):
-    """
-    Returns aggregate revenue totals and a food/beverage split.
-    No reliance on a 'category' column; uses name heuristics.
-    """
-    amount = _amount_expr()
-
-    q = db.query(
-        SaleItem.name.label("name"),
-        amount.label("amount"),
-    )
+# --- computations shared with the cross-tenant admin API (app/api/admin.py) ---
 
+def _sales_query(db: Session, tenant: Optional[str], date_from: Optional[date], date_to: Optional[date], *cols):
+    q = db.query(*cols).select_from(SaleItem)
+    if tenant:
+        q = q.filter(SaleItem.tenant_id == tenant)
     if date_from:
         q = q.filter(SaleItem.sold_on >= date_from)
     if date_to:
         q = q.filter(SaleItem.sold_on <= date_to)
+    return q
+
 
+def kpi_totals(db: Session, tenant: Optional[str], date_from: Optional[date], date_to: Optional[date], amount) -> Dict[str, float]:
+    """Revenue total with a food/beverage split (name heuristics)."""
     total = 0.0
     food = 0.0
     beverage = 0.0
-
+    q = _sales_query(db, tenant, date_from, date_to, SaleItem.name.label("name"), amount.label("amount"))
     for name, amt in q.all():
         val = float(amt or 0.0)
         total += val
@@ -85,80 +86,374 @@ def kpi_summary(
             beverage += val
         else:
             food += val
+    return {"total": total, "food": food, "beverage": beverage}
+
+
+def revenue_by_period(db: Session, tenant: Optional[str], date_from: Optional[date], date_to: Optional[date], amount,
+                      bucket: str = "day"):
+    """(period, total) rows in period order; bucket is a key of dimdate.BUCKETS."""
+    if bucket == "day":
+        # sold_on is already a DATE; grouping on the bare column keeps index order
+        q = _sales_query(db, tenant, date_from, date_to, SaleItem.sold_on.label("d"), func.sum(amount).label("t"))
+        return q.group_by(SaleItem.sold_on).order_by(SaleItem.sold_on).all()
+    label = dimdate.BUCKETS[bucket]
+    # days outside DIM_DATE_START..END have no calendar row; they come back as days and are labelled here
+    outside = case((DimDate.date.is_(None), SaleItem.sold_on))
+    q = _sales_query(db, tenant, date_from, date_to, label.label("d"), outside.label("day"), func.sum(amount).label("t"))
+    q = q.outerjoin(DimDate, DimDate.date == SaleItem.sold_on)
+    rows = q.group_by(label, outside).order_by(label).all()
+    if all(day is None for _, day, _ in rows):
+        return [(d, t) for d, _, t in rows]
+    totals: Dict[str, Any] = {}
+    for d, day, t in rows:
+        key = d if day is None else dimdate.label(bucket, day)
+        totals[key] = (totals.get(key) or 0) + (t or 0)
+    return sorted(totals.items())
+
+
+def item_totals(db: Session, tenant: Optional[str], date_from: Optional[date], date_to: Optional[date], amount,
+                limit: Optional[int] = None):
+    """(name, units, revenue) rows, best revenue first; every item when limit is None."""
+    q = _sales_query(
+        db, tenant, date_from, date_to,
+        SaleItem.name.label("name"),
+        func.sum(func.coalesce(getattr(SaleItem, "qty"), 0)).label("units"),
+        func.sum(amount).label("revenue"),
+    )
+    q = q.group_by(SaleItem.name).order_by(func.sum(amount).desc())
+    if limit is not None:
+        q = q.limit(limit)
+    return q.all()
+
+
+# --- shared result cache (see app/cache.py) ---
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL") or 300)
+ANALYTICS_SOURCES = (SaleItem, RevenueEntry, Handover, HandoverTopSale)
+
+
+def _namespace(tenant: Optional[str]) -> str:
+    return f"analytics/{tenant or '-'}"
+
 
-    progress = (total / float(target)) if target else 0.0
+def _key(endpoint: str, params: Dict[str, Any]) -> str:
+    return endpoint + "?" + urlencode(sorted((k, "" if v is None else str(v)) for k, v in params.items()))
 
-    return {
-        "target": float(target),
-        "total": float(total),
-        "food": float(food),
-        "beverage": float(beverage),
-        "progress": float(progress),
+
+def _payload(tenant: Optional[str], endpoint: str, params: Dict[str, Any], compute: Callable[[], Any]) -> Payload:
+    _follow_changes()
+    return get_cache().get_or_compute(_namespace(tenant), _key(endpoint, params), cached_payload(compute),
+                                      ttl=ANALYTICS_CACHE_TTL)
+
+
+def _cached(tenant: Optional[str], endpoint: str, params: Dict[str, Any], compute: Callable[[], Any],
+            encoding: Optional[str] = None):
+    """
+    Serve `compute()` from the shared cache. Entries hold the JSON bytes and
+    their compressed variants, so a hit skips both the query and the codec.
+    """
+    return _payload(tenant, endpoint, params, compute).response(encoding)
+
+
+async def _coalesced(tenant: Optional[str], endpoint: str, params: Dict[str, Any], compute: Callable[[], Any],
+                     encoding: Optional[str] = None):
+    """
+    _cached() for async dashboard routes: identical concurrent requests
+    (tenant, endpoint, params) await one lookup/computation instead of each
+    holding a worker thread (see app/singleflight.py).
+    """
+    payload = await flights.run(endpoint, (_namespace(tenant), _key(endpoint, params)),
+                                lambda: _payload(tenant, endpoint, params, compute))
+    return payload.response(encoding)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_analytics_writes(session, flush_context) -> None:
+    tenants = {
+        obj.tenant_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, ANALYTICS_SOURCES)
     }
+    if tenants:
+        session.info.setdefault("analytics_tenants", set()).update(tenants)
 
 
-@router.get("/revenue-trend")
-def revenue_trend(
+@event.listens_for(Session, "after_commit")
+def _invalidate_analytics(session) -> None:
+    # after commit, so no worker can recompute from rows that are not yet visible
+    tenants = session.info.pop("analytics_tenants", None)
+    if tenants:
+        cache = get_cache()
+        for t in tenants | {None}:
+            cache.invalidate(_namespace(t))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_analytics_writes(session) -> None:
+    session.info.pop("analytics_tenants", None)
+
+
+# Writes that bypass the ORM session (Core batches such as snapshot.restore,
+# raw SQL backfills) reach the cache through the change log instead, polled
+# at most every ANALYTICS_CHANGES_POLL_SECONDS by the lookups themselves. If
+# the position is lost, entries written meanwhile age out with their TTL.
+ANALYTICS_CHANGES_POLL_SECONDS = float(os.getenv("ANALYTICS_CHANGES_POLL_SECONDS") or 1)
+_CHANGE_TABLES = ("sale_items", "revenue_entries", "handovers")
+_next_poll = 0.0
+
+
+def _invalidate_changed(changes: List[outbox.Change], prefix: str) -> None:
+    cache = get_cache()
+    for t in {c.tenant_id for c in changes} | {None}:
+        cache.invalidate(_namespace(t))
+
+
+def _follow_changes() -> None:
+    global _next_poll
+    now = time.monotonic()
+    if now < _next_poll:
+        return
+    _next_poll = now + ANALYTICS_CHANGES_POLL_SECONDS
+    db = SessionLocal()
+    try:
+        outbox.follow(db, "analytics-changes", _CHANGE_TABLES, _invalidate_changed)
+    finally:
+        db.close()
+
+
+@router.get("/kpi-summary")
+async def kpi_summary(
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
+    target: float = Query(10_000),
     db: Session = Depends(get_db),
+    tenant: Optional[str] = Depends(optional_tenant),
+    encoding: Optional[str] = Depends(accepted_encoding),
 ):
     """
-    Daily revenue totals grouped by sold_on date.
+    Returns aggregate revenue totals and a food/beverage split.
+    No reliance on a 'category' column; uses name heuristics.
     """
-    amount = _amount_expr()
+    amount = SALES.amount
 
-    q = db.query(
-        func.date(SaleItem.sold_on).label("d"),
-        func.sum(amount).label("t"),
-    )
+    def compute():
+        sums = kpi_totals(db, tenant, date_from, date_to, amount)
+        total, food, beverage = sums["total"], sums["food"], sums["beverage"]
+        progress = (total / float(target)) if target else 0.0
 
-    if date_from:
-        q = q.filter(SaleItem.sold_on >= date_from)
-    if date_to:
-        q = q.filter(SaleItem.sold_on <= date_to)
+        return {
+            "target": float(target),
+            "total": float(total),
+            "food": float(food),
+            "beverage": float(beverage),
+            "progress": float(progress),
+        }
 
-    q = q.group_by(func.date(SaleItem.sold_on)).order_by(func.date(SaleItem.sold_on))
+    return await _coalesced(tenant, "kpi-summary", {"date_from": date_from, "date_to": date_to, "target": target},
+                            compute, encoding)
 
-    rows = q.all()
-    return [{"date": str(d), "total": float(t or 0.0)} for d, t in rows]
+
+@router.get("/revenue-trend")
+async def revenue_trend(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    approx: bool = Query(False),
+    bucket: Literal["day", "week", "month", "fiscal_period"] = Query("day"),
+    db: Session = Depends(get_db),
+    tenant: Optional[str] = Depends(optional_tenant),
+    encoding: Optional[str] = Depends(accepted_encoding),
+):
+    """
+    Daily revenue totals grouped by sold_on date, or per ISO week / month /
+    fiscal period (bucket=...) through the dim_date calendar.
+    With approx=true, totals are estimated from per-month sketches and carry
+    95% error bounds, plus distinct outlets and check-size percentiles.
+    """
+    amount = SALES.amount
+    if approx:
+        return await run_in_threadpool(approx_mode.revenue_trend, db, tenant, date_from, date_to, amount)
+
+    def compute():
+        rows = revenue_by_period(db, tenant, date_from, date_to, amount, bucket)
+        key = "date" if bucket == "day" else "period"
+        return [{key: str(d), "total": float(t or 0.0)} for d, t in rows]
+
+    params = {"date_from": date_from, "date_to": date_to, "bucket": bucket}
+    return await _coalesced(tenant, "revenue-trend", params, compute, encoding)
 
 
 @router.get("/top-items")
-def top_items(
+async def top_items(
     limit: int = Query(5, ge=1, le=50),
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
+    approx: bool = Query(False),
     db: Session = Depends(get_db),
+    tenant: Optional[str] = Depends(optional_tenant),
+    encoding: Optional[str] = Depends(accepted_encoding),
 ):
     """
     Top selling items by revenue within an optional date range.
+    With approx=true, uses the per-month sketches (see app/approx.py).
     """
-    amount = _amount_expr()
+    amount = SALES.amount
+    if approx:
+        return await run_in_threadpool(approx_mode.top_items, db, tenant, limit, date_from, date_to, amount)
 
-    q = db.query(
-        SaleItem.name.label("name"),
-        func.sum(func.coalesce(getattr(SaleItem, "qty"), 0)).label("units"),
-        func.sum(amount).label("revenue"),
+    def compute():
+        rows = item_totals(db, tenant, date_from, date_to, amount, limit)
+        return [
+            {
+                "name": name or "",
+                "units_sold": int(units or 0),
+                "revenue": float(rev or 0.0),
+            }
+            for name, units, rev in rows
+        ]
+
+    return await _coalesced(tenant, "top-items", {"limit": limit, "date_from": date_from, "date_to": date_to},
+                            compute, encoding)
+
+
+@router.get("/compare")
+def compare_periods(
+    kind: Literal["day", "week", "month"] = Query("week"),
+    prior: int = Query(4, ge=0, le=52),
+    anchor: Optional[date] = Query(None),
+    period: Optional[List[str]] = Query(None),
+    yoy: bool = Query(False),
+    outlet: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+    tenant: Optional[str] = Depends(optional_tenant),
+    encoding: Optional[str] = Depends(accepted_encoding),
+):
+    """
+    Revenue, covers and average check per outlet for the period containing
+    `anchor` and `prior` periods before it (or explicit period=from..to
+    ranges), with percent changes against the previous period and, with
+    yoy=true, against the same period a year earlier. One query however
+    many periods; see app/comparison.py.
+    """
+    anchor = anchor or date.today()
+    try:
+        comparison.plan(kind, prior, anchor, period, yoy)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    outlets = sorted(set(outlet)) if outlet else None
+    params = {
+        "kind": kind, "prior": prior, "anchor": anchor, "yoy": yoy,
+        "period": ",".join(period or []), "outlet": ",".join(outlets or []),
+    }
+    return _cached(
+        tenant, "compare", params,
+        lambda: comparison.compare(db, tenant, kind, prior, anchor, period, yoy, outlets),
+        encoding,
     )
 
-    if date_from:
-        q = q.filter(SaleItem.sold_on >= date_from)
-    if date_to:
-        q = q.filter(SaleItem.sold_on <= date_to)
 
-    q = (
-        q.group_by(SaleItem.name)
-         .order_by(func.sum(amount).desc())
-         .limit(limit)
+@router.get("/handover-top-sales")
+def handover_top_sales(
+    limit: int = Query(10, ge=1, le=50),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    tenant: Optional[str] = Depends(optional_tenant),
+    encoding: Optional[str] = Depends(accepted_encoding),
+):
+    """
+    Items most often listed as top sellers on shift handovers.
+    """
+    return _cached(
+        tenant,
+        "handover-top-sales",
+        {"limit": limit, "date_from": date_from, "date_to": date_to},
+        lambda: topsales.top_sold(db, tenant, limit, date_from, date_to),
+        encoding,
     )
 
-    rows = q.all()
-    return [
-        {
-            "name": name or "",
-            "units_sold": int(units or 0),
-            "revenue": float(rev or 0.0),
-        }
-        for name, units, rev in rows
-    ]
+
+@router.get("/staffing")
+def staffing(
+    weeks: int = Query(12, ge=1, le=156),
+    db: Session = Depends(get_db),
+    tenant: Optional[str] = Depends(optional_tenant),
+):
+    """
+    Covers heatmap by outlet x shift x weekday over the last `weeks` closed
+    weeks, plus per-day covers with a same-weekday rolling average and the
+    change against the same weekday a week earlier.
+    """
+    return staffing_mode.staffing(db, tenant, weeks)
+
+
+@router.get("/incident-sla")
+def incident_sla(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    tenant: str = Depends(require_tenant),
+):
+    """
+    Open-incident age histogram and SLA breaches per severity, plus
+    time-to-resolve (mean, P50/P90/P95) for incidents resolved in the range
+    (default: the last 30 days). See app/sla.py.
+    """
+    return sla_mode.sla(db, tenant, date_from, date_to)
+
+
+@router.get("/anomalies")
+def revenue_anomalies(
+    hours: int = Query(24, ge=1, le=168),
+    db: Session = Depends(get_db),
+    tenant: str = Depends(require_tenant),
+):
+    """
+    Outlet/hour revenue totals more than ANOMALY_Z standard deviations from
+    that outlet's normal for the same weekday and hour, over the last `hours`.
+    See app/anomaly.py.
+    """
+    return anomaly_mode.anomalies(db, tenant, hours)
+
+
+@router.get("/anomalies/stream")
+async def revenue_anomaly_stream(
+    request: Request,
+    tenant: str = Depends(require_tenant),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-sent events: one `anomaly` event per new anomaly, polled every
+    ANOMALY_POLL_SECONDS. The stream ends after ANOMALY_FEED_SECONDS and
+    EventSource reconnects with Last-Event-ID, so nothing is missed.
+    """
+    after = last_event_id or None
+
+    async def events():
+        nonlocal after
+        deadline = time.monotonic() + anomaly_mode.ANOMALY_FEED_SECONDS
+        yield f"retry: {int(anomaly_mode.ANOMALY_POLL_SECONDS * 1000)}\n\n"
+        while True:
+            found = await run_in_threadpool(anomaly_mode.poll, tenant, after)
+            for a in found:
+                yield f"id: {a['id']}\nevent: anomaly\ndata: {json.dumps(a)}\n\n"
+                after = a["id"]
+            if not found:
+                yield ": keep-alive\n\n"
+            if time.monotonic() >= deadline or await request.is_disconnected():
+                return
+            await asyncio.sleep(anomaly_mode.ANOMALY_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/forecast")
+def forecast(
+    metric: Literal["revenue", "covers"] = Query("revenue"),
+    horizon: int = Query(7, ge=1, le=28),
+    db: Session = Depends(get_db),
+    tenant: str = Depends(require_tenant),
+):
+    """
+    Per-outlet projections for the next `horizon` days from seasonal-naive,
+    exponential smoothing and day-of-week models (see app/forecast.py).
+    """
+    return forecasting.forecast(db, tenant, metric, horizon)
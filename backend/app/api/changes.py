@@ -0,0 +1,58 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import outbox
+from ..db import get_db
+from ..models import ChangeConsumer
+from ..ratelimit import rate_limited
+from ..schemas.changes import CheckpointIn
+from ..tenant import require_admin
+
+router = APIRouter(
+    prefix="/api/changes",
+    tags=["changes"],
+    dependencies=[Depends(require_admin), Depends(rate_limited("list", require_admin))],
+)
+
+Table = Literal["handovers", "incidents", "sale_items", "revenue_entries"]
+
+
+@router.get("")
+def read_changes(
+    consumer: Optional[str] = Query(None, max_length=80),
+    after: Optional[int] = Query(None, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    tenant: Optional[str] = Query(None),
+    table: List[Table] = Query(default=[]),
+    db: Session = Depends(get_db),
+):
+    """
+    Next batch of changes, oldest first. Starts after `after`, else after the
+    consumer's stored checkpoint, else from the beginning. Acknowledge with
+    POST /api/changes/checkpoint once the batch is applied.
+    """
+    start = after if after is not None else (outbox.get_checkpoint(db, consumer) if consumer else 0)
+    changes = outbox.read_changes(db, start, limit + 1, tenant=tenant, tables=table)
+    page = changes[:limit]
+    return {
+        "changes": [c.as_dict() for c in page],
+        "next": page[-1].id if page else start,
+        "has_more": len(changes) > limit,
+    }
+
+
+@router.post("/checkpoint")
+def commit_checkpoint(body: CheckpointIn, db: Session = Depends(get_db)):
+    """Record that `consumer` has applied everything up to `position` (never moves back)."""
+    position = outbox.advance_checkpoint(db, body.consumer, body.position)
+    db.commit()
+    return {"consumer": body.consumer, "position": position}
+
+
+@router.get("/consumers")
+def list_consumers(db: Session = Depends(get_db)):
+    rows = db.execute(select(ChangeConsumer).order_by(ChangeConsumer.name)).scalars()
+    return [{"consumer": r.name, "position": r.position, "updated_at": r.updated_at} for r in rows]
@@ -1,6 +1,59 @@
-from fastapi import APIRouter
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel, Field
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..models import GuestNote
+from ..ratelimit import rate_limited
+from ..modelmeta import META, encoder
+from ..readmodels import GuestNoteRow, fetch_rows, select_rows
+from ..tenant import require_tenant
+
 router = APIRouter(prefix="/api", tags=["guest-notes"])
 
-@router.get("/guest-notes")
-def list_guest_notes():
-    return {"total": 0, "items": []}
+
+class GuestNoteCreate(BaseModel):
+    guest_name: str = Field(..., min_length=1, max_length=160)
+    room: Optional[str] = Field(None, max_length=20)
+    note: str = Field(..., min_length=1)
+
+
+GUEST_NOTES = META[GuestNote]
+# read-model rows and ORM objects alike, without tenant_id
+serialize = encoder(GuestNoteRow, exclude=("tenant_id",))
+
+
+@router.get("/guest-notes", dependencies=[Depends(rate_limited("list"))])
+def list_guest_notes(
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    tenant: str = Depends(require_tenant),
+):
+    q = select_rows(GuestNoteRow).where(GuestNote.tenant_id == tenant)
+    if date_from:
+        q = q.where(GuestNote.created_at >= date_from)
+    if date_to:
+        q = q.where(GuestNote.created_at <= date_to)
+    total = db.execute(select(func.count()).select_from(q.subquery())).scalar() or 0
+    items = fetch_rows(db, q.order_by(*GUEST_NOTES.order_by).limit(limit).offset(offset), GuestNoteRow)
+    return {"total": total, "items": [serialize(n) for n in items]}
+
+
+@router.post("/guest-notes", dependencies=[Depends(rate_limited("write"))])
+def create_guest_note(
+    payload: GuestNoteCreate,
+    db: Session = Depends(get_db),
+    tenant: str = Depends(require_tenant),
+):
+    obj = GuestNote(tenant_id=tenant, **payload.model_dump())
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return serialize(obj)
@@ -1,12 +1,14 @@
 # app/api/handover.py
 from __future__ import annotations
-from typing import Any, Dict, List
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from ..db import SessionLocal
+from ..modelmeta import META, row_dicts
 from ..models import Handover
+from ..ratelimit import rate_limited
+from ..readmodels import HandoverRow, projection
 from ..tenant import get_tenant
 
 router = APIRouter()
@@ -18,31 +20,20 @@ def get_db():
     finally:
         db.close()
 
-def cols(model) -> set[str]:
-    return set(model.__table__.columns.keys())
+HANDOVERS = META[Handover]
 
-def serialize(obj) -> Dict[str, Any]:
-    data = {}
-    for c in obj.__table__.columns.keys():
-        val = getattr(obj, c)
-        # cast decimals/bytes if any; otherwise FastAPI handles
-        data[c] = val
-    return data
-
-@router.get("", response_model=list[dict])
+@router.get("", response_model=list[dict], dependencies=[Depends(rate_limited("list"))])
 def list_handovers(
     db: Session = Depends(get_db),
     tenant: str = Depends(get_tenant),
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    fields: str | None = Query(None, description="comma-separated columns, e.g. date,outlet,shift,covers"),
 ):
-    q = db.query(Handover).filter(Handover.tenant_id == tenant)
-    # prefer ordering by date desc then id desc if present
-    model_cols = cols(Handover)
-    if "date" in model_cols and "id" in model_cols:
-        q = q.order_by(Handover.date.desc(), Handover.id.desc())
-    elif "id" in model_cols:
-        q = q.order_by(Handover.id.desc())
-
-    items: List[Handover] = q.limit(limit).offset(offset).all()
-    return [serialize(x) for x in items]
+    try:
+        row_type = projection(HandoverRow, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # date desc, id desc; statement built once per projection (app/modelmeta.py)
+    rows = db.execute(HANDOVERS.list_statement(row_type), {"tenant": tenant, "limit": limit, "offset": offset})
+    return row_dicts(row_type, rows)
@@ -1,20 +1,17 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from ..db import get_db
+from ..modelmeta import META, row_dicts
 from ..models import Handover
+from ..readmodels import HandoverRow, projection
+from ..ratelimit import rate_limited
 from ..tenant import get_tenant
 
 router = APIRouter(prefix="/api/handovers", tags=["handovers"])
 
-@router.get("/recent")
+RecentHandover = projection(HandoverRow, "id,date,outlet,shift,covers")
+
+@router.get("/recent", dependencies=[Depends(rate_limited("list"))])
 def recent_handovers(db: Session = Depends(get_db), tenant: str = Depends(get_tenant)):
-    items = (db.query(Handover)
-             .filter(Handover.tenant_id == tenant)
-             .order_by(Handover.date.desc(), Handover.id.desc())
-             .limit(10).all())
-    return {
-        "items": [
-            {"id": h.id, "date": h.date.isoformat(), "outlet": h.outlet, "shift": h.shift, "covers": h.covers}
-            for h in items
-        ]
-    }
+    rows = db.execute(META[Handover].list_statement(RecentHandover), {"tenant": tenant, "limit": 10, "offset": 0})
+    return {"items": row_dicts(RecentHandover, rows)}
@@ -1,16 +1,35 @@
 # app/api/incidents.py
 from __future__ import annotations
+from collections import Counter
+from functools import lru_cache
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, select, update
 from sqlalchemy.orm import Session
 
 from ..db import SessionLocal
-from ..models import Incident
+from ..modelmeta import META, row_dicts
+from ..models import Incident, incident_status_values
+from ..ratelimit import rate_limited
+from ..readmodels import IncidentRow, projection
+from ..schemas.incidents import (
+    BatchItemResult,
+    BatchResult,
+    IncidentBatchCreate,
+    IncidentBatchStatusUpdate,
+    IncidentCreate,
+    IncidentStatusChange,
+)
 from ..tenant import get_tenant
 
 router = APIRouter()
 
+INCIDENTS = META[Incident]
+
 def get_db():
     db = SessionLocal()
     try:
@@ -18,22 +37,149 @@ def get_db():
     finally:
         db.close()
 
-def serialize(obj) -> Dict[str, Any]:
-    return {c: getattr(obj, c) for c in obj.__table__.columns.keys()}
-
-@router.get("", response_model=list[dict])
+@router.get("", response_model=list[dict], dependencies=[Depends(rate_limited("list"))])
 def list_incidents(
     db: Session = Depends(get_db),
     tenant: str = Depends(get_tenant),
     limit: int = Query(20, ge=1, le=200),
     offset: int = Query(0, ge=0),
     status: List[str] = Query(default=["OPEN", "IN_PROGRESS"]),
+    fields: str | None = Query(None, description="comma-separated columns, e.g. id,title,status,severity"),
 ):
-    q = db.query(Incident).filter(Incident.tenant_id == tenant)
+    try:
+        row_type = projection(IncidentRow, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # newest first; statements built once per projection (app/modelmeta.py)
+    params = {"tenant": tenant, "limit": limit, "offset": offset}
     if status:
-        q = q.filter(Incident.status.in_(status))
-    # order newest first if id exists
-    if "id" in Incident.__table__.columns:
-        q = q.order_by(Incident.id.desc())
-    items: List[Incident] = q.limit(limit).offset(offset).all()
-    return [serialize(x) for x in items]
+        params["status"] = status
+    return row_dicts(row_type, db.execute(_list_statement(row_type, bool(status)), params))
+
+
+@lru_cache(maxsize=256)
+def _list_statement(row_type, by_status: bool):
+    stmt = INCIDENTS.list_statement(row_type)
+    if by_status:
+        stmt = stmt.where(Incident.status.in_(bindparam("status", expanding=True)))
+    return stmt
+
+
+def _first_error(exc: ValidationError) -> str:
+    err = exc.errors()[0]
+    loc = ".".join(str(x) for x in err.get("loc", ()))
+    return f"{loc}: {err.get('msg')}" if loc else str(err.get("msg"))
+
+
+def create_incidents_batch(db: Session, tenant: str, items: List[Dict[str, Any]]) -> BatchResult:
+    """
+    Validate every item with IncidentCreate, then write all valid ones with a
+    single multi-row INSERT ... RETURNING and one commit.
+    Stored severity/status follow the upper-case convention of existing rows.
+    """
+    results: List[BatchItemResult] = []
+    rows: List[Dict[str, Any]] = []
+    slots: List[int] = []
+    now = datetime.utcnow()
+    for i, raw in enumerate(items):
+        try:
+            payload = IncidentCreate.model_validate({"tenant_id": tenant, **raw})
+        except ValidationError as exc:
+            results.append(BatchItemResult(index=i, ok=False, error=_first_error(exc)))
+            continue
+        if payload.tenant_id != tenant:
+            results.append(BatchItemResult(index=i, ok=False, error="tenant_id: does not match X-Tenant"))
+            continue
+        rows.append({
+            "tenant_id": tenant,
+            "outlet": payload.outlet,
+            "severity": payload.severity.upper(),
+            "title": payload.title,
+            "status": "OPEN",
+            "created_at": now,
+            "status_changed_at": now,
+        })
+        slots.append(i)
+        results.append(BatchItemResult(index=i, ok=True))
+
+    if rows:
+        ids = db.execute(
+            insert(Incident).returning(Incident.id, sort_by_parameter_order=True),
+            rows,
+        ).scalars().all()
+        db.commit()
+        for slot, new_id in zip(slots, ids):
+            results[slot].id = new_id
+
+    ok = len(rows)
+    return BatchResult(succeeded=ok, failed=len(items) - ok, results=results)
+
+
+def update_incident_status_batch(db: Session, tenant: str, items: List[Dict[str, Any]]) -> BatchResult:
+    """
+    Validate every item with IncidentStatusChange, then issue one bulk
+    UPDATE ... WHERE id IN (...) RETURNING id per target status, in one transaction.
+    Rows already in the target status keep their transition timestamps; an id
+    listed with different statuses fails on every item that lists it.
+    """
+    results: List[BatchItemResult] = []
+    by_status: Dict[str, Dict[int, List[int]]] = {}
+    for i, raw in enumerate(items):
+        try:
+            change = IncidentStatusChange.model_validate(raw)
+        except ValidationError as exc:
+            results.append(BatchItemResult(index=i, ok=False, error=_first_error(exc)))
+            continue
+        by_status.setdefault(change.status.upper(), {}).setdefault(change.id, []).append(i)
+        results.append(BatchItemResult(index=i, ok=False, id=change.id, error="not found"))
+
+    # an id asked for more than one status has no single outcome: reject all of its items
+    targets = Counter(incident_id for slots_by_id in by_status.values() for incident_id in slots_by_id)
+    for slots_by_id in by_status.values():
+        for incident_id in [k for k in slots_by_id if targets[k] > 1]:
+            for slot in slots_by_id.pop(incident_id):
+                results[slot].error = "conflicting status for id"
+
+    now = datetime.utcnow()
+    for status, slots_by_id in by_status.items():
+        if not slots_by_id:
+            continue
+        ids = list(slots_by_id)
+        # already there: counts as success but leaves status_changed_at alone
+        unchanged = db.execute(
+            select(Incident.id).where(Incident.tenant_id == tenant, Incident.id.in_(ids), Incident.status == status)
+        ).scalars().all()
+        updated = db.execute(
+            update(Incident)
+            .where(Incident.tenant_id == tenant, Incident.id.in_(ids), Incident.status != status)
+            .values(**incident_status_values(status, now))
+            .returning(Incident.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        updated = [*unchanged, *updated]
+        for incident_id in updated:
+            for slot in slots_by_id[incident_id]:
+                results[slot].ok = True
+                results[slot].error = None
+    db.commit()
+
+    ok = sum(1 for r in results if r.ok)
+    return BatchResult(succeeded=ok, failed=len(items) - ok, results=results)
+
+
+@router.post("/batch", response_model=BatchResult, dependencies=[Depends(rate_limited("write"))])
+def create_incidents(
+    body: IncidentBatchCreate,
+    db: Session = Depends(get_db),
+    tenant: str = Depends(get_tenant),
+):
+    return create_incidents_batch(db, tenant, body.items)
+
+
+@router.patch("/batch/status", response_model=BatchResult, dependencies=[Depends(rate_limited("write"))])
+def update_incidents_status(
+    body: IncidentBatchStatusUpdate,
+    db: Session = Depends(get_db),
+    tenant: str = Depends(get_tenant),
+):
+    return update_incident_status_batch(db, tenant, body.items)
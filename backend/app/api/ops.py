@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from ..ratelimit import limiter
+from ..singleflight import flights
+from ..tenant import require_admin
+
+router = APIRouter(prefix="/api/ops", tags=["ops"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/limits")
+def rate_limit_stats():
+    """Admission counters: admitted and shed requests per tenant and budget."""
+    return limiter.stats()
+
+
+@router.get("/coalescing")
+def coalescing_stats():
+    """Single-flight counters: executed vs coalesced requests per analytics endpoint."""
+    return flights.stats()
@@ -0,0 +1,43 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from .. import reports
+from ..ratelimit import rate_limited
+from ..tenant import require_tenant
+
+router = APIRouter(prefix="/api/reports", tags=["reports"], dependencies=[Depends(rate_limited("list"))])
+
+_MEDIA_TYPES = {"json": "application/json", "csv": "text/csv; charset=utf-8"}
+
+
+@router.get("")
+def list_reports(tenant: str = Depends(require_tenant)):
+    """Stored reports for the tenant, newest period first within each kind."""
+    return {"items": reports.list_reports(tenant)}
+
+
+@router.get("/{kind}/{period}.{fmt}")
+def download_report(
+    kind: Literal["daily", "weekly", "monthly"],
+    period: str,
+    fmt: Literal["json", "csv"],
+    tenant: str = Depends(require_tenant),
+):
+    """
+    A pre-built report file, streamed from disk without touching the database.
+    Periods look like 2024-01-31 (daily), 2024-W05 (weekly) or 2024-01 (monthly).
+    """
+    if not reports.LABEL_RE[kind].match(period):
+        raise HTTPException(status_code=404, detail="report not found")
+    path = reports.artifact_path(tenant, kind, period, fmt)
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="report not found")
+    return FileResponse(
+        path,
+        media_type=_MEDIA_TYPES[fmt],
+        filename=f"{tenant}-{kind}-{period}.{fmt}",
+        # not immutable: a change to a closed period rebuilds its report
+        headers={"Cache-Control": "private, max-age=300"},
+    )
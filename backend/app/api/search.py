@@ -0,0 +1,28 @@
+from typing import List, Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from .. import search as fts
+from ..db import get_db
+from ..ratelimit import rate_limited
+from ..tenant import require_tenant
+
+router = APIRouter(prefix="/api", tags=["search"])
+
+
+@router.get("/search", dependencies=[Depends(rate_limited("list"))])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: List[Literal["incidents", "guest_notes"]] = Query(default=list(fts.KINDS)),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    tenant: str = Depends(require_tenant),
+):
+    """
+    Keyword search over incident titles and guest notes, best matches first.
+    Backed by FTS5 on SQLite and tsvector/GIN on Postgres; other databases
+    fall back to unranked LIKE matching.
+    """
+    return fts.search(db, tenant, q, kinds=tuple(dict.fromkeys(kind)), limit=limit, offset=offset)
@@ -0,0 +1,295 @@
+# app/approx.py
+"""
+Approximate analytics over very large date ranges.
+
+Each (tenant, month) gets one MonthSketch built by a single streaming pass:
+a reservoir of SaleItem rows, HyperLogLog counters for distinct item names
+and outlets, and a t-digest of RevenueEntry.amount_cents (check size).
+Fully covered months come from the bounded in-process store; the partial
+months at the edges of a range are sketched on the fly from just the rows
+inside the range.
+
+Month sketches follow the change log (app/outbox.py), so only committed
+writes count, whichever way they were made: before each use the store
+observes inserted rows and drops the month of any updated or deleted row
+(a sample cannot forget a row), which is rebuilt on its next use.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import outbox
+from .models import ChangeLog, RevenueEntry, SaleItem
+from .sketches import Z_95, HyperLogLog, Reservoir, TDigest
+
+RESERVOIR_SIZE = 512     # sampled SaleItem rows per tenant-month
+HLL_PRECISION = 12       # 4096 registers -> ~1.6% relative error
+TDIGEST_COMPRESSION = 100
+MAX_SKETCHES = 240       # ~20 years for one tenant; LRU beyond that
+OPEN_MONTH_TTL = 300.0   # seconds before the current month is re-read from the DB
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+Month = Tuple[int, int]
+
+
+@dataclass
+class MonthSketch:
+    sales: Reservoir = field(default_factory=lambda: Reservoir(RESERVOIR_SIZE))
+    items: HyperLogLog = field(default_factory=lambda: HyperLogLog(HLL_PRECISION))
+    outlets: HyperLogLog = field(default_factory=lambda: HyperLogLog(HLL_PRECISION))
+    checks: TDigest = field(default_factory=lambda: TDigest(TDIGEST_COMPRESSION))
+    built_at: float = field(default_factory=time.monotonic)
+    seen: int = 0  # last change_log id before the build; earlier changes are in it already
+
+    def observe_sale(self, sold_on: date, name: str, qty: int, amount: float) -> None:
+        self.sales.add((sold_on, name, qty, amount))
+        self.items.add(name)
+
+    def observe_revenue(self, outlet: str, amount_cents: int) -> None:
+        self.outlets.add(outlet)
+        self.checks.add(amount_cents)
+
+
+def _month_bounds(m: Month) -> Tuple[date, date]:
+    y, mo = m
+    first = date(y, mo, 1)
+    nxt = date(y + 1, 1, 1) if mo == 12 else date(y, mo + 1, 1)
+    return first, nxt - timedelta(days=1)
+
+
+def _months(start: date, end: date) -> List[Month]:
+    out: List[Month] = []
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+def build_sketch(db: Session, tenant: Optional[str], start: date, end: date, amount) -> MonthSketch:
+    """One streaming pass over SaleItem and RevenueEntry rows in [start, end]."""
+    sk = MonthSketch()
+    q = (
+        select(SaleItem.sold_on, SaleItem.name, func.coalesce(SaleItem.qty, 0), amount)
+        .where(SaleItem.sold_on >= start, SaleItem.sold_on <= end)
+    )
+    if tenant:
+        q = q.where(SaleItem.tenant_id == tenant)
+    for sold_on, name, qty, amt in db.execute(q.execution_options(yield_per=1000)):
+        sk.observe_sale(sold_on, name or "", int(qty or 0), float(amt or 0.0))
+
+    r = (
+        select(RevenueEntry.outlet, RevenueEntry.amount_cents)
+        .where(
+            RevenueEntry.occurred_at >= datetime.combine(start, datetime.min.time()),
+            RevenueEntry.occurred_at < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+        )
+    )
+    if tenant:
+        r = r.where(RevenueEntry.tenant_id == tenant)
+    for outlet, cents in db.execute(r.execution_options(yield_per=1000)):
+        sk.observe_revenue(outlet or "", int(cents or 0))
+    return sk
+
+
+def _day(value: Any) -> date:
+    return date.fromisoformat(str(value)[:10])
+
+
+class SketchStore:
+    """Bounded LRU of MonthSketch keyed by (tenant, (year, month))."""
+
+    def __init__(self, max_entries: int = MAX_SKETCHES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Tuple[Optional[str], Month], MonthSketch]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._position: Optional[int] = None  # change_log id applied to the sketches in this process
+
+    def get(self, db: Session, tenant: Optional[str], month: Month, amount) -> MonthSketch:
+        key = (tenant, month)
+        first, last = _month_bounds(month)
+        is_open = last >= date.today()
+        with self._lock:
+            sk = self._data.get(key)
+            if sk is not None and not (is_open and time.monotonic() - sk.built_at > OPEN_MONTH_TTL):
+                self._data.move_to_end(key)
+                return sk
+        seen = db.execute(select(func.max(ChangeLog.id))).scalar() or 0
+        sk = build_sketch(db, tenant, first, last, amount)
+        sk.seen = seen
+        with self._lock:
+            self._data[key] = sk
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return sk
+
+    def sync(self, db: Session) -> None:
+        """Apply committed sales and revenue changes since the last sync."""
+        with self._sync_lock:
+            if self._position is None:
+                # first use in this process: nothing is cached yet
+                self._position = db.execute(select(func.max(ChangeLog.id))).scalar() or 0
+                return
+            while True:
+                changes = outbox.read_changes(db, self._position, 1000, tables=("sale_items", "revenue_entries"))
+                if not changes:
+                    return
+                for c in changes:
+                    self._apply(c)
+                self._position = changes[-1].id
+
+    def _apply(self, c: outbox.Change) -> None:
+        column = "sold_on" if c.table == "sale_items" else "occurred_at"
+        months = {(_day(image[column]).year, _day(image[column]).month) for image in (c.old, c.new) if image}
+        with self._lock:
+            for month in months:
+                for key in ((c.tenant_id, month), (None, month)):
+                    sk = self._data.get(key)
+                    if sk is None or c.id <= sk.seen:
+                        continue
+                    if c.op != "I":
+                        del self._data[key]
+                    elif c.table == "sale_items":
+                        # amount is not stored on SaleItem in the current schema; samples carry 0.0
+                        # like META[SaleItem].amount
+                        sk.observe_sale(_day(c.new["sold_on"]), c.new["name"] or "", int(c.new["qty"] or 0), 0.0)
+                    else:
+                        sk.observe_revenue(c.new["outlet"] or "", int(c.new["amount_cents"] or 0))
+
+    def drop(self, tenant: str) -> None:
+        """Forget `tenant`'s months and the all-tenant ones."""
+        with self._lock:
+            for key in [k for k in self._data if k[0] in (tenant, None)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+        with self._sync_lock:
+            self._position = None
+
+
+store = SketchStore()
+
+
+def _resolve_range(db: Session, tenant: Optional[str], date_from: Optional[date], date_to: Optional[date]):
+    if date_from and date_to:
+        return date_from, date_to
+    q = select(func.min(SaleItem.sold_on), func.max(SaleItem.sold_on))
+    if tenant:
+        q = q.where(SaleItem.tenant_id == tenant)
+    lo, hi = db.execute(q).one()
+    return date_from or lo, date_to or hi
+
+
+def _sketches(db: Session, tenant: Optional[str], start: date, end: date, amount) -> List[MonthSketch]:
+    store.sync(db)
+    out: List[MonthSketch] = []
+    for m in _months(start, end):
+        first, last = _month_bounds(m)
+        if first >= start and last <= end:
+            out.append(store.get(db, tenant, m, amount))
+        else:
+            out.append(build_sketch(db, tenant, max(first, start), min(last, end), amount))
+    return out
+
+
+def _bound(variance: float) -> float:
+    return Z_95 * variance ** 0.5
+
+
+def revenue_trend(db: Session, tenant: Optional[str], date_from: Optional[date], date_to: Optional[date], amount) -> Dict[str, Any]:
+    start, end = _resolve_range(db, tenant, date_from, date_to)
+    if start is None or end is None or start > end:
+        return {"approx": True, "confidence": 0.95, "points": [], "distinct_outlets": None, "check_size_cents": {}}
+
+    totals: Dict[date, List[float]] = defaultdict(lambda: [0.0, 0.0])
+    outlets = HyperLogLog(HLL_PRECISION)
+    checks = TDigest(TDIGEST_COMPRESSION)
+    for sk in _sketches(db, tenant, start, end, amount):
+        outlets.merge(sk.outlets)
+        checks.merge(sk.checks)
+        sums: Dict[date, List[float]] = defaultdict(lambda: [0.0, 0.0])
+        for d, _name, _qty, amt in sk.sales.items:
+            if start <= d <= end:
+                sums[d][0] += amt
+                sums[d][1] += amt * amt
+        for d, (s, s2) in sums.items():
+            est, var = sk.sales.estimate_sum(s, s2)
+            totals[d][0] += est
+            totals[d][1] += var
+
+    pcts = {}
+    for q in PERCENTILES:
+        v, lo, hi = checks.quantile(q)
+        pcts[f"p{int(q * 100)}"] = {"value": v, "lower": lo, "upper": hi}
+
+    n_outlets = outlets.count()
+    return {
+        "approx": True,
+        "confidence": 0.95,
+        "points": [
+            {"date": str(d), "total": est, "error": _bound(var)}
+            for d, (est, var) in sorted(totals.items())
+        ],
+        "distinct_outlets": {"estimate": n_outlets, "error": Z_95 * outlets.relative_error * n_outlets},
+        "check_size_cents": pcts,
+    }
+
+
+def top_items(db: Session, tenant: Optional[str], limit: int, date_from: Optional[date], date_to: Optional[date], amount) -> Dict[str, Any]:
+    start, end = _resolve_range(db, tenant, date_from, date_to)
+    if start is None or end is None or start > end:
+        return {"approx": True, "confidence": 0.95, "items": [], "distinct_items": None}
+
+    # name -> [units, units_var, revenue, revenue_var]
+    acc: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0])
+    names = HyperLogLog(HLL_PRECISION)
+    for sk in _sketches(db, tenant, start, end, amount):
+        names.merge(sk.items)
+        # name -> [units, units^2, revenue, revenue^2] over sampled rows in range
+        sums: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0])
+        for d, name, qty, amt in sk.sales.items:
+            if start <= d <= end:
+                s = sums[name]
+                s[0] += qty
+                s[1] += qty * qty
+                s[2] += amt
+                s[3] += amt * amt
+        for name, (u, u2, v, v2) in sums.items():
+            u_est, u_var = sk.sales.estimate_sum(u, u2)
+            v_est, v_var = sk.sales.estimate_sum(v, v2)
+            a = acc[name]
+            a[0] += u_est
+            a[1] += u_var
+            a[2] += v_est
+            a[3] += v_var
+
+    ranked = sorted(acc.items(), key=lambda kv: (kv[1][2], kv[1][0]), reverse=True)[:limit]
+    n_items = names.count()
+    return {
+        "approx": True,
+        "confidence": 0.95,
+        "items": [
+            {
+                "name": name,
+                "units_sold": round(u),
+                "units_error": _bound(uv),
+                "revenue": v,
+                "revenue_error": _bound(vv),
+            }
+            for name, (u, uv, v, vv) in ranked
+        ],
+        "distinct_items": {"estimate": n_items, "error": Z_95 * names.relative_error * n_items},
+    }
@@ -0,0 +1,240 @@
+# app/cache.py
+"""
+Pluggable cache for computed results.
+
+Two backends share one interface:
+  - MemoryCache: in-process LRU with TTL (default; one copy per worker)
+  - SQLiteCache: a local SQLite file in WAL mode shared by every worker on
+    the host; no external service needed and it survives restarts
+
+Keys live in namespaces with a generation counter. invalidate(namespace)
+bumps the generation, which every worker sees on its next lookup.
+get_or_compute() is atomic: only one caller (one thread, or one worker with
+SQLiteCache) computes a missing key while the others wait for its result.
+
+Pick a backend with CACHE_BACKEND=memory|sqlite (CACHE_PATH for the file).
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import BASE_DIR
+
+_MISSING = object()
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def _get(self, key: str) -> Any:
+        """Stored value or _MISSING."""
+
+    @abstractmethod
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None: ...
+
+    @abstractmethod
+    def generation(self, namespace: str) -> int: ...
+
+    @abstractmethod
+    def invalidate(self, namespace: str) -> None:
+        """Drop every key in `namespace` (for all workers sharing the backend)."""
+
+    @abstractmethod
+    def _compute_once(self, key: str, compute: Callable[[], Any], ttl: Optional[float]) -> Any: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{namespace}:{self.generation(namespace)}:{key}"
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        value = self._get(self._key(namespace, key))
+        return default if value is _MISSING else value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._set(self._key(namespace, key), value, ttl)
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        full = self._key(namespace, key)
+        value = self._get(full)
+        if value is not _MISSING:
+            return value
+        return self._compute_once(full, compute, ttl)
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Lock] = {}
+
+    def _get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def invalidate(self, namespace: str) -> None:
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            prefix = f"{namespace}:"
+            for k in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[k]
+
+    def _compute_once(self, key: str, compute: Callable[[], Any], ttl: Optional[float]) -> Any:
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self._get(key)
+            if value is _MISSING:
+                value = compute()
+                self._set(key, value, ttl)
+        with self._lock:
+            self._inflight.pop(key, None)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Shared cache in a local SQLite file. A row in `cache_locks` marks a key
+    as being computed; other workers poll for the value until the lock is
+    released or expires (crashed owner), then compute it themselves.
+    """
+
+    POLL_SECONDS = 0.02
+
+    def __init__(self, path: str, lock_timeout: float = 30.0):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self._owner = uuid.uuid4().hex
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_generations (namespace TEXT PRIMARY KEY, gen INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_locks (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread and per process (never reuse across fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _get(self, key: str) -> Any:
+        row = self._conn().execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return _MISSING
+        return pickle.loads(row[0])
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        expires = time.time() + ttl if ttl else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), expires),
+        )
+
+    def generation(self, namespace: str) -> int:
+        row = self._conn().execute("SELECT gen FROM cache_generations WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, namespace: str) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO cache_generations (namespace, gen) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET gen = gen + 1",
+            (namespace,),
+        )
+        conn.execute("DELETE FROM cache_entries WHERE key >= ? AND key < ?", (f"{namespace}:", f"{namespace};"))
+
+    def _try_lock(self, key: str) -> bool:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_locks WHERE key = ? AND expires_at < ?", (key, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO cache_locks (key, owner, expires_at) VALUES (?, ?, ?)",
+            (key, self._owner, now + self.lock_timeout),
+        )
+        return cur.rowcount == 1
+
+    def _unlock(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache_locks WHERE key = ? AND owner = ?", (key, self._owner))
+
+    def _locked(self, key: str) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM cache_locks WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone() is not None
+
+    def _compute_once(self, key: str, compute: Callable[[], Any], ttl: Optional[float]) -> Any:
+        while True:
+            if self._try_lock(key):
+                try:
+                    value = self._get(key)  # another worker may have finished just before we locked
+                    if value is _MISSING:
+                        value = compute()
+                        self._set(key, value, ttl)
+                    return value
+                finally:
+                    self._unlock(key)
+            while self._locked(key):
+                time.sleep(self.POLL_SECONDS)
+            value = self._get(key)
+            if value is not _MISSING:
+                return value
+
+    def clear(self) -> None:
+        conn = self._conn()
+        for table in ("cache_entries", "cache_generations", "cache_locks"):
+            conn.execute(f"DELETE FROM {table}")
+
+
+_cache: Optional[CacheBackend] = None
+
+
+def get_cache() -> CacheBackend:
+    global _cache
+    if _cache is None:
+        kind = (os.getenv("CACHE_BACKEND") or "memory").strip().lower()
+        if kind == "sqlite":
+            path = os.getenv("CACHE_PATH") or str(BASE_DIR / ".cache" / "steward-cache.sqlite")
+            _cache = SQLiteCache(path)
+        elif kind == "memory":
+            _cache = MemoryCache()
+        else:
+            raise ValueError(f"unknown CACHE_BACKEND: {kind}")
+    return _cache
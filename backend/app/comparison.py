@@ -0,0 +1,223 @@
+# app/comparison.py
+"""
+Multi-period comparison: revenue, covers and average check per outlet for
+any number of periods in one statement.
+
+The periods become a small derived table (a UNION ALL of literal rows:
+idx, start, stop) that revenue_entries and handovers are range-joined
+against, the same [start, stop) shape as dimdate.day_join(). Each side is
+grouped by period and outlet, and the two halves are glued together with
+UNION ALL, so one round trip returns every (period, outlet) total no
+matter how many periods are asked for; overlapping periods are fine
+because a row joins every period that contains it.
+
+Period sets:
+  - kind=day/week/month: the period containing `anchor` (default today)
+    plus `prior` periods before it; ISO weeks run Monday..Sunday
+  - explicit ranges ("YYYY-MM-DD..YYYY-MM-DD"), compared in the order given
+  - yoy=True adds a year-ago twin for each: the same month a year earlier,
+    or 52 weeks earlier for everything else (so weekdays line up)
+
+Average check and percent changes (against the next period in the list
+and against the year-ago twin) are derived in memory.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, Integer, and_, func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from .models import Handover, RevenueEntry
+
+KINDS = ("day", "week", "month")
+MAX_PERIODS = 60
+METRICS = ("revenue", "covers", "avg_check")
+
+
+@dataclass(frozen=True)
+class Period:
+    label: str
+    start: date
+    end: date  # inclusive
+
+
+def period_at(kind: str, d: date) -> Period:
+    if kind == "day":
+        return Period(d.isoformat(), d, d)
+    if kind == "week":
+        monday = d - timedelta(days=d.weekday())
+        iso_year, iso_week, _ = monday.isocalendar()
+        return Period(f"{iso_year}-W{iso_week:02d}", monday, monday + timedelta(days=6))
+    if kind == "month":
+        first = d.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return Period(f"{first.year}-{first.month:02d}", first, last)
+    raise ValueError(f"unknown period kind: {kind}")
+
+
+def year_ago(kind: str, p: Period) -> Period:
+    if kind == "month":
+        return period_at("month", date(p.start.year - 1, p.start.month, 1))
+    if kind in ("day", "week"):
+        return period_at(kind, p.start - timedelta(weeks=52))
+    start, end = p.start - timedelta(weeks=52), p.end - timedelta(weeks=52)
+    return Period(f"{start.isoformat()}..{end.isoformat()}", start, end)
+
+
+def parse_range(text: str) -> Period:
+    """'2024-01-01..2024-01-07' (a single date is a one-day range)."""
+    lo, sep, hi = text.partition("..")
+    try:
+        start = date.fromisoformat(lo.strip())
+        end = date.fromisoformat(hi.strip()) if sep else start
+    except ValueError:
+        raise ValueError(f"invalid period {text!r}; expected YYYY-MM-DD..YYYY-MM-DD") from None
+    if end < start:
+        raise ValueError(f"invalid period {text!r}: ends before it starts")
+    return Period(f"{start.isoformat()}..{end.isoformat()}", start, end)
+
+
+def build_periods(kind: str, prior: int, anchor: date) -> List[Period]:
+    """The period containing `anchor`, then `prior` earlier periods, newest first."""
+    out = [period_at(kind, anchor)]
+    for _ in range(prior):
+        out.append(period_at(kind, out[-1].start - timedelta(days=1)))
+    return out
+
+
+# --- query ------------------------------------------------------------------
+
+def _periods_table(periods: Sequence[Period]):
+    rows = [
+        select(
+            literal(i, Integer).label("idx"),
+            literal(p.start, Date).label("start"),
+            literal(p.end + timedelta(days=1), Date).label("stop"),
+        )
+        for i, p in enumerate(periods)
+    ]
+    return (union_all(*rows) if len(rows) > 1 else rows[0]).subquery("periods")
+
+
+def totals(db: Session, tenant: Optional[str], periods: Sequence[Period],
+           outlets: Optional[Sequence[str]] = None) -> Dict[Tuple[int, str], List[int]]:
+    """{(period index, outlet): [revenue cents, covers]} from one statement."""
+    p = _periods_table(periods)
+    lo = min(x.start for x in periods)
+    hi = max(x.end for x in periods) + timedelta(days=1)
+    rev = (
+        select(p.c.idx, RevenueEntry.outlet.label("outlet"),
+               func.sum(RevenueEntry.amount_cents).label("cents"), literal(0).label("covers"))
+        .select_from(RevenueEntry)
+        .join(p, and_(RevenueEntry.occurred_at >= p.c.start, RevenueEntry.occurred_at < p.c.stop))
+        .where(RevenueEntry.occurred_at >= lo, RevenueEntry.occurred_at < hi)
+        .group_by(p.c.idx, RevenueEntry.outlet)
+    )
+    cov = (
+        select(p.c.idx, Handover.outlet.label("outlet"),
+               literal(0).label("cents"), func.sum(Handover.covers).label("covers"))
+        .select_from(Handover)
+        .join(p, and_(Handover.date >= p.c.start, Handover.date < p.c.stop))
+        .where(Handover.date >= lo, Handover.date < hi)
+        .group_by(p.c.idx, Handover.outlet)
+    )
+    if tenant:
+        rev = rev.where(RevenueEntry.tenant_id == tenant)
+        cov = cov.where(Handover.tenant_id == tenant)
+    if outlets:
+        rev = rev.where(RevenueEntry.outlet.in_(outlets))
+        cov = cov.where(Handover.outlet.in_(outlets))
+
+    out: Dict[Tuple[int, str], List[int]] = {}
+    for idx, outlet, cents, covers in db.execute(union_all(rev, cov)):
+        acc = out.setdefault((idx, outlet), [0, 0])
+        acc[0] += int(cents or 0)
+        acc[1] += int(covers or 0)
+    return out
+
+
+# --- derived metrics ----------------------------------------------------------
+
+def _metrics(cents: int, covers: int) -> Dict[str, float]:
+    revenue = cents / 100.0
+    return {
+        "revenue": revenue,
+        "covers": covers,
+        "avg_check": round(revenue / covers, 2) if covers else 0.0,
+    }
+
+
+def _pct(now: Dict[str, float], base: Dict[str, float]) -> Dict[str, Optional[float]]:
+    return {m: round((now[m] - base[m]) / base[m] * 100.0, 2) if base[m] else None for m in METRICS}
+
+
+def _series(main: Sequence[int], twins: Sequence[int], sums: Dict[int, List[int]]) -> List[Dict[str, Any]]:
+    values = {i: _metrics(*sums.get(i, (0, 0))) for i in (*main, *twins)}
+    out = []
+    for pos, i in enumerate(main):
+        entry: Dict[str, Any] = dict(values[i])
+        if pos + 1 < len(main):
+            entry["vs_prev_pct"] = _pct(values[i], values[main[pos + 1]])
+        if twins:
+            entry["year_ago"] = values[twins[pos]]
+            entry["vs_year_ago_pct"] = _pct(values[i], values[twins[pos]])
+        out.append(entry)
+    return out
+
+
+def plan(kind: str = "week", prior: int = 4, anchor: Optional[date] = None,
+         ranges: Optional[Sequence[str]] = None, yoy: bool = False) -> Tuple[str, List[Period], List[Period]]:
+    """(kind, periods newest first, their year-ago twins); ValueError for a bad request."""
+    if ranges:
+        kind = "custom"
+        main = [parse_range(r) for r in ranges]
+    else:
+        main = build_periods(kind, prior, anchor or date.today())
+    twins = [year_ago(kind, p) for p in main] if yoy else []
+    if len(main) + len(twins) > MAX_PERIODS:
+        raise ValueError(f"too many periods ({len(main) + len(twins)} > {MAX_PERIODS})")
+    return kind, main, twins
+
+
+def _describe(p: Period) -> Dict[str, str]:
+    return {"label": p.label, "from": p.start.isoformat(), "to": p.end.isoformat()}
+
+
+def compare(
+    db: Session,
+    tenant: Optional[str],
+    kind: str = "week",
+    prior: int = 4,
+    anchor: Optional[date] = None,
+    ranges: Optional[Sequence[str]] = None,
+    yoy: bool = False,
+    outlets: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    kind, main, twins = plan(kind, prior, anchor, ranges, yoy)
+    sums = totals(db, tenant, main + twins, outlets)
+    main_idx = list(range(len(main)))
+    twin_idx = list(range(len(main), len(main) + len(twins)))
+
+    per_outlet: Dict[str, Dict[int, List[int]]] = {}
+    overall: Dict[int, List[int]] = {}
+    for (idx, outlet), (cents, covers) in sums.items():
+        per_outlet.setdefault(outlet, {})[idx] = [cents, covers]
+        acc = overall.setdefault(idx, [0, 0])
+        acc[0] += cents
+        acc[1] += covers
+
+    periods = [_describe(p) for p in main]
+    for entry, twin in zip(periods, twins):
+        entry["year_ago"] = _describe(twin)
+    return {
+        "kind": kind,
+        "periods": periods,
+        "total": _series(main_idx, twin_idx, overall),
+        "outlets": [
+            {"outlet": outlet, "series": _series(main_idx, twin_idx, per_outlet[outlet])}
+            for outlet in sorted(per_outlet)
+        ],
+    }
@@ -0,0 +1,250 @@
+# app/compression.py
+"""
+Response compression.
+
+CompressionMiddleware negotiates Accept-Encoding (zstd > br > gzip when the
+client rates them equally; zstd and br only when the optional `zstandard` /
+`brotli` packages are installed) and compresses:
+  - whole bodies of at least COMPRESS_MIN_BYTES
+  - streaming bodies chunk by chunk, flushing after each chunk so clients
+    still see data as it is produced
+
+Responses that already carry Content-Encoding pass through untouched; that
+is how cached analytics payloads (see Payload) ship bytes that were
+compressed once, when the cache entry was computed.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Header
+from fastapi.encoders import jsonable_encoder
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:  # optional codecs
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES") or 500)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+_COMPRESSIBLE = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+_NEVER = ("text/event-stream",)
+
+
+class _Gzip:
+    name = "gzip"
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+    def __init__(self):
+        self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class _Brotli:
+    name = "br"
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _Zstd:
+    name = "zstd"
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+    def __init__(self):
+        self._c = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+# server preference, best first
+CODECS: Dict[str, type] = {
+    name: codec
+    for name, codec, available in (("zstd", _Zstd, zstandard is not None), ("br", _Brotli, brotli is not None), ("gzip", _Gzip, True))
+    if available
+}
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best available encoding for an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    q: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[name.strip().lower()] = weight
+    best, best_q = None, 0.0
+    for name in CODECS:
+        weight = q.get(name, q.get("*", 0.0))
+        if weight > best_q:
+            best, best_q = name, weight
+    return best
+
+
+async def accepted_encoding(accept_encoding: Optional[str] = Header(None)) -> Optional[str]:
+    """Dependency: the encoding negotiate() picks for this request."""
+    return negotiate(accept_encoding)
+
+
+def _compressible(content_type: str) -> bool:
+    ct = content_type.lower()
+    return ct.startswith(_COMPRESSIBLE) and not ct.startswith(_NEVER)
+
+
+# --- precompressed payloads for cached responses ----------------------------
+
+@dataclass
+class Payload:
+    """A JSON body plus every available compressed variant, built once per cache entry."""
+
+    body: bytes
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def from_content(cls, content: Any) -> "Payload":
+        body = json.dumps(jsonable_encoder(content), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        encoded = {}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            encoded = {name: codec.compress(body) for name, codec in CODECS.items()}
+        return cls(body, encoded)
+
+    def response(self, encoding: Optional[str]) -> Response:
+        headers = {"Vary": "Accept-Encoding"}
+        data = self.encoded.get(encoding) if encoding else None
+        if data is None:
+            data = self.body
+        else:
+            headers["Content-Encoding"] = encoding
+        return Response(content=data, media_type="application/json", headers=headers)
+
+
+def cached_payload(compute: Callable[[], Any]) -> Callable[[], Payload]:
+    return lambda: Payload.from_content(compute())
+
+
+# --- middleware -------------------------------------------------------------
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _Responder(self.app, CODECS[encoding], self.minimum_size)(scope, receive, send)
+
+
+class _Responder:
+    def __init__(self, app, codec, minimum_size: int):
+        self.app = app
+        self.codec = codec
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start: Optional[dict] = None
+        self.stream = None      # codec instance once streaming compression has begun
+        self.passthrough = False
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.send = send
+        await self.app(scope, receive, self._send)
+
+    def _headers(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.codec.name
+        headers.add_vary_header("Accept-Encoding")
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+
+    async def _send(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not _compressible(headers.get("content-type", ""))
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.stream is None and not more:
+            # whole body in one message
+            if len(body) < self.minimum_size:
+                await self.send(self.start)
+                await self.send(message)
+                return
+            data = self.codec.compress(body)
+            self._headers(len(data))
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": data})
+            return
+
+        if self.stream is None:
+            self.stream = self.codec()
+            self._headers(None)
+            await self.send(self.start)
+        chunks: List[bytes] = [self.stream.chunk(body)] if body else []
+        if not more:
+            chunks.append(self.stream.finish())
+        await self.send({"type": "http.response.body", "body": b"".join(chunks), "more_body": more})
@@ -1,11 +1,14 @@
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from typing import List
 
 from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from .models import Handover, GuestNote, Incident
-from .schemas import IncidentCreate
+from .comparison import compare
+from .dimdate import day_join
+from .models import DimDate, Handover, GuestNote, Incident, RevenueEntry
+from .schemas.incidents import IncidentCreate
+from .topsales import top_sold
 
 # ---- Handovers ----
 def list_handovers(db: Session) -> List[Handover]:
@@ -27,57 +30,50 @@ def create_incident(db: Session, payload: IncidentCreate) -> Incident:
     return obj
 
 # ---- Analytics helpers ----
-def kpi_summary(db: Session, target: float):
-    # simple 7-day window
-    end = datetime.utcnow()
-    start = end - timedelta(days=7)
-
-    rows = db.execute(
-        select(
-            func.count().label("covers"), 
-            func.coalesce(func.sum(Handover.food_revenue + Handover.beverage_revenue), 0.0)
-        ).where(Handover.date >= start, Handover.date <= end)
-    ).one()
-
-    covers = rows[0] or 0
-    revenue = float(rows[1] or 0.0)
-    avg_check = (revenue / covers) if covers else 0.0
-
-    prev_start = start - timedelta(days=7)
-    prev_end = start
-    prev_rev = float(
-        db.execute(
-            select(func.coalesce(func.sum(Handover.food_revenue + Handover.beverage_revenue), 0.0))
-            .where(Handover.date >= prev_start, Handover.date <= prev_end)
-        ).scalar() or 0.0
-    )
-    delta = revenue - prev_rev
+def kpi_summary(db: Session, target: float, tenant: str | None = None):
+    # last 7 days against the 7 before, both from one grouped query
+    end = date.today()
+    start = end - timedelta(days=6)
+    prev_start, prev_end = start - timedelta(days=7), start - timedelta(days=1)
+    out = compare(db, tenant, ranges=[f"{start}..{end}", f"{prev_start}..{prev_end}"])
+    current, previous = out["total"]
+    revenue = current["revenue"]
 
     return {
-        "window": f"{start.date()} \u2192 {end.date()}",
-        "covers": covers,
+        "window": f"{start} \u2192 {end}",
+        "covers": current["covers"],
         "revenue": revenue,
-        "avg_check": avg_check,
-        "revenue_vs_prev": delta,
+        "avg_check": current["avg_check"],
+        "revenue_vs_prev": revenue - previous["revenue"],
+        "revenue_vs_prev_pct": current["vs_prev_pct"]["revenue"],
         "target": target,
         "target_gap": target - revenue,
     }
 
-def top_items(db: Session, limit: int):
-    # flatten top_sales arrays
-    from collections import Counter
-    items: Counter[str] = Counter()
-    for h in db.execute(select(Handover.top_sales)).all():
-        for name in (h[0] or []):
-            items[name] += 1
-    return [{"item": k, "count": v} for k, v in items.most_common(limit)]
+def top_items(db: Session, limit: int, tenant: str | None = None):
+    # indexed GROUP BY over the normalized handover_top_sales table
+    return top_sold(db, tenant=tenant, limit=limit)
 
-def weekly_revenue(db: Session, weeks: int):
-    from collections import defaultdict
-    buckets = defaultdict(float)
-    for h in db.execute(select(Handover.date, Handover.food_revenue, Handover.beverage_revenue)).all():
-        iso_year, iso_week, _ = h[0].isocalendar()
-        key = f"{iso_year}-W{iso_week:02d}"
-        buckets[key] += float((h[1] or 0) + (h[2] or 0))
-    keys = sorted(buckets.keys())[-weeks:]
-    return [{"week": k, "revenue": buckets[k], "covers": 0} for k in keys]
+def weekly_revenue(db: Session, weeks: int, tenant: str | None = None):
+    # ISO weeks come from dim_date: an equality join for handover dates and a
+    # [date, next_day) range join for revenue timestamps, no per-row bucketing
+    cutoff = date.today() - timedelta(weeks=weeks)
+    rev = (
+        select(DimDate.iso_week_label, func.sum(RevenueEntry.amount_cents))
+        .join(RevenueEntry, day_join(RevenueEntry.occurred_at))
+        .where(DimDate.date > cutoff)
+        .group_by(DimDate.iso_week_label)
+    )
+    cov = (
+        select(DimDate.iso_week_label, func.sum(Handover.covers))
+        .join(Handover, Handover.date == DimDate.date)
+        .where(DimDate.date > cutoff)
+        .group_by(DimDate.iso_week_label)
+    )
+    if tenant:
+        rev = rev.where(RevenueEntry.tenant_id == tenant)
+        cov = cov.where(Handover.tenant_id == tenant)
+    revenue = {w: (cents or 0) / 100.0 for w, cents in db.execute(rev)}
+    covers = {w: int(n or 0) for w, n in db.execute(cov)}
+    keys = sorted(revenue.keys() | covers.keys())[-weeks:]
+    return [{"week": k, "revenue": revenue.get(k, 0.0), "covers": covers.get(k, 0)} for k in keys]
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # 1) DATABASE_URL from env, fallback to local sqlite file in project root
@@ -11,6 +11,13 @@ if DATABASE_URL.startswith("sqlite"):
         DATABASE_URL,
         connect_args={"check_same_thread": False}
     )
+
+    # SQLite ignores foreign keys (and so ON DELETE CASCADE) unless asked, per connection
+    @event.listens_for(engine, "connect")
+    def _sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
 else:
     engine = create_engine(DATABASE_URL)
 
@@ -27,3 +34,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# 6) Statement timeouts / cancellation hooks for every engine (see app/timeouts.py)
+from . import timeouts  # noqa: E402,F401
+
+# 7) Slow-query log (see app/slowlog.py)
+from . import slowlog  # noqa: E402,F401
@@ -0,0 +1,157 @@
+# app/dimdate.py
+"""
+dim_date: a generated calendar table.
+
+Rows cover DIM_DATE_START..DIM_DATE_END with ISO week, month, quarter,
+weekday, fiscal period (FISCAL_YEAR_START_MONTH, fiscal years named for
+the calendar year they end in) and holiday flags. Holidays are New Year's
+Day, Good Friday, Easter Monday, Christmas Day and Boxing Day, plus any
+EXTRA_HOLIDAYS ("MM-DD" every year or "YYYY-MM-DD" once, optionally
+":Name", comma-separated).
+
+Analytics group by its label columns after an equality join on a DATE
+column (or a [date, next_day) range join for timestamps), so bucketing by
+week, month or fiscal period needs no per-row date functions. ensure()
+fills missing days and runs after create_all and in the migration; label()
+gives days outside the table the label their row would have, and day_of()
+their date in an outer join.
+"""
+from __future__ import annotations
+
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Date, and_, event, func, insert, select
+from sqlalchemy.engine import Connection
+
+from .db import Base
+from .models import DimDate
+
+DIM_DATE_START = date.fromisoformat(os.getenv("DIM_DATE_START") or "2015-01-01")
+DIM_DATE_END = date.fromisoformat(os.getenv("DIM_DATE_END") or "2035-12-31")
+FISCAL_YEAR_START_MONTH = int(os.getenv("FISCAL_YEAR_START_MONTH") or 1)
+
+# revenue-trend style buckets -> label column
+BUCKETS = {
+    "day": DimDate.date,
+    "week": DimDate.iso_week_label,
+    "month": DimDate.month_label,
+    "fiscal_period": DimDate.fiscal_label,
+}
+
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _extra_holidays() -> Tuple[Dict[Tuple[int, int], str], Dict[date, str]]:
+    yearly: Dict[Tuple[int, int], str] = {}
+    once: Dict[date, str] = {}
+    for entry in (os.getenv("EXTRA_HOLIDAYS") or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        when, _, name = entry.partition(":")
+        name = name.strip() or "Holiday"
+        if len(when) == 5:
+            yearly[(int(when[:2]), int(when[3:]))] = name
+        else:
+            once[date.fromisoformat(when)] = name
+    return yearly, once
+
+
+def holidays(year: int) -> Dict[date, str]:
+    easter = _easter(year)
+    out = {
+        date(year, 1, 1): "New Year's Day",
+        easter - timedelta(days=2): "Good Friday",
+        easter + timedelta(days=1): "Easter Monday",
+        date(year, 12, 25): "Christmas Day",
+        date(year, 12, 26): "Boxing Day",
+    }
+    yearly, once = _extra_holidays()
+    out.update({date(year, m, d): name for (m, d), name in yearly.items()})
+    out.update({d: name for d, name in once.items() if d.year == year})
+    return out
+
+
+def fiscal(d: date, start_month: int = FISCAL_YEAR_START_MONTH) -> Tuple[int, int]:
+    """(fiscal_year, fiscal_period) for a day."""
+    period = (d.month - start_month) % 12 + 1
+    year = d.year + 1 if start_month > 1 and d.month >= start_month else d.year
+    return year, period
+
+
+def rows(start: date, end: date) -> Iterator[dict]:
+    hol: Dict[date, str] = {}
+    for y in range(start.year, end.year + 1):
+        hol.update(holidays(y))
+    d = start
+    while d <= end:
+        iso_year, iso_week, iso_day = d.isocalendar()
+        fy, fp = fiscal(d)
+        yield {
+            "date": d,
+            "next_day": d + timedelta(days=1),
+            "year": d.year,
+            "quarter": (d.month - 1) // 3 + 1,
+            "month": d.month,
+            "month_label": f"{d.year}-{d.month:02d}",
+            "iso_year": iso_year,
+            "iso_week": iso_week,
+            "iso_week_label": f"{iso_year}-W{iso_week:02d}",
+            "week_start": d - timedelta(days=iso_day - 1),
+            "weekday": iso_day - 1,
+            "is_weekend": iso_day >= 6,
+            "fiscal_year": fy,
+            "fiscal_quarter": (fp - 1) // 3 + 1,
+            "fiscal_period": fp,
+            "fiscal_label": f"FY{fy}-P{fp:02d}",
+            "is_holiday": d in hol,
+            "holiday_name": hol.get(d),
+        }
+        d += timedelta(days=1)
+
+
+def ensure(conn: Connection, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Insert any missing days in [start, end]; returns the number added."""
+    start, end = start or DIM_DATE_START, end or DIM_DATE_END
+    have = set(conn.execute(select(DimDate.date).where(DimDate.date >= start, DimDate.date <= end)).scalars())
+    missing: List[dict] = [r for r in rows(start, end) if r["date"] not in have]
+    if missing:
+        conn.execute(insert(DimDate), missing)
+    return len(missing)
+
+
+def label(bucket: str, d: date) -> str:
+    """`d`'s label for a BUCKETS key, as its dim_date row would have it."""
+    return str(next(rows(d, d))[BUCKETS[bucket].key])
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw) -> None:
+    ensure(connection)
+
+
+def day_join(ts_column):
+    """Join condition mapping a DateTime column onto its dim_date day without per-row functions."""
+    return and_(ts_column >= DimDate.date, ts_column < DimDate.next_day)
+
+
+def day_of(ts_column):
+    """
+    The day of a DateTime column outer-joined on day_join(): its dim_date
+    row's, or for timestamps outside DIM_DATE_START..END the column's own date.
+    """
+    return func.coalesce(DimDate.date, func.date(ts_column), type_=Date)
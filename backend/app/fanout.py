@@ -0,0 +1,111 @@
+# app/fanout.py
+"""
+Cross-tenant fan-out for chain-wide analytics.
+
+fan_out() runs one per-tenant computation for each tenant on a shared
+thread pool, every call with its own session, and times each one. The
+merge helpers combine the partial aggregates: sums add up, daily series
+are summed per date, and top-K lists are merged with a heap over the
+summed per-item totals (each tenant returns every item, not just its own
+top K, so an item that is mid-table everywhere still ranks correctly).
+
+Threads rather than processes: the work is database-bound and drivers
+release the GIL while a query runs, so a thread pool gets the parallelism
+without a per-call process start or connection setup.
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import timeouts
+from .db import SessionLocal
+
+log = logging.getLogger(__name__)
+
+ADMIN_FANOUT_WORKERS = int(os.getenv("ADMIN_FANOUT_WORKERS") or 8)
+
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=ADMIN_FANOUT_WORKERS, thread_name_prefix="fanout")
+    return _pool
+
+
+@dataclass
+class Partial:
+    tenant: str
+    value: Any
+    elapsed_ms: float
+    error: Optional[str] = None
+
+
+def _run(tenant: str, fn: Callable[[Any, str], Any], budget: Optional[timeouts.QueryBudget]) -> Partial:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with timeouts.scope(budget):
+            value, error = fn(db, tenant), None
+    except Exception as exc:  # one bad tenant must not sink the chain-wide answer
+        log.exception("fan-out failed for tenant %s", tenant)
+        value, error = None, f"{type(exc).__name__}: {exc}"
+    finally:
+        db.close()
+    return Partial(tenant, value, round((time.perf_counter() - started) * 1000.0, 3), error)
+
+
+def fan_out(tenants: Iterable[str], fn: Callable[[Any, str], Any]) -> List[Partial]:
+    """fn(db, tenant) for every tenant in parallel; results keep the tenant order."""
+    # pool threads do not inherit the request context: hand each call its own
+    # budget so the request's statement timeout and disconnect still apply
+    parent = timeouts.current()
+    return list(_executor().map(lambda t: _run(t, fn, parent.child() if parent else None), tenants))
+
+
+def timings(partials: Sequence[Partial]) -> List[Dict[str, Any]]:
+    """Per-tenant timing, slowest first."""
+    rows = [
+        {"tenant": p.tenant, "elapsed_ms": p.elapsed_ms, "ok": p.error is None, **({"error": p.error} if p.error else {})}
+        for p in partials
+    ]
+    return sorted(rows, key=lambda r: -r["elapsed_ms"])
+
+
+def merge_sums(parts: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in parts:
+        for k, v in part.items():
+            out[k] = out.get(k, 0.0) + v
+    return out
+
+
+def merge_series(parts: Iterable[Iterable[Tuple[Any, float]]]) -> List[Tuple[Any, float]]:
+    """Sum (key, value) series by key; output sorted by key."""
+    out: Dict[Any, float] = {}
+    for part in parts:
+        for k, v in part:
+            out[k] = out.get(k, 0.0) + v
+    return sorted(out.items())
+
+
+def merge_top_k(parts: Iterable[Iterable[Tuple[str, float, float]]], k: int) -> List[Tuple[str, float, float]]:
+    """
+    Merge (name, units, revenue) partials into the chain-wide top k by
+    revenue, then units, then name.
+    """
+    units: Dict[str, float] = {}
+    revenue: Dict[str, float] = {}
+    for part in parts:
+        for name, u, r in part:
+            units[name] = units.get(name, 0.0) + u
+            revenue[name] = revenue.get(name, 0.0) + r
+    best = heapq.nsmallest(k, revenue, key=lambda n: (-revenue[n], -units[n], n))
+    return [(n, units[n], revenue[n]) for n in best]
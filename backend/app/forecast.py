@@ -0,0 +1,244 @@
+# app/forecast.py
+"""
+Next-week revenue and covers projections per outlet.
+
+History is a dense outlets x days matrix (revenue from RevenueEntry, covers
+from Handover) and all three models are fitted for every outlet at once:
+  - seasonal naive: the most recent value seen for each weekday
+  - simple exponential smoothing: alpha picked per outlet from ALPHA_GRID by
+    one-step-ahead SSE (all grid alphas are run side by side)
+  - day-of-week mean: average per weekday
+
+Fitted state is cached per (tenant, metric) together with a copy taken
+FORECAST_REFOLD_DAYS before its last day. A refit restores that copy and
+folds the trailing window back in with the days that closed since, so
+entries recorded late for a recent day are counted and repeat calls
+cost one small query. Writes to older days are found in the change log
+(app/outbox.py) and trigger a full refit. Today is never folded in
+because its totals are still moving.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import outbox
+from .dimdate import day_join, day_of
+from .models import ChangeLog, DimDate, Handover, RevenueEntry
+
+ALPHA_GRID = np.linspace(0.05, 0.95, 19)
+REFOLD_DAYS = int(os.getenv("FORECAST_REFOLD_DAYS") or 7)
+
+# metric -> (source table, day of a change's row image)
+_SOURCES = {"revenue": ("revenue_entries", "occurred_at"), "covers": ("handovers", "date")}
+
+
+@dataclass
+class FitState:
+    outlets: List[str]
+    first_day: date
+    last_day: date            # last closed day folded into the state
+    levels: np.ndarray        # (outlets, alphas) SES level for each grid alpha
+    sse: np.ndarray           # (outlets, alphas) one-step-ahead squared error
+    last_by_weekday: np.ndarray  # (outlets, 7) most recent value per weekday
+    dow_sums: np.ndarray      # (outlets, 7)
+    dow_counts: np.ndarray    # (7,)
+
+    def fold(self, days: List[date], y: np.ndarray) -> None:
+        """Advance every model by the day columns in y (outlets x len(days))."""
+        for j, d in enumerate(days):
+            col = y[:, j]
+            err = col[:, None] - self.levels
+            self.sse += err * err
+            self.levels += ALPHA_GRID[None, :] * err
+            wd = d.weekday()
+            self.last_by_weekday[:, wd] = col
+            self.dow_sums[:, wd] += col
+            self.dow_counts[wd] += 1
+        if days:
+            self.last_day = days[-1]
+
+    def copy(self) -> "FitState":
+        return replace(
+            self, outlets=list(self.outlets), levels=self.levels.copy(), sse=self.sse.copy(),
+            last_by_weekday=self.last_by_weekday.copy(), dow_sums=self.dow_sums.copy(),
+            dow_counts=self.dow_counts.copy(),
+        )
+
+
+@dataclass
+class _Fit:
+    state: FitState     # through the last closed day
+    base: FitState      # REFOLD_DAYS earlier; refits fold forward from here
+    position: int       # last change_log id looked at
+
+
+_cache: Dict[Tuple[str, str], _Fit] = {}
+_key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def _midnight(d: date) -> datetime:
+    return datetime.combine(d, datetime.min.time())
+
+
+def _daily(db: Session, tenant: str, metric: str, after: Optional[date], until: date) -> Dict[Tuple[str, date], float]:
+    if metric == "revenue":
+        # outer join: entries outside the calendar range keep their own date
+        day = day_of(RevenueEntry.occurred_at)
+        q = (
+            select(RevenueEntry.outlet, day, func.sum(RevenueEntry.amount_cents) / 100.0)
+            .select_from(RevenueEntry)
+            .outerjoin(DimDate, day_join(RevenueEntry.occurred_at))
+            .where(RevenueEntry.tenant_id == tenant, RevenueEntry.occurred_at < _midnight(until + timedelta(days=1)))
+            .group_by(RevenueEntry.outlet, day)
+        )
+        if after:
+            q = q.where(RevenueEntry.occurred_at >= _midnight(after + timedelta(days=1)))
+    else:
+        q = (
+            select(Handover.outlet, Handover.date, func.sum(Handover.covers))
+            .where(Handover.tenant_id == tenant, Handover.date <= until)
+            .group_by(Handover.outlet, Handover.date)
+        )
+        if after:
+            q = q.where(Handover.date > after)
+    out: Dict[Tuple[str, date], float] = {}
+    for outlet, d, v in db.execute(q):
+        d = d if isinstance(d, date) else date.fromisoformat(str(d))
+        out[(outlet, d)] = float(v or 0.0)
+    return out
+
+
+def _matrix(points: Dict[Tuple[str, date], float], outlets: List[str], days: List[date]) -> np.ndarray:
+    row = {o: i for i, o in enumerate(outlets)}
+    col = {d: j for j, d in enumerate(days)}
+    y = np.zeros((len(outlets), len(days)))
+    for (o, d), v in points.items():
+        if o in row and d in col:
+            y[row[o], col[d]] = v
+    return y
+
+
+def _span(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _fold_from(base: FitState, points: Dict[Tuple[str, date], float], through: date) -> Tuple[FitState, FitState]:
+    """(state through `through`, copy REFOLD_DAYS before it), folded forward from `base`."""
+    state = base.copy()
+    days = _span(base.last_day + timedelta(days=1), through)
+    split = max(0, len(days) - REFOLD_DAYS)
+    y = _matrix(points, state.outlets, days)
+    state.fold(days[:split], y[:, :split])
+    new_base = state.copy()
+    state.fold(days[split:], y[:, split:])
+    return state, new_base
+
+
+def _full_fit(db: Session, tenant: str, metric: str, through: date) -> Optional[Tuple[FitState, FitState]]:
+    points = _daily(db, tenant, metric, None, through)
+    if not points:
+        return None
+    outlets = sorted({o for o, _ in points})
+    first = min(d for _, d in points)
+    y0 = _matrix(points, outlets, [first])
+    n = len(outlets)
+    start = FitState(
+        outlets=outlets,
+        first_day=first,
+        last_day=first - timedelta(days=1),
+        levels=np.repeat(y0, len(ALPHA_GRID), axis=1),
+        sse=np.zeros((n, len(ALPHA_GRID))),
+        last_by_weekday=np.zeros((n, 7)),
+        dow_sums=np.zeros((n, 7)),
+        dow_counts=np.zeros(7),
+    )
+    return _fold_from(start, points, through)
+
+
+def _changed_days(db: Session, tenant: str, metric: str, after: int) -> Tuple[List[date], int]:
+    """Days of the metric's rows written since change `after`, and the last change id read."""
+    table, column = _SOURCES[metric]
+    days: List[date] = []
+    while True:
+        changes = outbox.read_changes(db, after, 1000, tenant=tenant, tables=(table,))
+        if not changes:
+            return days, after
+        for c in changes:
+            days.extend(date.fromisoformat(str(image[column])[:10]) for image in (c.old, c.new) if image)
+        after = changes[-1].id
+
+
+def fit(db: Session, tenant: str, metric: str, today: Optional[date] = None) -> Optional[FitState]:
+    """Cached fit through yesterday; refolds the trailing window when days closed or data changed."""
+    through = (today or date.today()) - timedelta(days=1)
+    key = (tenant, metric)
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            changed, position = _changed_days(db, tenant, metric, cached.position)
+            changed = [d for d in changed if d <= cached.state.last_day]
+            if not changed and cached.state.last_day >= through:
+                cached.position = position
+                return cached.state
+            if not changed or min(changed) > cached.base.last_day:
+                points = _daily(db, tenant, metric, cached.base.last_day, through)
+                if {o for o, _ in points} <= set(cached.base.outlets):
+                    state, base = _fold_from(cached.base, points, max(through, cached.state.last_day))
+                    _cache[key] = _Fit(state, base, position)
+                    return state
+        # first call, a new outlet appeared, or a day before the refold window changed
+        position = db.execute(select(func.max(ChangeLog.id))).scalar() or 0
+        fitted = _full_fit(db, tenant, metric, through)
+        if fitted is None:
+            return None
+        _cache[key] = _Fit(*fitted, position)
+        return fitted[0]
+
+
+def forecast(db: Session, tenant: str, metric: str, horizon: int = 7, today: Optional[date] = None) -> Dict[str, Any]:
+    state = fit(db, tenant, metric, today)
+    if state is None:
+        return {"metric": metric, "dates": [], "outlets": []}
+    dates = [state.last_day + timedelta(days=h) for h in range(1, horizon + 1)]
+    wds = np.array([d.weekday() for d in dates])
+
+    best = np.argmin(state.sse, axis=1)
+    rows = np.arange(len(state.outlets))
+    ses_level = state.levels[rows, best]
+    ses_alpha = ALPHA_GRID[best]
+    seasonal = state.last_by_weekday[:, wds]
+    dow = (state.dow_sums / np.maximum(state.dow_counts, 1))[:, wds]
+
+    return {
+        "metric": metric,
+        "history": {"from": str(state.first_day), "to": str(state.last_day)},
+        "dates": [str(d) for d in dates],
+        "outlets": [
+            {
+                "outlet": outlet,
+                "seasonal_naive": seasonal[i].round(2).tolist(),
+                "exp_smoothing": [round(float(ses_level[i]), 2)] * horizon,
+                "alpha": round(float(ses_alpha[i]), 2),
+                "day_of_week_mean": dow[i].round(2).tolist(),
+            }
+            for i, outlet in enumerate(state.outlets)
+        ],
+    }
+
+
+def clear_cache(tenant: Optional[str] = None) -> None:
+    """Forget fitted state, for one tenant or all of them."""
+    with _lock:
+        for key in [k for k in _cache if tenant is None or k[0] == tenant]:
+            del _cache[key]
@@ -1,12 +1,71 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from . import outbox, warmup
+from .compression import CompressionMiddleware
+from .reports import scheduler as report_scheduler
+from .slowlog import RequestContextMiddleware
+from .timeouts import (
+    CancelOnDisconnectMiddleware,
+    QueryCancelled,
+    QueryTimeout,
+    query_cancelled_handler,
+    query_timeout_handler,
+)
 
 # Import your routers
+from .api import admin
 from .api import analytics
+from .api import changes
+from .api import guest_notes
 from .api import handover
+from .api import handovers
 from .api import incidents
+from .api import ops
+from .api import reports
+from .api import search
+
+def _enabled(name: str) -> bool:
+    return (os.getenv(name) or "on").strip().lower() not in ("0", "off", "false")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # build reports for closed periods in the background (REPORT_SCHEDULER=off to disable)
+    reports_on = _enabled("REPORT_SCHEDULER")
+    if reports_on:
+        report_scheduler.start()
+    # delete change_log rows past retention (CHANGE_LOG_PRUNE=off to disable)
+    pruning = _enabled("CHANGE_LOG_PRUNE")
+    if pruning:
+        outbox.pruner.start()
+    # serve /healthz at once; /readyz waits for the warm-up (WARMUP=off to skip it)
+    warming = None
+    if warmup.WARMUP_ENABLED:
+        warming = asyncio.create_task(run_in_threadpool(warmup.run))
+    else:
+        warmup.skip()
+    try:
+        yield
+    finally:
+        if warming is not None and not warming.done():
+            warming.cancel()
+        if reports_on:
+            report_scheduler.stop()
+        if pruning:
+            outbox.pruner.stop()
 
-app = FastAPI(title="Legacy Skye Steward API")
+
+app = FastAPI(title="Legacy Skye Steward API", lifespan=lifespan)
+
+# Middleware added later wraps the earlier ones: a request passes
+# RequestContext -> CancelOnDisconnect -> Compression -> CORS -> routes.
 
 # CORS for the Vite dev server
 app.add_middleware(
@@ -17,11 +76,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/br/zstd for large or streaming bodies (outside CORS, so the headers it adds are kept)
+app.add_middleware(CompressionMiddleware)
+
+# per-request statement budget; interrupts the query in flight when the client goes away
+app.add_middleware(CancelOnDisconnectMiddleware)
+app.add_exception_handler(QueryTimeout, query_timeout_handler)
+app.add_exception_handler(QueryCancelled, query_cancelled_handler)
+
+# tenant and route for the slow-query log (SLOW_QUERY_MS / SLOW_QUERY_LOG)
+app.add_middleware(RequestContextMiddleware)
+
 # --- IMPORTANT: give each router a non-empty include prefix ---
 app.include_router(analytics.router)                    # already has prefix="/api/analytics"
+app.include_router(admin.router)                        # prefix="/api/admin/analytics"
+app.include_router(changes.router)                      # prefix="/api/changes"
 app.include_router(handover.router,  prefix="/api/handover")
+app.include_router(handovers.router)                    # prefix="/api/handovers"
 app.include_router(incidents.router, prefix="/api/incidents")
+app.include_router(ops.router)                          # prefix="/api/ops"
+app.include_router(reports.router)                      # prefix="/api/reports"
+app.include_router(guest_notes.router)                  # prefix="/api"
+app.include_router(search.router)                       # prefix="/api"
 
 @app.get("/healthz")
 def healthz():
     return {"ok": True}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 503 until the startup warm-up has finished."""
+    state = warmup.readiness.as_dict()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
@@ -0,0 +1,121 @@
+# app/modelmeta.py
+"""
+Model metadata registry, built once when the app imports it.
+
+META[model] holds what handlers used to work out on every request:
+  - row_type: the read model (app/readmodels.py)
+  - order_by: the list endpoints' order, newest first
+  - amount: for SaleItem, the revenue expression of a row, resolved from
+    whichever unit-price or line-total column the schema has (literal 0.0
+    if none); None for other models
+
+encoder(row_type, exclude) is a cached row-to-dict encoder for ORM objects
+and read-model rows alike (attribute access); row_dicts() is the
+positional fast path for result rows of a statement selecting the row
+type's columns.
+
+list_statement(row_type) is the tenant-scoped, ordered, paginated SELECT
+for a read model (or one of its projections), with :tenant / :limit /
+:offset bind parameters; it is built once per row type, so a list
+request only binds values and SQLAlchemy finds the compiled form in its
+statement cache straight away.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import Select, bindparam, func, literal
+
+from .models import GuestNote, Handover, HandoverTopSale, Incident, RevenueEntry, SaleItem
+from .readmodels import GuestNoteRow, HandoverRow, IncidentRow, read_model, select_rows
+
+# unit price columns (multiplied by qty), then columns that already hold a line total
+_UNIT_PRICE_COLUMNS = ("unit_price", "unitprice", "rate", "price")
+_TOTAL_COLUMNS = ("amount", "total", "total_amount", "total_price", "line_total", "subtotal")
+
+_SALES_MODELS = (SaleItem,)
+
+# list order per model; each matches a (tenant_id, ...) index
+_LIST_ORDER = {
+    Handover: ("date", "id"),
+    Incident: ("id",),
+    GuestNote: ("created_at", "id"),
+}
+
+Encoder = Callable[[Any], Dict[str, Any]]
+
+
+def resolve_amount(model):
+    """Revenue of one row: qty * unit price, else a line total, else 0.0 (unknown schema)."""
+    for unit_col in _UNIT_PRICE_COLUMNS:
+        if hasattr(model, unit_col) and hasattr(model, "qty"):
+            return func.coalesce(getattr(model, "qty"), 0) * func.coalesce(getattr(model, unit_col), 0)
+    for total_col in _TOTAL_COLUMNS:
+        if hasattr(model, total_col):
+            return func.coalesce(getattr(model, total_col), 0)
+    return literal(0.0)
+
+
+@lru_cache(maxsize=256)
+def encoder(row_type: Type[tuple], exclude: Tuple[str, ...] = ()) -> Encoder:
+    """dict encoder for `row_type`'s fields minus `exclude`; works on ORM objects too."""
+    keep = tuple(f for f in row_type._fields if f not in exclude)
+    if len(keep) == 1:
+        (only,) = keep
+        return lambda obj: {only: getattr(obj, only)}
+    get = attrgetter(*keep)
+    return lambda obj: dict(zip(keep, get(obj)))
+
+
+def row_dicts(row_type: Type[tuple], rows) -> List[Dict[str, Any]]:
+    """Result rows selected in `row_type`'s column order (list_statement) as dicts, positionally."""
+    fields = row_type._fields
+    return [dict(zip(fields, r)) for r in rows]
+
+
+@dataclass(frozen=True)
+class ModelMeta:
+    model: type
+    row_type: Type[tuple]
+    order_by: Tuple[Any, ...]
+    amount: Any
+
+    def list_statement(self, row_type: Optional[Type[tuple]] = None) -> Select:
+        return _list_statement(self.model, row_type or self.row_type)
+
+
+@lru_cache(maxsize=256)
+def _list_statement(model, row_type) -> Select:
+    meta = META[model]
+    return (
+        select_rows(row_type)
+        .where(model.tenant_id == bindparam("tenant"))
+        .order_by(*meta.order_by)
+        .limit(bindparam("limit"))
+        .offset(bindparam("offset"))
+    )
+
+
+def _build(model, row_type: Optional[Type[tuple]] = None) -> ModelMeta:
+    row_type = row_type or read_model(model)
+    order = _LIST_ORDER.get(model, ("id",))
+    return ModelMeta(
+        model=model,
+        row_type=row_type,
+        order_by=tuple(getattr(model, c).desc() for c in order if c in row_type._fields),
+        amount=resolve_amount(model) if model in _SALES_MODELS else None,
+    )
+
+
+META: Dict[type, ModelMeta] = {
+    Handover: _build(Handover, HandoverRow),
+    Incident: _build(Incident, IncidentRow),
+    GuestNote: _build(GuestNote, GuestNoteRow),
+    HandoverTopSale: _build(HandoverTopSale),
+    SaleItem: _build(SaleItem),
+    RevenueEntry: _build(RevenueEntry),
+}
+
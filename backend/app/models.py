@@ -1,5 +1,9 @@
+import json
 from datetime import date, datetime
-from sqlalchemy import Column, Integer, String, Date, DateTime, BigInteger, Index
+from typing import Any, List
+from sqlalchemy import Column, Integer, String, Date, DateTime, BigInteger, Boolean, Index, SmallInteger, Text, ForeignKey, event, func, inspect
+from sqlalchemy.orm import Session, relationship
+from sqlalchemy.orm.base import NEVER_SET, NO_VALUE
 from .db import Base
 
 TENANT_LEN = 64  # easy for slugs like 'legacy', 'azure', etc.
@@ -13,6 +17,49 @@ class Handover(Base):
     shift = Column(String(10), nullable=False)  # AM/PM
     covers = Column(Integer, nullable=False, default=0)
 
+    top_sale_rows = relationship(
+        "HandoverTopSale", cascade="all, delete-orphan", passive_deletes=True, order_by="HandoverTopSale.id"
+    )
+
+    @property
+    def top_sales(self) -> List[str]:
+        return [r.item for r in self.top_sale_rows]
+
+    @top_sales.setter
+    def top_sales(self, value: Any) -> None:
+        self.top_sale_rows = [HandoverTopSale(item=item) for item in parse_top_sales(value)]
+
+class HandoverTopSale(Base):
+    """One row per item in a handover's top sales (normalized from the old top_sales field)."""
+    __tablename__ = "handover_top_sales"
+    id = Column(Integer, primary_key=True)
+    handover_id = Column(Integer, ForeignKey("handovers.id", ondelete="CASCADE"), nullable=False, index=True)
+    tenant_id = Column(String(TENANT_LEN), nullable=False)
+    date = Column(Date, nullable=False)
+    item = Column(String(160), nullable=False)
+
+def parse_top_sales(value: Any) -> List[str]:
+    """
+    Accepts every shape top_sales has been stored as: a list, a JSON list
+    string (possibly double-encoded), or a comma-joined string.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return []
+        try:
+            decoded = json.loads(text)
+        except ValueError:
+            return [p.strip() for p in text.split(",") if p.strip()]
+        if isinstance(decoded, str) and decoded != text:
+            return parse_top_sales(decoded)
+        value = decoded if isinstance(decoded, list) else [decoded]
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return [str(v).strip() for v in value if v is not None and str(v).strip()]
+
 class Incident(Base):
     __tablename__ = "incidents"
     id = Column(Integer, primary_key=True, index=True)
@@ -22,6 +69,27 @@ class Incident(Base):
     title = Column(String(200), nullable=False)
     status = Column(String(20), nullable=False, index=True)  # OPEN/IN_PROGRESS/CLOSED
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    status_changed_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+    resolved_at = Column(DateTime, nullable=True)  # set while status is in RESOLVED_STATUSES
+
+RESOLVED_STATUSES = ("CLOSED", "RESOLVED")
+
+def incident_status_values(status: str, now: datetime) -> dict:
+    """Column values for moving an incident to `status` at `now` (also used by bulk UPDATEs)."""
+    return {
+        "status": status,
+        "status_changed_at": now,
+        "resolved_at": now if status.upper() in RESOLVED_STATUSES else None,
+    }
+
+@event.listens_for(Incident.status, "set", active_history=True)
+def _stamp_status_change(target, value, oldvalue, initiator) -> None:
+    # new rows get their defaults at INSERT; only transitions are stamped here
+    if oldvalue is NO_VALUE or oldvalue is NEVER_SET or oldvalue == value:
+        return
+    stamped = incident_status_values(value, datetime.utcnow())
+    target.status_changed_at = stamped["status_changed_at"]
+    target.resolved_at = stamped["resolved_at"]
 
 class SaleItem(Base):
     __tablename__ = "sale_items"
@@ -41,8 +109,89 @@ class RevenueEntry(Base):
     occurred_at = Column(DateTime, nullable=False, index=True, default=datetime.utcnow)
     description = Column(String(200), nullable=True)
 
+class GuestNote(Base):
+    __tablename__ = "guest_notes"
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(String(TENANT_LEN), nullable=False, index=True)
+    guest_name = Column(String(160), nullable=False)
+    room = Column(String(20), nullable=True)
+    note = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class DimDate(Base):
+    """
+    Calendar dimension, one row per day (filled by app/dimdate.py). Join on
+    `date` (or the [date, next_day) range for timestamps) and group by the
+    label columns instead of computing periods per row.
+    """
+    __tablename__ = "dim_date"
+    date = Column(Date, primary_key=True)
+    next_day = Column(Date, nullable=False)
+    year = Column(SmallInteger, nullable=False)
+    quarter = Column(SmallInteger, nullable=False)
+    month = Column(SmallInteger, nullable=False)
+    month_label = Column(String(7), nullable=False)        # 2024-01
+    iso_year = Column(SmallInteger, nullable=False)
+    iso_week = Column(SmallInteger, nullable=False)
+    iso_week_label = Column(String(8), nullable=False)     # 2024-W05
+    week_start = Column(Date, nullable=False)              # Monday
+    weekday = Column(SmallInteger, nullable=False)         # 0=Mon .. 6=Sun
+    is_weekend = Column(Boolean, nullable=False)
+    fiscal_year = Column(SmallInteger, nullable=False)     # named for the year it ends in
+    fiscal_quarter = Column(SmallInteger, nullable=False)
+    fiscal_period = Column(SmallInteger, nullable=False)   # 1..12
+    fiscal_label = Column(String(10), nullable=False)      # FY2025-P01
+    is_holiday = Column(Boolean, nullable=False, default=False)
+    holiday_name = Column(String(60), nullable=True)
+
+class ChangeLog(Base):
+    """
+    Append-only outbox: one row per insert/update/delete on the CAPTURED
+    tables, written by triggers in the same transaction (see app/outbox.py).
+    """
+    __tablename__ = "change_log"
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    tenant_id = Column(String(TENANT_LEN), nullable=False)
+    table_name = Column(String(40), nullable=False)
+    op = Column(String(1), nullable=False)  # I/U/D
+    row_id = Column(Integer, nullable=False)
+    old_data = Column(Text, nullable=True)  # JSON row image before (U/D)
+    new_data = Column(Text, nullable=True)  # JSON row image after (I/U)
+    created_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+class ChangeConsumer(Base):
+    """Checkpoint per change-log consumer: last change id it has fully applied."""
+    __tablename__ = "change_consumers"
+    name = Column(String(80), primary_key=True)
+    position = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # Helpful composite indexes (optional; SQLite will accept them)
-Index("ix_handovers_tenant_date", Handover.tenant_id, Handover.date)
-Index("ix_incidents_tenant_status", Incident.tenant_id, Incident.status)
+# The trailing columns make the mobile list projections (?fields=...) index-only:
+# handovers date,outlet,shift,covers and incidents id,title,status,severity.
+Index("ix_handovers_tenant_date", Handover.tenant_id, Handover.date, Handover.outlet, Handover.shift, Handover.covers)
+# SLA analytics (app/sla.py) read only these columns: index-only per tenant
+Index("ix_incidents_tenant_status", Incident.tenant_id, Incident.status, Incident.severity,
+      Incident.created_at, Incident.resolved_at)
+Index("ix_incidents_tenant_list", Incident.tenant_id, Incident.id, Incident.status, Incident.severity, Incident.title)
 Index("ix_sales_tenant_date", SaleItem.tenant_id, SaleItem.sold_on)
 Index("ix_revenue_tenant_date", RevenueEntry.tenant_id, RevenueEntry.occurred_at)
+Index("ix_guest_notes_tenant_created", GuestNote.tenant_id, GuestNote.created_at)
+Index("ix_handover_top_sales_tenant_item_date", HandoverTopSale.tenant_id, HandoverTopSale.item, HandoverTopSale.date)
+Index("ix_change_log_tenant_id", ChangeLog.tenant_id, ChangeLog.id)
+
+@event.listens_for(Session, "before_flush")
+def _denormalize_top_sales(session, flush_context, instances) -> None:
+    # keep tenant_id/date on top-sale rows in step with their handover
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, Handover):
+            continue
+        state = inspect(obj)
+        moved = state.attrs.date.history.has_changes() or state.attrs.tenant_id.history.has_changes()
+        if moved or "top_sale_rows" in obj.__dict__:
+            for row in obj.top_sale_rows:
+                row.tenant_id, row.date = obj.tenant_id, obj.date
+
+# change-capture triggers and the dim_date fill hook into create_all/drop_all;
+# imported last because they use the tables above
+from . import dimdate, outbox  # noqa: E402,F401
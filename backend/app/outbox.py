@@ -0,0 +1,352 @@
+# app/outbox.py
+"""
+Transactional change log (outbox).
+
+Every INSERT / UPDATE / DELETE on the CAPTURED tables appends a row to
+change_log from a database trigger, so the change commits or rolls back
+with the write itself, whether it came from the ORM, a Core batch
+statement or raw SQL. Rows carry the table, op (I/U/D), the row id and
+JSON images of the row before and after the change.
+
+Consumers read in id order from a checkpoint stored in change_consumers.
+consume() applies a batch and advances the checkpoint in one transaction,
+so a consumer that keeps its aggregates in this database applies each
+change exactly once.
+
+Postgres assigns ids when a row is inserted, not when its transaction
+commits, so a slow transaction can commit ids below ones already read.
+Postgres reads therefore stop at a horizon: changes logged (clock time
+of the row, not of its transaction's start) before every transaction
+that is still open and has written anything started, and at least
+CHANGES_SETTLE_SECONDS ago. Any change an open transaction commits later
+gets an id above everything returned, so nothing is skipped; a long
+transaction delays readers until it ends. The oldest open writer comes
+from pg_stat_activity, which shows only the sessions of the app's own
+role (or all with pg_read_all_stats): writers under other roles are not
+waited for. SQLite allows one writer at a time, so its ids are already
+in commit order.
+
+Retention: prune() deletes changes older than CHANGE_LOG_RETENTION_DAYS
+that every consumer with a checkpoint has read past; the background
+pruner (CHANGE_LOG_PRUNE, every CHANGE_LOG_PRUNE_SECONDS) runs it. A
+consumer that stops reading holds the log back until its
+change_consumers row is deleted.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, event, func, literal_column, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .cache import get_cache
+from .db import Base, SessionLocal
+from .models import ChangeConsumer, ChangeLog, Handover, Incident, RevenueEntry, SaleItem
+
+CAPTURED = (Handover, Incident, SaleItem, RevenueEntry)
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS") or 2)
+CHANGE_LOG_RETENTION_DAYS = float(os.getenv("CHANGE_LOG_RETENTION_DAYS") or 7)
+CHANGE_LOG_PRUNE_SECONDS = float(os.getenv("CHANGE_LOG_PRUNE_SECONDS") or 3600)
+
+log = logging.getLogger(__name__)
+
+_OPS = (("ai", "INSERT", "I"), ("au", "UPDATE", "U"), ("ad", "DELETE", "D"))
+
+
+def _sqlite_image(columns: Sequence[str], ref: str) -> str:
+    return "json_object(" + ", ".join(f"'{c}', {ref}.{c}" for c in columns) + ")"
+
+
+def _sqlite_ddl(name: str, columns: Sequence[str]) -> List[str]:
+    stmts = []
+    for suffix, event_name, op in _OPS:
+        ref = "old" if op == "D" else "new"
+        old = _sqlite_image(columns, "old") if op != "I" else "NULL"
+        new = _sqlite_image(columns, "new") if op != "D" else "NULL"
+        stmts.append(
+            f"CREATE TRIGGER IF NOT EXISTS change_log_{name}_{suffix} AFTER {event_name} ON {name} BEGIN "
+            f"INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data, new_data) "
+            f"VALUES ({ref}.tenant_id, '{name}', '{op}', {ref}.id, {old}, {new}); END"
+        )
+    return stmts
+
+
+_PG_FUNCTION = """
+CREATE OR REPLACE FUNCTION change_log_capture() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO change_log (tenant_id, table_name, op, row_id, new_data, created_at)
+        VALUES (NEW.tenant_id, TG_TABLE_NAME, 'I', NEW.id, (to_jsonb(NEW) - 'search_tsv')::text, clock_timestamp());
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data, new_data, created_at)
+        VALUES (NEW.tenant_id, TG_TABLE_NAME, 'U', NEW.id,
+                (to_jsonb(OLD) - 'search_tsv')::text, (to_jsonb(NEW) - 'search_tsv')::text, clock_timestamp());
+        RETURN NEW;
+    END IF;
+    INSERT INTO change_log (tenant_id, table_name, op, row_id, old_data, created_at)
+    VALUES (OLD.tenant_id, TG_TABLE_NAME, 'D', OLD.id, (to_jsonb(OLD) - 'search_tsv')::text, clock_timestamp());
+    RETURN OLD;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def install(conn: Connection) -> None:
+    """Create the capture triggers for the CAPTURED tables as the models define them now."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.exec_driver_sql(_PG_FUNCTION)
+    for model in CAPTURED:
+        table = model.__table__
+        if dialect == "sqlite":
+            for stmt in _sqlite_ddl(table.name, [c.name for c in table.columns]):
+                conn.exec_driver_sql(stmt)
+        elif dialect == "postgresql":
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS change_log_{table.name} ON {table.name}")
+            conn.exec_driver_sql(
+                f"CREATE TRIGGER change_log_{table.name} AFTER INSERT OR UPDATE OR DELETE ON {table.name} "
+                f"FOR EACH ROW EXECUTE FUNCTION change_log_capture()"
+            )
+
+
+def uninstall(conn: Connection) -> None:
+    dialect = conn.dialect.name
+    for model in CAPTURED:
+        name = model.__table__.name
+        if dialect == "sqlite":
+            for suffix, _, _ in _OPS:
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS change_log_{name}_{suffix}")
+        elif dialect == "postgresql":
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS change_log_{name} ON {name}")
+    if dialect == "postgresql":
+        conn.exec_driver_sql("DROP FUNCTION IF EXISTS change_log_capture()")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw) -> None:
+    install(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _before_drop(target, connection, **kw) -> None:
+    uninstall(connection)
+
+
+# --- reading ----------------------------------------------------------------
+
+@dataclass
+class Change:
+    id: int
+    tenant_id: str
+    table: str
+    op: str
+    row_id: int
+    old: Optional[Dict[str, Any]]
+    new: Optional[Dict[str, Any]]
+    created_at: datetime
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "table": self.table,
+            "op": self.op,
+            "row_id": self.row_id,
+            "old": self.old,
+            "new": self.new,
+            "created_at": self.created_at,
+        }
+
+
+# start of the oldest other open transaction (of this database) that holds a
+# transaction id, i.e. has written something it may still commit
+_OLDEST_OPEN_WRITER = literal_column(
+    "(SELECT min(xact_start) FROM pg_stat_activity WHERE datname = current_database() "
+    "AND backend_xid IS NOT NULL AND pid <> pg_backend_pid())"
+)
+
+
+def _horizon(settle_seconds: float):
+    """Postgres: changes logged before this are all committed (or rolled back) for good."""
+    # least() ignores the NULL of "no open writer"
+    return func.least(func.clock_timestamp() - timedelta(seconds=settle_seconds), _OLDEST_OPEN_WRITER)
+
+
+def read_changes(
+    db: Session,
+    after: int = 0,
+    limit: int = 500,
+    tenant: Optional[str] = None,
+    tables: Sequence[str] = (),
+    settle_seconds: Optional[float] = None,
+) -> List[Change]:
+    """Up to `limit` changes with id > `after`, oldest first."""
+    q = select(ChangeLog).where(ChangeLog.id > after)
+    if tenant:
+        q = q.where(ChangeLog.tenant_id == tenant)
+    if tables:
+        q = q.where(ChangeLog.table_name.in_(tables))
+    if db.get_bind().dialect.name == "postgresql":
+        q = q.where(ChangeLog.created_at < _horizon(CHANGES_SETTLE_SECONDS if settle_seconds is None else settle_seconds))
+    rows = db.execute(q.order_by(ChangeLog.id).limit(limit)).scalars()
+    return [
+        Change(
+            id=r.id,
+            tenant_id=r.tenant_id,
+            table=r.table_name,
+            op=r.op,
+            row_id=r.row_id,
+            old=json.loads(r.old_data) if r.old_data else None,
+            new=json.loads(r.new_data) if r.new_data else None,
+            created_at=r.created_at,
+        )
+        for r in rows
+    ]
+
+
+def get_checkpoint(db: Session, consumer: str) -> int:
+    row = db.get(ChangeConsumer, consumer)
+    return row.position if row else 0
+
+
+def advance_checkpoint(db: Session, consumer: str, position: int) -> int:
+    """Move `consumer` forward to `position` (never backwards). Caller commits."""
+    row = db.get(ChangeConsumer, consumer)
+    if row is None:
+        row = ChangeConsumer(name=consumer, position=0)
+        db.add(row)
+    if position > row.position:
+        row.position = position
+    db.flush()
+    return row.position
+
+
+def consume(db: Session, consumer: str, handler: Callable[[List[Change]], None], limit: int = 500,
+            tables: Sequence[str] = ()) -> int:
+    """
+    Hand the next batch after the consumer's checkpoint to `handler`, then
+    advance the checkpoint and commit both together. Returns the batch size
+    (0 when caught up). A handler exception rolls back and leaves the
+    checkpoint where it was.
+    """
+    changes = read_changes(db, get_checkpoint(db, consumer), limit, tables=tables)
+    if not changes:
+        return 0
+    try:
+        handler(changes)
+        advance_checkpoint(db, consumer, changes[-1].id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(changes)
+
+
+# --- retention ----------------------------------------------------------------
+
+def prune(db: Session, retention_days: Optional[float] = None, now: Optional[datetime] = None) -> int:
+    """
+    Delete changes older than `retention_days` that every checkpointed
+    consumer has read past, and commit. The age limit protects consumers
+    without a checkpoint row (follow(), the anomaly detector); the newest
+    change is always kept because SQLite would hand its id out again.
+    Returns the number of changes deleted.
+    """
+    days = CHANGE_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = (now or datetime.utcnow()) - timedelta(days=days)  # created_at is UTC
+    q = delete(ChangeLog).where(
+        ChangeLog.created_at < cutoff,
+        ChangeLog.id < select(func.max(ChangeLog.id)).scalar_subquery(),
+    )
+    acked = db.execute(select(func.min(ChangeConsumer.position))).scalar()
+    if acked is not None:
+        q = q.where(ChangeLog.id <= acked)
+    deleted = db.execute(q).rowcount or 0
+    db.commit()
+    return deleted
+
+
+class Pruner:
+    """Background thread: prune() every `interval` seconds."""
+
+    def __init__(self, interval: float = CHANGE_LOG_PRUNE_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="change-log-pruner", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                deleted = prune(db)
+                if deleted:
+                    log.info("pruned %d change_log rows", deleted)
+            except Exception:
+                log.exception("change_log pruning failed")
+            finally:
+                db.close()
+            self._stop.wait(self.interval)
+
+
+pruner = Pruner()
+
+
+# --- consumers that keep their state in the cache ---------------------------
+
+_follow_lock = threading.Lock()
+
+
+def follow(db: Session, namespace: str, tables: Sequence[str],
+           handler: Callable[[List[Change], str], None], batch: int = 1000) -> str:
+    """
+    Hand new changes on `tables` to handler(changes, prefix) for a consumer
+    whose state is cache entries under namespaces starting with `prefix`
+    (e.g. to invalidate the ones a change touches), and return that prefix.
+
+    The position is stored in the cache backend itself, under `namespace`,
+    so it is shared, persisted and lost together with the entries it
+    guards: a persistent cache keeps both across restarts. When it is
+    missing (new or cleared cache, eviction) or behind what prune() has
+    deleted, nothing is known about what
+    the existing entries have seen, so the namespace -- and with it every
+    entry under the prefix -- is invalidated and reading starts at the end
+    of the log.
+    """
+    cache = get_cache()
+    with _follow_lock:
+        position = cache.get(namespace, "position")
+        if position is not None and position + 1 < (db.execute(select(func.min(ChangeLog.id))).scalar() or 0):
+            position = None  # prune() removed changes we had not read: start over
+        if position is None:
+            cache.invalidate(namespace)
+            cache.set(namespace, "position", db.execute(select(func.max(ChangeLog.id))).scalar() or 0)
+        # "<namespace>:..." keys are dropped by invalidate(namespace); the generation
+        # also retires entries a concurrent request stores after that
+        prefix = f"{namespace}:{cache.generation(namespace)}"
+        while position is not None:
+            changes = read_changes(db, position, batch, tables=tables)
+            if not changes:
+                break
+            handler(changes, prefix)
+            position = changes[-1].id
+            cache.set(namespace, "position", position)
+        return prefix
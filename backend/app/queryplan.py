@@ -0,0 +1,216 @@
+# app/queryplan.py
+"""
+Query plan checker and index advisor.
+
+capture_statements() records every SELECT the app issues while a block runs;
+explain() runs EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (Postgres) on each and
+flags full table scans and temp B-trees/sorts; suggest_index() proposes a
+covering index from the statement's WHERE / GROUP BY / ORDER BY / SELECT
+columns. check_hot_queries() runs HOT_QUERIES through a test client and is
+shared by the CLI (app/scripts/explain_queries.py) and the test suite.
+"""
+from __future__ import annotations
+
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .db import Base
+from .models import Handover, Incident, RevenueEntry, SaleItem
+
+# (name, path, query params) -- requests that must never regress to a full scan
+HOT_QUERIES: List[Tuple[str, str, Dict[str, Any]]] = [
+    ("kpi-summary", "/api/analytics/kpi-summary", {"date_from": "2024-01-01", "date_to": "2024-01-31"}),
+    ("revenue-trend", "/api/analytics/revenue-trend", {"date_from": "2024-01-01", "date_to": "2024-01-31"}),
+    ("top-items", "/api/analytics/top-items", {"date_from": "2024-01-01", "date_to": "2024-01-31"}),
+    ("staffing", "/api/analytics/staffing", {"weeks": 12}),
+    ("handover-list", "/api/handover", {"limit": 10}),
+    ("incident-list", "/api/incidents", {"limit": 20}),
+    ("incident-sla", "/api/analytics/incident-sla", {"date_from": "2024-01-01", "date_to": "2024-01-31"}),
+    ("compare", "/api/analytics/compare", {"kind": "week", "prior": 4, "anchor": "2024-01-31", "yoy": "true"}),
+]
+
+
+@dataclass
+class Statement:
+    sql: str
+    params: Any
+
+
+@dataclass
+class PlanReport:
+    name: str
+    sql: str
+    plan: List[str]
+    full_scans: List[str] = field(default_factory=list)
+    temp_btrees: List[str] = field(default_factory=list)
+    suggestion: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.full_scans
+
+
+@contextmanager
+def capture_statements(engine: Engine) -> Iterator[List[Statement]]:
+    captured: List[Statement] = []
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append(Statement(statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _before)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", _before)
+
+
+def explain(engine: Engine, stmt: Statement) -> List[str]:
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + stmt.sql, stmt.params).all()
+            return [str(r[-1]) for r in rows]
+        rows = conn.exec_driver_sql("EXPLAIN " + stmt.sql, stmt.params).all()
+        return [str(r[0]) for r in rows]
+
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)\b")  # a whole-table or whole-index walk
+_PG_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def classify(plan: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """Split plan lines into (full scans, temp b-trees / sorts)."""
+    scans: List[str] = []
+    temps: List[str] = []
+    for line in plan:
+        text = line.strip().lstrip("->").strip()
+        m = _SQLITE_SCAN.match(text) or _PG_SCAN.search(text)
+        if m and m.group(1) in Base.metadata.tables:  # CTEs / subqueries are scanned by design
+            scans.append(text)
+        elif "TEMP B-TREE" in text or text.startswith("Sort"):
+            temps.append(text)
+    return scans, temps
+
+
+def _columns(clause: str, table: str) -> List[str]:
+    return list(dict.fromkeys(re.findall(rf"\b{table}\.(\w+)", clause)))
+
+
+def _existing_indexes(table: str) -> List[List[str]]:
+    t = Base.metadata.tables.get(table)
+    if t is None:
+        return []
+    return [[c.name for c in ix.columns] for ix in t.indexes]
+
+
+def suggest_index(sql: str) -> Optional[str]:
+    """
+    Heuristic covering index: equality columns, then the first range column
+    (or GROUP BY / ORDER BY columns), then every other referenced column.
+    Returns None when an existing index already starts with that key.
+    """
+    flat = " ".join(sql.split())
+    m = re.search(r"\bFROM (\w+)", flat)
+    if not m:
+        return None
+    table = m.group(1)
+    select_part = flat[: m.start()]
+    where = re.search(r"\bWHERE (.*?)(?: GROUP BY | ORDER BY | LIMIT |$)", flat)
+    group = re.search(r"\bGROUP BY (.*?)(?: ORDER BY | LIMIT |$)", flat)
+    order = re.search(r"\bORDER BY (.*?)(?: LIMIT |$)", flat)
+    where_s = where.group(1) if where else ""
+
+    eq = [c for c in re.findall(rf"\b{table}\.(\w+) (?:=|IN) ", where_s)]
+    rng = [c for c in re.findall(rf"\b{table}\.(\w+) (?:>=|<=|>|<|BETWEEN) ", where_s) if c not in eq]
+    key = list(dict.fromkeys(eq))
+    tail = _columns(group.group(1), table) if group else (_columns(order.group(1), table) if order else [])
+    if rng:
+        key.append(rng[0])
+    else:
+        key.extend(c for c in tail if c not in key)
+    if not key:
+        return None
+    for existing in _existing_indexes(table):
+        if existing[: len(key)] == key:
+            key = existing
+            break
+    cover = [c for c in _columns(select_part, table) + tail + rng if c not in key and c != "id"]
+    cols = key + list(dict.fromkeys(cover))
+    if not cover and key in _existing_indexes(table):
+        return None
+    name = "ix_" + table + "_" + "_".join(cols)
+    return f"CREATE INDEX {name} ON {table} ({', '.join(cols)})"
+
+
+def check(engine: Engine, name: str, statements: Sequence[Statement]) -> List[PlanReport]:
+    reports: List[PlanReport] = []
+    for stmt in statements:
+        plan = explain(engine, stmt)
+        scans, temps = classify(plan)
+        covering = any("COVERING INDEX" in line or "Index Only Scan" in line for line in plan)
+        reports.append(
+            PlanReport(
+                name=name,
+                sql=" ".join(stmt.sql.split()),
+                plan=plan,
+                full_scans=scans,
+                temp_btrees=temps,
+                suggestion=None if covering else suggest_index(stmt.sql),
+            )
+        )
+    return reports
+
+
+def check_hot_queries(client, engine: Engine, headers: Optional[Dict[str, str]] = None) -> List[PlanReport]:
+    """Issue every HOT_QUERIES request through `client` and explain what it ran."""
+    reports: List[PlanReport] = []
+    for name, path, params in HOT_QUERIES:
+        with capture_statements(engine) as captured:
+            resp = client.get(path, params=params, headers=headers or {})
+            resp.raise_for_status()
+        reports.extend(check(engine, name, captured))
+    return reports
+
+
+def assert_no_full_scans(reports: Sequence[PlanReport]) -> None:
+    """Test helper: fail with the offending plans when a hot query scans a table."""
+    bad = [r for r in reports if not r.ok]
+    if bad:
+        lines = [f"{r.name}: {r.sql}\n    " + "\n    ".join(r.plan) for r in bad]
+        raise AssertionError("hot queries regressed to full scans:\n" + "\n".join(lines))
+
+
+def format_report(reports: Sequence[PlanReport]) -> str:
+    out: List[str] = []
+    for r in reports:
+        status = "OK  " if r.ok else "SCAN"
+        out.append(f"[{status}] {r.name}: {r.sql}")
+        for line in r.plan:
+            out.append(f"         | {line}")
+        for t in r.temp_btrees:
+            out.append(f"         ! temp b-tree/sort: {t}")
+        if r.suggestion:
+            out.append(f"         + suggest: {r.suggestion}")
+    return "\n".join(out)
+
+
+def seed_sample_data(db, tenants: Sequence[str] = ("legacy", "azure"), days: int = 90) -> None:
+    """Small multi-tenant dataset so the planner sees realistic index choices."""
+    start = date(2024, 1, 1)
+    for t in tenants:
+        for i in range(days):
+            d = start + timedelta(days=i)
+            db.add(Handover(tenant_id=t, date=d, outlet="Main", shift="AM" if i % 2 else "PM", covers=40 + i % 30))
+            db.add(SaleItem(tenant_id=t, name=f"Item {i % 12}", qty=1 + i % 9, sold_on=d))
+            db.add(RevenueEntry(tenant_id=t, outlet="Main", category="Food", amount_cents=1500 + i,
+                                occurred_at=datetime.combine(d, datetime.min.time())))
+            if i % 5 == 0:
+                db.add(Incident(tenant_id=t, outlet="Main", severity="LOW", title=f"Issue {i}",
+                                status="OPEN" if i % 2 else "CLOSED", created_at=datetime.combine(d, datetime.min.time())))
+    db.commit()
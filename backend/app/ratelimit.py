@@ -0,0 +1,163 @@
+# app/ratelimit.py
+"""
+Per-tenant admission control.
+
+Every request passes three gates, keyed by the tenant from require_tenant:
+  1) a token bucket per (tenant, budget) -> 429 + Retry-After when empty
+  2) a concurrency cap per tenant        -> waits for a free slot
+  3) queue latency shedding              -> 503 + Retry-After when the wait for
+     a slot exceeds ADMISSION_MAX_QUEUE_MS ("queue_timeout"), or straight
+     away when the recent average wait (timeouts count as the full
+     ADMISSION_MAX_QUEUE_MS) is above ADMISSION_SHED_FRACTION of it
+     ("overloaded": shed early instead of queueing more work)
+
+Budgets are separate for cheap list endpoints, expensive analytics and writes.
+All bookkeeping runs on the event loop (async dependency), so no locks.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException
+
+from .tenant import require_tenant
+
+ANONYMOUS = "-"  # bucket for endpoints where the tenant header is optional
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name) or default)
+
+
+@dataclass
+class Budget:
+    rate: float   # tokens per second
+    burst: float  # bucket size
+
+
+BUDGETS: Dict[str, Budget] = {
+    "list": Budget(_env_float("RATE_LIST_PER_SEC", 20), _env_float("RATE_LIST_BURST", 40)),
+    "analytics": Budget(_env_float("RATE_ANALYTICS_PER_SEC", 2), _env_float("RATE_ANALYTICS_BURST", 10)),
+    "write": Budget(_env_float("RATE_WRITE_PER_SEC", 5), _env_float("RATE_WRITE_BURST", 10)),
+}
+TENANT_MAX_CONCURRENCY = int(_env_float("TENANT_MAX_CONCURRENCY", 4))
+ADMISSION_MAX_QUEUE_MS = _env_float("ADMISSION_MAX_QUEUE_MS", 250)
+# waits are capped at the timeout, so their average can only cross a fraction of it
+ADMISSION_SHED_FRACTION = _env_float("ADMISSION_SHED_FRACTION", 0.5)
+QUEUE_EWMA_ALPHA = 0.2
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume one token. Returns 0.0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class Limiter:
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self._queue_ewma: Dict[str, float] = {}
+        self.admitted: Counter = Counter()
+        self.shed: Counter = Counter()
+
+    def _bucket(self, tenant: str, budget: str) -> TokenBucket:
+        key = (tenant, budget)
+        b = self._buckets.get(key)
+        if b is None:
+            cfg = BUDGETS[budget]
+            b = self._buckets[key] = TokenBucket(cfg.rate, cfg.burst)
+        return b
+
+    def _reject(self, tenant: str, budget: str, status: int, reason: str, retry_after: float):
+        self.shed[(tenant, budget, reason)] += 1
+        raise HTTPException(
+            status_code=status,
+            detail=f"{reason}: tenant {tenant} over {budget} budget",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def acquire(self, tenant: str, budget: str) -> None:
+        wait = self._bucket(tenant, budget).take()
+        if wait:
+            self._reject(tenant, budget, 429, "rate_limited", wait)
+
+        max_queue = ADMISSION_MAX_QUEUE_MS / 1000.0
+        if self._queue_ewma.get(tenant, 0.0) > ADMISSION_SHED_FRACTION * max_queue:
+            # decay so the tenant is re-admitted once the backlog drains
+            self._queue_ewma[tenant] *= 1.0 - QUEUE_EWMA_ALPHA
+            self._reject(tenant, budget, 503, "overloaded", max_queue)
+
+        sem = self._slots.setdefault(tenant, asyncio.Semaphore(TENANT_MAX_CONCURRENCY))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=max_queue)
+        except asyncio.TimeoutError:
+            self._observe_queue(tenant, max_queue)
+            self._reject(tenant, budget, 503, "queue_timeout", max_queue)
+        self._observe_queue(tenant, time.monotonic() - started)
+        self.admitted[(tenant, budget)] += 1
+
+    def release(self, tenant: str) -> None:
+        self._slots[tenant].release()
+
+    def _observe_queue(self, tenant: str, seconds: float) -> None:
+        prev = self._queue_ewma.get(tenant, 0.0)
+        self._queue_ewma[tenant] = prev + QUEUE_EWMA_ALPHA * (seconds - prev)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "admitted": [
+                {"tenant": t, "budget": b, "count": n} for (t, b), n in sorted(self.admitted.items())
+            ],
+            "shed": [
+                {"tenant": t, "budget": b, "reason": r, "count": n} for (t, b, r), n in sorted(self.shed.items())
+            ],
+            "shed_total": sum(self.shed.values()),
+            "queue_ms": {t: round(v * 1000.0, 3) for t, v in sorted(self._queue_ewma.items())},
+        }
+
+
+limiter = Limiter()
+
+
+def rate_limited(budget: str, tenant_dependency=require_tenant):
+    """
+    Dependency factory: `dependencies=[Depends(rate_limited("list"))]`.
+    Holds a concurrency slot for the duration of the handler.
+    """
+    if budget not in BUDGETS:
+        raise ValueError(f"unknown rate-limit budget: {budget}")
+
+    async def dependency(tenant: Optional[str] = Depends(tenant_dependency)):
+        key = tenant or ANONYMOUS
+        await limiter.acquire(key, budget)
+        try:
+            yield
+        finally:
+            limiter.release(key)
+
+    return dependency
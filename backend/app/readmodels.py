@@ -0,0 +1,71 @@
+# app/readmodels.py
+"""
+Compact read models for read-only endpoints.
+
+Each model gets a named tuple with one field per table column, filled from
+Core `select` rows. That skips ORM identity-map registration, attribute
+instrumentation and per-instance __dict__; the list and export handlers
+only turn rows into JSON or CSV anyway.
+"""
+from __future__ import annotations
+
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from .models import GuestNote, Handover, Incident
+
+
+def read_model(model) -> Type[tuple]:
+    table = model.__table__
+    row_type = namedtuple(f"{model.__name__}Row", [c.key for c in table.columns])
+    row_type.__table__ = table
+    return row_type
+
+
+HandoverRow = read_model(Handover)
+IncidentRow = read_model(Incident)
+GuestNoteRow = read_model(GuestNote)
+
+
+@lru_cache(maxsize=256)
+def _subset(row_type, fields: tuple) -> Type[tuple]:
+    sub = namedtuple(row_type.__name__, fields)
+    sub.__table__ = row_type.__table__
+    return sub
+
+
+def projection(row_type, fields: Optional[str]) -> Type[tuple]:
+    """
+    Read model limited to a comma-separated `fields` list (None/empty = all
+    columns). Unknown names raise ValueError. Columns keep table order, so
+    every spelling of the same projection shares one type and one cached
+    SQL statement.
+    """
+    if not fields:
+        return row_type
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = sorted(wanted - set(row_type._fields))
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}; allowed: {', '.join(row_type._fields)}")
+    if not wanted:
+        return row_type
+    return _subset(row_type, tuple(f for f in row_type._fields if f in wanted))
+
+
+@lru_cache(maxsize=256)
+def select_rows(row_type) -> Select:
+    """SELECT of exactly the read model's columns (built once per type); chain .where()/.order_by() onto it."""
+    table = row_type.__table__
+    return select(*(table.c[f] for f in row_type._fields))
+
+
+def fetch_rows(db: Session, stmt: Select, row_type) -> List[Any]:
+    return list(map(row_type._make, db.execute(stmt)))
+
+
+def as_dicts(rows) -> List[Dict[str, Any]]:
+    return [r._asdict() for r in rows]
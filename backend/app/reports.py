@@ -0,0 +1,414 @@
+# app/reports.py
+"""
+Scheduled tenant reports.
+
+After a day, ISO week or month closes, a background thread builds one report
+per (tenant, period kind): KPIs, daily trend, top items and incident stats,
+written as JSON and CSV under REPORTS_DIR/<tenant>/<kind>/<label>.<fmt>.
+Builds fan out over a process pool (REPORT_WORKERS; 0 builds inline), so
+month-end reporting never runs on the request path; the files are served
+as-is by app/api/reports.py.
+
+Each run builds every closed period of the last REPORT_CATCHUP_DAYS that
+has no report yet, so periods missed while the scheduler was down are
+caught up, and rebuilds stored reports whose period a later change touched
+(read from the change log, app/outbox.py, with a "reports" checkpoint).
+
+Artifacts are written to a temp file and renamed into place, and a build
+is claimed with an O_EXCL lock file, so several app workers running the
+scheduler at once produce each report exactly once.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine, func, select
+
+from . import outbox
+from .config import BASE_DIR
+from .db import SessionLocal, engine
+from .dimdate import day_join, day_of
+from .models import DimDate, Handover, Incident, RevenueEntry, SaleItem
+from .readmodels import IncidentRow, fetch_rows, select_rows
+from .tenant import ALLOWED
+
+log = logging.getLogger(__name__)
+
+KINDS = ("daily", "weekly", "monthly")
+FORMATS = ("json", "csv")
+REPORTS_DIR = Path(os.getenv("REPORTS_DIR") or BASE_DIR / "reports")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS") or 2)
+REPORT_INTERVAL_SECONDS = float(os.getenv("REPORT_INTERVAL_SECONDS") or 900)
+REPORT_CATCHUP_DAYS = int(os.getenv("REPORT_CATCHUP_DAYS") or 35)
+LOCK_STALE_SECONDS = 600
+TOP_ITEMS = 10
+
+LABEL_RE = {
+    "daily": re.compile(r"^\d{4}-\d{2}-\d{2}$"),
+    "weekly": re.compile(r"^\d{4}-W\d{2}$"),
+    "monthly": re.compile(r"^\d{4}-\d{2}$"),
+}
+
+
+@dataclass(frozen=True)
+class Period:
+    kind: str
+    start: date
+    end: date  # inclusive
+
+    @property
+    def label(self) -> str:
+        if self.kind == "daily":
+            return self.start.isoformat()
+        if self.kind == "weekly":
+            year, week, _ = self.start.isocalendar()
+            return f"{year}-W{week:02d}"
+        return self.start.strftime("%Y-%m")
+
+
+def last_closed(kind: str, today: date) -> Period:
+    """The most recent period of `kind` that ended before `today`."""
+    if kind == "daily":
+        d = today - timedelta(days=1)
+        return Period(kind, d, d)
+    if kind == "weekly":
+        end = today - timedelta(days=today.weekday() + 1)
+        return Period(kind, end - timedelta(days=6), end)
+    if kind == "monthly":
+        end = today.replace(day=1) - timedelta(days=1)
+        return Period(kind, end.replace(day=1), end)
+    raise ValueError(f"unknown report kind: {kind}")
+
+
+def period_of(kind: str, day: date) -> Period:
+    """The period of `kind` that contains `day`."""
+    if kind == "daily":
+        return Period(kind, day, day)
+    if kind == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return Period(kind, start, start + timedelta(days=6))
+    if kind == "monthly":
+        start = day.replace(day=1)
+        return Period(kind, start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1))
+    raise ValueError(f"unknown report kind: {kind}")
+
+
+def closed_since(kind: str, today: date, since: date) -> List[Period]:
+    """Closed periods of `kind` that end on or after `since`, newest first; the last closed one always."""
+    out = [last_closed(kind, today)]
+    while True:
+        p = period_of(kind, out[-1].start - timedelta(days=1))
+        if p.end < since:
+            return out
+        out.append(p)
+
+
+def artifact_path(tenant: str, kind: str, label: str, fmt: str) -> Path:
+    return REPORTS_DIR / tenant / kind / f"{label}.{fmt}"
+
+
+# --- report contents --------------------------------------------------------
+
+def _day(value) -> str:
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+def build_report(db, tenant: str, period: Period) -> Dict[str, Any]:
+    start = datetime.combine(period.start, datetime.min.time())
+    stop = datetime.combine(period.end + timedelta(days=1), datetime.min.time())
+    in_range = (RevenueEntry.tenant_id == tenant, RevenueEntry.occurred_at >= start, RevenueEntry.occurred_at < stop)
+
+    revenue_by_day = {
+        _day(d): cents / 100.0
+        for d, cents in db.execute(
+            select(day_of(RevenueEntry.occurred_at), func.sum(RevenueEntry.amount_cents))
+            .select_from(RevenueEntry)
+            .outerjoin(DimDate, day_join(RevenueEntry.occurred_at))  # keeps days outside the calendar range
+            .where(*in_range)
+            .group_by(day_of(RevenueEntry.occurred_at))
+        )
+    }
+    by_category = {
+        c or "": cents / 100.0
+        for c, cents in db.execute(
+            select(RevenueEntry.category, func.sum(RevenueEntry.amount_cents))
+            .where(*in_range).group_by(RevenueEntry.category)
+        )
+    }
+    covers_by_day = {
+        _day(d): int(n or 0)
+        for d, n in db.execute(
+            select(Handover.date, func.sum(Handover.covers))
+            .where(Handover.tenant_id == tenant, Handover.date >= period.start, Handover.date <= period.end)
+            .group_by(Handover.date)
+        )
+    }
+    top_items = [
+        {"name": name or "", "units_sold": int(units or 0)}
+        for name, units in db.execute(
+            select(SaleItem.name, func.sum(func.coalesce(SaleItem.qty, 0)).label("units"))
+            .where(SaleItem.tenant_id == tenant, SaleItem.sold_on >= period.start, SaleItem.sold_on <= period.end)
+            .group_by(SaleItem.name)
+            .order_by(func.sum(func.coalesce(SaleItem.qty, 0)).desc(), SaleItem.name)
+            .limit(TOP_ITEMS)
+        )
+    ]
+    incidents = fetch_rows(
+        db,
+        select_rows(IncidentRow).where(
+            Incident.tenant_id == tenant, Incident.created_at >= start, Incident.created_at < stop
+        ),
+        IncidentRow,
+    )
+
+    days = [period.start + timedelta(days=i) for i in range((period.end - period.start).days + 1)]
+    revenue = sum(revenue_by_day.values())
+    covers = sum(covers_by_day.values())
+    return {
+        "tenant": tenant,
+        "kind": period.kind,
+        "period": period.label,
+        "from": period.start.isoformat(),
+        "to": period.end.isoformat(),
+        "generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "kpis": {
+            "revenue": round(revenue, 2),
+            "covers": covers,
+            "revenue_per_cover": round(revenue / covers, 2) if covers else 0.0,
+            "revenue_by_category": by_category,
+        },
+        "trend": [
+            {"date": d.isoformat(), "revenue": revenue_by_day.get(d.isoformat(), 0.0),
+             "covers": covers_by_day.get(d.isoformat(), 0)}
+            for d in days
+        ],
+        "top_items": top_items,
+        "incidents": {
+            "total": len(incidents),
+            "by_status": dict(Counter(i.status for i in incidents)),
+            "by_severity": dict(Counter(i.severity for i in incidents)),
+        },
+    }
+
+
+def render_csv(report: Dict[str, Any]) -> str:
+    """One flat table: section, key, value columns (spreadsheet friendly)."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(["section", "key", "metric", "value"])
+    for k in ("revenue", "covers", "revenue_per_cover"):
+        w.writerow(["kpi", "", k, report["kpis"][k]])
+    for cat, amount in sorted(report["kpis"]["revenue_by_category"].items()):
+        w.writerow(["revenue_by_category", cat, "revenue", amount])
+    for row in report["trend"]:
+        w.writerow(["trend", row["date"], "revenue", row["revenue"]])
+        w.writerow(["trend", row["date"], "covers", row["covers"]])
+    for item in report["top_items"]:
+        w.writerow(["top_items", item["name"], "units_sold", item["units_sold"]])
+    inc = report["incidents"]
+    w.writerow(["incidents", "", "total", inc["total"]])
+    for s, n in sorted(inc["by_status"].items()):
+        w.writerow(["incidents", s, "by_status", n])
+    for s, n in sorted(inc["by_severity"].items()):
+        w.writerow(["incidents", s, "by_severity", n])
+    return buf.getvalue()
+
+
+# --- storage ----------------------------------------------------------------
+
+def _write_atomic(path: Path, data: str) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(data, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _claim(lock: Path) -> bool:
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - lock.stat().st_mtime < LOCK_STALE_SECONDS:
+                return False
+            lock.unlink()  # owner died mid-build
+        except FileNotFoundError:
+            pass
+        return _claim(lock)
+    os.close(fd)
+    return True
+
+
+def generate(tenant: str, kind: str, start: date, end: date) -> Optional[str]:
+    """
+    Build and store one report. Runs inside pool workers, so it takes plain
+    arguments and opens its own session. Returns the label, or None when
+    another worker already holds the build.
+    """
+    period = Period(kind, start, end)
+    target = artifact_path(tenant, kind, period.label, "json")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    lock = target.with_suffix(".lock")
+    if not _claim(lock):
+        return None
+    try:
+        db = SessionLocal()
+        try:
+            report = build_report(db, tenant, period)
+        finally:
+            db.close()
+        # CSV first: the JSON file doubles as the "report is complete" marker
+        _write_atomic(artifact_path(tenant, kind, period.label, "csv"), render_csv(report))
+        _write_atomic(target, json.dumps(report, indent=2))
+        return period.label
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def _init_worker(url: str) -> None:
+    # bind to the parent's database, whatever DATABASE_URL says in this process
+    if engine.url.render_as_string(hide_password=False) != url:
+        SessionLocal.configure(bind=create_engine(url))
+
+
+def due(today: date, tenants: Sequence[str] = (), catchup_days: Optional[int] = None) -> List[tuple]:
+    """
+    (tenant, kind, start, end) for every period closed in the last
+    `catchup_days` (REPORT_CATCHUP_DAYS) without a stored report.
+    """
+    since = today - timedelta(days=REPORT_CATCHUP_DAYS if catchup_days is None else catchup_days)
+    out = []
+    for tenant in sorted(tenants or ALLOWED):
+        for kind in KINDS:
+            for p in closed_since(kind, today, since):
+                if not artifact_path(tenant, kind, p.label, "json").exists():
+                    out.append((tenant, kind, p.start, p.end))
+    return out
+
+
+# day column of each captured table, as stored in the change images
+_CHANGE_DAYS = {
+    "handovers": "date",
+    "incidents": "created_at",
+    "revenue_entries": "occurred_at",
+    "sale_items": "sold_on",
+}
+
+
+def changed(changes: Sequence[outbox.Change], today: date, tenants: Sequence[str] = ()) -> List[tuple]:
+    """(tenant, kind, start, end) of stored reports for closed periods that `changes` touched."""
+    allowed = set(tenants or ALLOWED)
+    out = set()
+    for c in changes:
+        if c.tenant_id not in allowed:
+            continue
+        column = _CHANGE_DAYS[c.table]
+        for image in (c.old, c.new):
+            if not image or not image.get(column):
+                continue
+            day = date.fromisoformat(str(image[column])[:10])
+            for kind in KINDS:
+                p = period_of(kind, day)
+                if p.end < today and artifact_path(c.tenant_id, kind, p.label, "json").exists():
+                    out.add((c.tenant_id, kind, p.start, p.end))
+    return sorted(out)
+
+
+def _stale(db, today: date, tenants: Sequence[str]) -> tuple:
+    """Stored reports changed since the "reports" checkpoint, and the change id read up to."""
+    position = outbox.get_checkpoint(db, "reports")
+    jobs = set()
+    while True:
+        changes = outbox.read_changes(db, position, 1000, tables=tuple(_CHANGE_DAYS))
+        if not changes:
+            return sorted(jobs), position
+        jobs.update(changed(changes, today, tenants))
+        position = changes[-1].id
+
+
+def run_once(today: Optional[date] = None, tenants: Sequence[str] = (), workers: Optional[int] = None,
+             catchup_days: Optional[int] = None) -> List[str]:
+    today = today or date.today()
+    db = SessionLocal()
+    try:
+        stale, position = _stale(db, today, tenants)
+        jobs = sorted(set(due(today, tenants, catchup_days)) | set(stale))
+        workers = REPORT_WORKERS if workers is None else workers
+        if not jobs:
+            labels = []
+        elif workers <= 0:
+            labels = [generate(*job) for job in jobs]
+        else:
+            # spawn, not fork: the parent runs an event loop and other threads
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                     mp_context=get_context("spawn"), initializer=_init_worker,
+                                     initargs=(engine.url.render_as_string(hide_password=False),)) as pool:
+                labels = list(pool.map(generate, *zip(*jobs)))
+        # only once the rebuilds are stored; a failed run reads the same changes again
+        outbox.advance_checkpoint(db, "reports", position)
+        db.commit()
+    finally:
+        db.close()
+    built = [f"{t}/{k}/{label}" for (t, k, _, _), label in zip(jobs, labels) if label]
+    if built:
+        log.info("built reports: %s", ", ".join(built))
+    return built
+
+
+def list_reports(tenant: str) -> List[Dict[str, Any]]:
+    out = []
+    for kind in KINDS:
+        folder = REPORTS_DIR / tenant / kind
+        if not folder.is_dir():
+            continue
+        for f in sorted(folder.glob("*.json"), reverse=True):
+            out.append({
+                "kind": kind,
+                "period": f.stem,
+                "formats": [fmt for fmt in FORMATS if f.with_suffix(f".{fmt}").exists()],
+            })
+    return out
+
+
+class ReportScheduler:
+    """Background thread: checks for newly closed periods every `interval` seconds."""
+
+    def __init__(self, interval: float = REPORT_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="report-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                run_once()
+            except Exception:
+                log.exception("scheduled report build failed")
+            self._stop.wait(self.interval)
+
+
+scheduler = ReportScheduler()
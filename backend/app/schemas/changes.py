@@ -0,0 +1,9 @@
+# backend/app/schemas/changes.py
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+
+class CheckpointIn(BaseModel):
+    consumer: str = Field(..., min_length=1, max_length=80)
+    position: int = Field(..., ge=0)
@@ -1,6 +1,6 @@
 # backend/app/schemas/incidents.py
 from __future__ import annotations
-from typing import Optional, List, Literal
+from typing import Any, Dict, Optional, List, Literal
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -34,3 +34,31 @@ class IncidentOut(BaseModel):
 class IncidentList(BaseModel):
     items: List[IncidentOut]
     total: int
+
+# ----- Batch payloads -----
+# Items stay loosely typed here so one bad item is reported in its result
+# slot instead of failing the whole batch; each is validated individually
+# with IncidentCreate / IncidentStatusChange.
+
+MAX_BATCH = 500
+
+class IncidentBatchCreate(BaseModel):
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BATCH)
+
+class IncidentStatusChange(BaseModel):
+    id: int
+    status: Literal["open", "closed"]
+
+class IncidentBatchStatusUpdate(BaseModel):
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BATCH)
+
+class BatchItemResult(BaseModel):
+    index: int
+    ok: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
@@ -0,0 +1,55 @@
+# app/scripts/bench_incidents.py
+"""
+Throughput of the single-item incident write path (add -> commit -> refresh,
+as in crud.create_incident) against the batched INSERT ... RETURNING path.
+
+    python -m app.scripts.bench_incidents --count 2000 --batch 200
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="steward-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+
+    from app.api.incidents import create_incidents_batch
+    from app.db import Base, SessionLocal, engine
+    from app.models import Incident
+
+    Base.metadata.create_all(bind=engine)
+    items = [{"outlet": "Main", "severity": "low", "title": f"Incident {i}"} for i in range(args.count)]
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        for item in items:
+            obj = Incident(tenant_id="legacy", status="OPEN", **item)
+            db.add(obj)
+            db.commit()
+            db.refresh(obj)
+        single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for i in range(0, len(items), args.batch):
+            create_incidents_batch(db, "legacy", items[i : i + args.batch])
+        batched = time.perf_counter() - t0
+    finally:
+        db.close()
+
+    print(f"single-item: {args.count / single:10.0f} incidents/s  ({single:.3f}s)")
+    print(f"batch={args.batch:<5}: {args.count / batched:10.0f} incidents/s  ({batched:.3f}s)")
+    print(f"speedup: {single / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# app/scripts/bench_modelmeta.py
+"""
+Per-request overhead removed by the model-metadata registry
+(app/modelmeta.py): each case times the old per-call work against the
+registry lookup that replaced it.
+
+    python -m app.scripts.bench_modelmeta --rows 20 --number 20000
+
+Cases:
+  - amount:    probing SaleItem for ten price/total columns vs META lookup
+  - list stmt: building the handover list SELECT (column set, where,
+               order, limit/offset) vs the cached bind-parameter statement
+  - encode:    Core rows -> read-model named tuples -> _asdict() vs
+               positional dicts straight from the rows
+  - request:   statement + execute + encode of one list page, end to end
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import timeit
+from datetime import date, timedelta
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20, help="rows per list page")
+    parser.add_argument("--number", type=int, default=20000, help="calls per case")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="steward-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+
+    from sqlalchemy import func, insert, literal
+
+    from app.db import Base, SessionLocal, engine
+    from app.modelmeta import META, row_dicts
+    from app.models import Handover, SaleItem
+    from app.readmodels import HandoverRow, as_dicts, fetch_rows, select_rows
+
+    Base.metadata.create_all(bind=engine)
+    start = date(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Handover), [
+            {"tenant_id": "legacy", "date": start + timedelta(days=i), "outlet": f"Outlet {i % 7}",
+             "shift": "AM" if i % 2 else "PM", "covers": i % 120}
+            for i in range(max(args.rows, 1) * 5)
+        ])
+
+    # --- the per-call code the registry replaced --------------------------
+    def probe_amount():
+        for unit_col in ("unit_price", "unitprice", "rate", "price"):
+            if hasattr(SaleItem, unit_col):
+                return func.coalesce(getattr(SaleItem, "qty"), 0) * func.coalesce(getattr(SaleItem, unit_col), 0)
+        for total_col in ("amount", "total", "total_amount", "total_price", "line_total", "subtotal"):
+            if hasattr(SaleItem, total_col):
+                return func.coalesce(getattr(SaleItem, total_col), 0)
+        return literal(0.0)
+
+    def build_list_stmt(tenant="legacy", limit=args.rows, offset=0):
+        select_rows.cache_clear()  # it used to be rebuilt on every call as well
+        q = select_rows(HandoverRow).where(Handover.tenant_id == tenant)
+        model_cols = set(Handover.__table__.columns.keys())
+        if "date" in model_cols and "id" in model_cols:
+            q = q.order_by(Handover.date.desc(), Handover.id.desc())
+        return q.limit(limit).offset(offset)
+
+    handovers = META[Handover]
+    params = {"tenant": "legacy", "limit": args.rows, "offset": 0}
+    db = SessionLocal()
+    core_rows = db.execute(handovers.list_statement(), params).all()
+
+    def old_request():
+        return as_dicts(fetch_rows(db, build_list_stmt(), HandoverRow))
+
+    def new_request():
+        return row_dicts(HandoverRow, db.execute(handovers.list_statement(), params))
+
+    assert old_request() == new_request()
+    cases = [
+        ("amount", probe_amount, lambda: META[SaleItem].amount),
+        ("list stmt", build_list_stmt, lambda: handovers.list_statement()),
+        ("encode", lambda: as_dicts(map(HandoverRow._make, core_rows)), lambda: row_dicts(HandoverRow, core_rows)),
+        ("request", old_request, new_request),
+    ]
+    print(f"{args.number} calls per case, {args.rows} rows per page")
+    for name, old, new in cases:
+        number = args.number if name != "request" else max(1, args.number // 10)
+        t_old = min(timeit.repeat(old, number=number, repeat=3)) / number * 1e6
+        t_new = min(timeit.repeat(new, number=number, repeat=3)) / number * 1e6
+        print(f"{name:<10}: {t_old:9.2f} us -> {t_new:9.2f} us  (saves {t_old - t_new:8.2f} us/call, {t_old / t_new:5.1f}x)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
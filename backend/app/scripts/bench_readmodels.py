@@ -0,0 +1,77 @@
+# app/scripts/bench_readmodels.py
+"""
+Rows/sec and memory per row for list-style reads: ORM entities
+(db.query(Model).all() + per-column dict) against the named-tuple read
+models in app/readmodels.py.
+
+    python -m app.scripts.bench_readmodels --count 20000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+
+def _measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), elapsed, peak
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="steward-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+
+    from sqlalchemy import insert
+
+    from app.db import Base, SessionLocal, engine
+    from app.models import Handover
+    from app.readmodels import HandoverRow, as_dicts, fetch_rows, select_rows
+
+    Base.metadata.create_all(bind=engine)
+    start = date(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Handover), [
+            {"tenant_id": "legacy", "date": start + timedelta(days=i % 365), "outlet": f"Outlet {i % 7}",
+             "shift": "AM" if i % 2 else "PM", "covers": i % 120}
+            for i in range(args.count)
+        ])
+    columns = Handover.__table__.columns.keys()
+
+    def orm():
+        db = SessionLocal()
+        try:
+            return [{c: getattr(h, c) for c in columns} for h in db.query(Handover).all()]
+        finally:
+            db.close()
+
+    def read_model():
+        db = SessionLocal()
+        try:
+            return as_dicts(fetch_rows(db, select_rows(HandoverRow), HandoverRow))
+        finally:
+            db.close()
+
+    orm()  # warm the compiled-statement cache for both paths
+    read_model()
+    for label, fn in (("orm", orm), ("read model", read_model)):
+        n, elapsed, peak = _measure(fn)
+        print(f"{label:<10}: {n / elapsed:10.0f} rows/s  peak {peak / n:7.0f} B/row  ({elapsed:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
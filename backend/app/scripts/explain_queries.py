@@ -0,0 +1,54 @@
+# app/scripts/explain_queries.py
+"""
+Run the hot API queries against a seeded throwaway database and print each
+SQL statement with its plan, flagged scans / temp B-trees and index advice.
+
+    python -m app.scripts.explain_queries            # seeded temp SQLite
+    python -m app.scripts.explain_queries --use-env  # existing DATABASE_URL
+
+Exits 1 when any hot query regresses to a full table scan.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--use-env", action="store_true", help="explain against DATABASE_URL instead of a seeded temp DB")
+    parser.add_argument("--tenant", default="legacy")
+    args = parser.parse_args(argv)
+
+    if not args.use_env:
+        tmp = tempfile.mkdtemp(prefix="steward-explain-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/explain.db"
+    os.environ.setdefault("ALLOWED_TENANTS", args.tenant)
+
+    # import after DATABASE_URL is final: app.db builds the engine at import time
+    from fastapi.testclient import TestClient
+
+    from app import queryplan
+    from app.db import Base, SessionLocal, engine
+    from app.main import app
+
+    if not args.use_env:
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            queryplan.seed_sample_data(db, tenants=(args.tenant, "other"))
+        finally:
+            db.close()
+
+    with TestClient(app) as client:
+        reports = queryplan.check_hot_queries(client, engine, headers={"X-Tenant": args.tenant})
+    print(queryplan.format_report(reports))
+    failed = [r for r in reports if not r.ok]
+    print(f"\n{len(reports)} statements, {len(failed)} full scans")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# app/scripts/load_herd.py
+"""
+Thundering-herd load test for the dashboard endpoints: N clients of one
+tenant open the dashboard at the same moment, against a cold cache.
+
+    python -m app.scripts.load_herd --clients 50 --delay-ms 200
+
+Runs the herd twice, with single-flight coalescing on and off, in-process
+(httpx ASGI transport) against a seeded temp SQLite database. --delay-ms
+adds a sleep to each analytics computation to stand in for a slow
+database. Per run it prints the SQL statements issued, the peak number of
+worker threads inside a cached lookup (a request waiting on the result
+cache's lock holds one), the coalesced count and the wall time.
+
+The statement count is the same either way, since the result cache
+already computes a missing key once; without coalescing every waiting
+request parks a thread of the pool (40 by default) that sync routes of
+all tenants share.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from typing import List, Sequence, Tuple
+
+DASHBOARD: List[Tuple[str, dict]] = [
+    ("/api/analytics/kpi-summary", {"date_from": "2024-01-01", "date_to": "2024-03-31"}),
+    ("/api/analytics/revenue-trend", {"date_from": "2024-01-01", "date_to": "2024-03-31"}),
+    ("/api/analytics/top-items", {"date_from": "2024-01-01", "date_to": "2024-03-31"}),
+]
+
+
+async def herd(client, requests: Sequence[Tuple[str, dict]], clients: int) -> list:
+    """Every client fires every request at once; returns the responses."""
+    return await asyncio.gather(*(client.get(path, params=params) for _ in range(clients) for path, params in requests))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--delay-ms", type=float, default=200.0)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="steward-herd-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/herd.db"
+    os.environ.setdefault("ALLOWED_TENANTS", "legacy")
+    # admission control would shed most of the herd; measure coalescing alone
+    os.environ["RATE_ANALYTICS_PER_SEC"] = os.environ["RATE_ANALYTICS_BURST"] = str(args.clients * 10)
+    os.environ["TENANT_MAX_CONCURRENCY"] = str(args.clients * 10)
+    os.environ["ADMISSION_MAX_QUEUE_MS"] = "60000"
+
+    import httpx
+
+    from app import queryplan, singleflight
+    from app.api import analytics
+    from app.cache import get_cache
+    from app.db import Base, SessionLocal, engine
+    from app.main import app
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        queryplan.seed_sample_data(db, tenants=("legacy",))
+    finally:
+        db.close()
+
+    def slow(fn):
+        def wrapper(*a, **kw):
+            time.sleep(args.delay_ms / 1000.0)
+            return fn(*a, **kw)
+        return wrapper
+
+    analytics.kpi_totals = slow(analytics.kpi_totals)
+    analytics.revenue_by_period = slow(analytics.revenue_by_period)
+    analytics.item_totals = slow(analytics.item_totals)
+
+    lock = threading.Lock()
+    active, peak = [0], [0]
+    payload = analytics._payload
+
+    def counted(*a, **kw):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            return payload(*a, **kw)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    analytics._payload = counted
+
+    async def run() -> Tuple[list, float]:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://herd",
+                                     headers={"X-Tenant": "legacy"}, timeout=120.0) as client:
+            t0 = time.perf_counter()
+            responses = await herd(client, DASHBOARD, args.clients)
+            return responses, time.perf_counter() - t0
+
+    print(f"{args.clients} clients x {len(DASHBOARD)} dashboard requests, +{args.delay_ms:g} ms per computation")
+    for enabled in (True, False):
+        singleflight.SINGLEFLIGHT_ENABLED = enabled
+        singleflight.flights.reset()
+        get_cache().clear()
+        peak[0] = 0
+        with queryplan.capture_statements(engine) as captured:
+            responses, elapsed = asyncio.run(run())
+        failed = sum(1 for r in responses if r.status_code != 200)
+        coalesced = sum(s["coalesced"] for s in singleflight.flights.stats()["endpoints"].values())
+        print(f"single-flight {'on ' if enabled else 'off'}: {len(captured):4d} SQL statements, "
+              f"peak threads {peak[0]:3d}, coalesced {coalesced:4d}, failed {failed}, {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -62,7 +62,7 @@ def seed_handovers(db) -> None:
                 "top_sales": ", ".join(rnd.sample(top_sales_all, k=3)),
                 "created_at": now_minus(rnd.randint(60, 360)),
             }
-            rows.append(Handover(**pick(payload, cols)))
+            rows.append(Handover(**pick(payload, cols | {"top_sales"})))
     db.add_all(rows)
 
 def seed_incidents(db) -> None:
@@ -0,0 +1,62 @@
+# app/scripts/slow_queries.py
+"""
+Summarize the slow-query log (app/slowlog.py) by statement fingerprint.
+
+    python -m app.scripts.slow_queries                     # SLOW_QUERY_LOG + rotated files
+    python -m app.scripts.slow_queries --sort p95 --top 10
+    python -m app.scripts.slow_queries --route /api/analytics --since 2024-05-01T08:00 --plans
+    python -m app.scripts.slow_queries logs/slow_queries.log* --json
+
+Prints count, total time, p95 and max per fingerprint, with the routes
+that issued it; --plans adds the slowest sample's parameters and plan.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="log files (default: SLOW_QUERY_LOG and its backups)")
+    parser.add_argument("--sort", choices=("total", "count", "p95"), default="total")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only records at or after this UTC time")
+    parser.add_argument("--tenant")
+    parser.add_argument("--route", help="only routes containing this text")
+    parser.add_argument("--plans", action="store_true", help="show the slowest sample's params and plan")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    from app import slowlog
+
+    paths = [Path(f) for f in args.files] or slowlog.log_files()
+    if not paths:
+        print(f"no slow-query log at {slowlog.SLOW_QUERY_LOG}", file=sys.stderr)
+        return 1
+    stats = slowlog.summarize(slowlog.read_log(paths), sort=args.sort, since=args.since,
+                              tenant=args.tenant, route=args.route)[: args.top]
+
+    if args.json:
+        print(json.dumps([s.as_dict() for s in stats], indent=2, default=str))
+        return 0
+
+    print(f"{'count':>7} {'total ms':>11} {'p95 ms':>9} {'max ms':>9}  fingerprint")
+    for s in stats:
+        d = s.as_dict()
+        print(f"{d['count']:>7} {d['total_ms']:>11.1f} {d['p95_ms']:>9.1f} {d['max_ms']:>9.1f}  {s.fingerprint[:160]}")
+        routes = ", ".join(f"{r} ({n})" for r, n in list(d["routes"].items())[:3])
+        print(f"{'':>40}routes: {routes}" + (f"; {s.errors} failed" if s.errors else ""))
+        if args.plans and s.slowest:
+            print(f"{'':>40}slowest params: {json.dumps(s.slowest.get('params'), default=str)}")
+            for line in s.slowest.get("plan") or [s.slowest.get("error") or s.slowest.get("plan_error") or "-"]:
+                print(f"{'':>42}{line}")
+    print(f"\n{sum(s.count for s in stats)} slow statements in {len(stats)} fingerprints (top {args.top} by {args.sort})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
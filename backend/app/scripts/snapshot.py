@@ -0,0 +1,56 @@
+# app/scripts/snapshot.py
+"""
+Clone a tenant between databases (or within one) via Parquet snapshots.
+
+    python -m app.scripts.snapshot dump legacy snapshots/legacy
+    python -m app.scripts.snapshot restore snapshots/legacy --tenant demo --replace
+
+Both commands use DATABASE_URL unless --database-url is given. Needs the
+optional pyarrow package.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import create_engine
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL")
+    parser.add_argument("--batch-rows", type=int, default=None)
+    sub = parser.add_subparsers(dest="command", required=True)
+    d = sub.add_parser("dump", help="write one tenant's tables to a snapshot directory")
+    d.add_argument("tenant")
+    d.add_argument("out_dir")
+    r = sub.add_parser("restore", help="bulk-load a snapshot directory")
+    r.add_argument("src_dir")
+    r.add_argument("--tenant", help="restore under this tenant id (default: the snapshot's)")
+    r.add_argument("--replace", action="store_true", help="delete the tenant's existing rows first")
+    args = parser.parse_args(argv)
+
+    from app import snapshot
+    from app.db import engine
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    batch = {"batch_rows": args.batch_rows} if args.batch_rows else {}
+
+    t0 = time.perf_counter()
+    try:
+        if args.command == "dump":
+            counts = {name: t["rows"] for name, t in snapshot.dump(engine, args.tenant, args.out_dir, **batch)["tables"].items()}
+        else:
+            counts = snapshot.restore(engine, args.src_dir, tenant=args.tenant, replace=args.replace, **batch)
+    except snapshot.SnapshotError as exc:
+        sys.exit(f"error: {exc}")
+    elapsed = time.perf_counter() - t0
+    for name, n in counts.items():
+        print(f"{name:<20} {n:>10}")
+    print(f"{args.command}: {sum(counts.values())} rows in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# app/search.py
+"""
+Full-text search over incident titles and guest-note bodies.
+
+SQLite: external-content FTS5 tables (incidents_fts, guest_notes_fts) kept in
+sync by AFTER INSERT/UPDATE/DELETE triggers, ranked with bm25().
+Postgres: a generated tsvector column per table with a GIN index, ranked
+with ts_rank().
+Other databases: no index; every word must appear in the text (LIKE,
+case-insensitive), newest first.
+
+install() / uninstall() are hooked to Base.metadata create/drop so
+create_all() in seeds and tests gets the search objects too; the Alembic
+migration calls install() and rebuilds the index for existing rows.
+"""
+from __future__ import annotations
+
+import re
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .db import Base
+
+# table -> (indexed text column, timestamp column)
+SOURCES: Dict[str, tuple] = {
+    "incidents": ("title", "created_at"),
+    "guest_notes": ("note", "created_at"),
+}
+KINDS = ("incidents", "guest_notes")
+
+
+def _sqlite_ddl(table: str, col: str) -> List[str]:
+    fts = f"{table}_fts"
+    ins = f"INSERT INTO {fts}(rowid, {col}, tenant_id) VALUES (new.id, new.{col}, new.tenant_id);"
+    dele = (
+        f"INSERT INTO {fts}({fts}, rowid, {col}, tenant_id) "
+        f"VALUES ('delete', old.id, old.{col}, old.tenant_id);"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{col}, tenant_id UNINDEXED, content='{table}', content_rowid='id', tokenize='unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {ins} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {dele} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col}, tenant_id ON {table} BEGIN {dele} {ins} END",
+    ]
+
+
+def _postgres_ddl(table: str, col: str) -> List[str]:
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('simple', coalesce({col}, ''))) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_tsv ON {table} USING GIN (search_tsv)",
+    ]
+
+
+def install(conn: Connection, rebuild: bool = False) -> None:
+    dialect = conn.dialect.name
+    for table, (col, _) in SOURCES.items():
+        if dialect == "sqlite":
+            for stmt in _sqlite_ddl(table, col):
+                conn.exec_driver_sql(stmt)
+            if rebuild:
+                conn.exec_driver_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        elif dialect == "postgresql":
+            for stmt in _postgres_ddl(table, col):
+                conn.exec_driver_sql(stmt)
+
+
+def uninstall(conn: Connection) -> None:
+    dialect = conn.dialect.name
+    for table, _ in SOURCES.items():
+        if dialect == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}_fts")
+        elif dialect == "postgresql":
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{table}_search_tsv")
+            conn.exec_driver_sql(f"ALTER TABLE IF EXISTS {table} DROP COLUMN IF EXISTS search_tsv")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw) -> None:
+    install(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _before_drop(target, connection, **kw) -> None:
+    uninstall(connection)
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts5_query(q: str) -> Optional[str]:
+    """Quote each word so user input can't inject FTS5 syntax; last word is a prefix match."""
+    words = _TOKEN.findall(q)
+    if not words:
+        return None
+    quoted = [f'"{w}"' for w in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _sqlite_branch(table: str) -> str:
+    col, ts = SOURCES[table]
+    fts = f"{table}_fts"
+    return (
+        f"SELECT '{table}' AS kind, t.id AS id, t.{col} AS body, "
+        f"snippet({fts}, 0, '[', ']', '…', 12) AS snippet, "
+        f"-bm25({fts}) AS score, t.{ts} AS created_at "
+        f"FROM {fts} JOIN {table} t ON t.id = {fts}.rowid "
+        f"WHERE {fts} MATCH :q AND {fts}.tenant_id = :tenant"
+    )
+
+
+def _postgres_branch(table: str) -> str:
+    col, ts = SOURCES[table]
+    return (
+        f"SELECT '{table}' AS kind, t.id AS id, t.{col} AS body, "
+        f"ts_headline('simple', t.{col}, websearch_to_tsquery('simple', :q)) AS snippet, "
+        f"ts_rank(t.search_tsv, websearch_to_tsquery('simple', :q)) AS score, t.{ts} AS created_at "
+        f"FROM {table} t "
+        f"WHERE t.tenant_id = :tenant AND t.search_tsv @@ websearch_to_tsquery('simple', :q)"
+    )
+
+
+def _like_branch(table: str, words: int) -> str:
+    col, ts = SOURCES[table]
+    match = " AND ".join(f"lower(t.{col}) LIKE :w{i} ESCAPE '!'" for i in range(words))
+    return (
+        f"SELECT '{table}' AS kind, t.id AS id, t.{col} AS body, t.{col} AS snippet, "
+        f"0.0 AS score, t.{ts} AS created_at "
+        f"FROM {table} t "
+        f"WHERE t.tenant_id = :tenant AND {match}"
+    )
+
+
+def _like_pattern(word: str) -> str:
+    return "%" + re.sub(r"([!%_])", r"!\1", word) + "%"
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def search(db: Session, tenant: str, q: str, kinds=KINDS, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """Ranked, tenant-scoped, paginated matches across the requested kinds."""
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        match = _fts5_query(q)
+        branch = _sqlite_branch
+        params = {"q": match}
+    elif dialect == "postgresql":
+        match = q.strip() or None
+        branch = _postgres_branch
+        params = {"q": match}
+    else:
+        match = _TOKEN.findall(q.lower()) or None
+        branch = partial(_like_branch, words=len(match or ()))
+        params = {f"w{i}": _like_pattern(w) for i, w in enumerate(match or ())}
+    if match is None:
+        return {"total": 0, "items": []}
+
+    union = " UNION ALL ".join(branch(k) for k in kinds)
+    params["tenant"] = tenant
+    total = db.execute(text(f"SELECT count(*) FROM ({union}) AS hits"), params).scalar() or 0
+    rows = db.execute(
+        text(f"SELECT * FROM ({union}) AS hits ORDER BY score DESC, created_at DESC LIMIT :limit OFFSET :offset"),
+        {**params, "limit": limit, "offset": offset},
+    ).mappings().all()
+    return {
+        "total": int(total),
+        "items": [
+            {
+                "kind": r["kind"],
+                "id": r["id"],
+                "text": r["body"],
+                "snippet": r["snippet"],
+                "score": float(r["score"] or 0.0),
+                "created_at": r["created_at"],
+            }
+            for r in rows
+        ],
+    }
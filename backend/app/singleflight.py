@@ -0,0 +1,124 @@
+# app/singleflight.py
+"""
+Single-flight coalescing for identical concurrent requests.
+
+flights.run(name, key, fn) runs fn() in the thread pool for the first
+caller of `key` (the leader). Callers arriving while it runs await the
+same future on the event loop and get the same result or exception,
+without taking a thread or a database connection. The entry is dropped
+as soon as the leader finishes, so later callers start over (and
+normally hit the result cache the leader just filled).
+
+The shared computation runs under its own QueryBudget with the leader's
+statement timeout: a leader whose client disconnects does not cancel
+the query the others are waiting for.
+
+Counters per name (executed, coalesced, errors) and the keys in flight
+are exposed by stats() on GET /api/ops/coalescing. SINGLEFLIGHT=off runs
+every call on its own.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import timeouts
+
+SINGLEFLIGHT_ENABLED = (os.getenv("SINGLEFLIGHT") or "on").strip().lower() not in ("0", "off", "false")
+
+
+def _detached(fn: Callable[[], Any]) -> Callable[[], Any]:
+    budget = timeouts.current()
+    if budget is None:
+        return fn
+    timeout = budget.timeout
+
+    def call() -> Any:
+        with timeouts.scope(timeouts.QueryBudget(timeout)):
+            return fn()
+    return call
+
+
+class Group:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # concurrent Futures, so a flight can be awaited from any event loop
+            self._flights: Dict[Hashable, Future] = {}
+            self._waiting: Counter = Counter()
+            self.executed: Counter = Counter()
+            self.coalesced: Counter = Counter()
+            self.errors: Counter = Counter()
+
+    def waiting(self, key: Hashable) -> int:
+        """Callers currently waiting on `key`'s leader."""
+        return self._waiting[key]
+
+    async def run(self, name: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+        if not SINGLEFLIGHT_ENABLED:
+            self.executed[name] += 1
+            return await run_in_threadpool(fn)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Future()
+                flight.set_running_or_notify_cancel()  # a cancelled follower must not cancel the flight
+                self.executed[name] += 1
+                leader = True
+            else:
+                self.coalesced[name] += 1
+                self._waiting[key] += 1
+                leader = False
+
+        if not leader:
+            try:
+                return await asyncio.wrap_future(flight)
+            finally:
+                with self._lock:
+                    self._waiting[key] -= 1
+                    if not self._waiting[key]:
+                        del self._waiting[key]
+
+        try:
+            result = await run_in_threadpool(_detached(fn))
+        except BaseException as exc:
+            self.errors[name] += 1
+            flight.set_exception(exc if isinstance(exc, Exception) else RuntimeError("coalesced call aborted"))
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def stats(self) -> Dict[str, object]:
+        names = sorted(set(self.executed) | set(self.coalesced))
+        out = {}
+        for name in names:
+            calls = self.executed[name] + self.coalesced[name]
+            out[name] = {
+                "calls": calls,
+                "executed": self.executed[name],
+                "coalesced": self.coalesced[name],
+                "errors": self.errors[name],
+                "coalesced_ratio": round(self.coalesced[name] / calls, 3) if calls else 0.0,
+            }
+        return {
+            "enabled": SINGLEFLIGHT_ENABLED,
+            "in_flight": len(self._flights),
+            "waiting": sum(self._waiting.values()),
+            "endpoints": out,
+        }
+
+
+flights = Group()
@@ -0,0 +1,201 @@
+# app/sketches.py
+"""
+Fixed-size streaming summaries used by the approximate analytics mode.
+
+Every structure here has a memory ceiling that does not depend on how many
+rows were fed into it, and every one can be merged with another instance of
+the same shape so per-month summaries combine into a range answer.
+"""
+from __future__ import annotations
+
+import hashlib
+import math
+import random
+from bisect import bisect_left
+from typing import Any, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+Z_95 = 1.96  # two-sided 95% normal quantile used for all reported bounds
+
+
+# ---- Reservoir sample (Algorithm R) ----
+class Reservoir(Generic[T]):
+    """Uniform sample of at most `capacity` items from a stream of unknown length."""
+
+    __slots__ = ("capacity", "seen", "items", "_rng")
+
+    def __init__(self, capacity: int = 512, seed: Optional[int] = None):
+        self.capacity = capacity
+        self.seen = 0
+        self.items: List[T] = []
+        self._rng = random.Random(seed)
+
+    def add(self, item: T) -> None:
+        self.seen += 1
+        if len(self.items) < self.capacity:
+            self.items.append(item)
+            return
+        j = self._rng.randrange(self.seen)
+        if j < self.capacity:
+            self.items[j] = item
+
+    @property
+    def exact(self) -> bool:
+        return self.seen <= self.capacity
+
+    def estimate_sum(self, s: float, s2: float) -> Tuple[float, float]:
+        """
+        Horvitz-Thompson total for a domain of interest, given the sum `s` and
+        sum of squares `s2` of the value over sampled items in that domain.
+        Returns (estimate, variance) under sampling without replacement.
+        """
+        k = len(self.items)
+        n = self.seen
+        if k == 0:
+            return 0.0, 0.0
+        if n <= k:
+            return float(s), 0.0
+        mean = s / k
+        var_z = max(0.0, (s2 - k * mean * mean) / (k - 1)) if k > 1 else 0.0
+        return n * mean, (n * n) * (1.0 - k / n) * var_z / k
+
+
+# ---- HyperLogLog distinct counter ----
+class HyperLogLog:
+    """Distinct-count sketch with 2**p one-byte registers (4 KiB at p=12)."""
+
+    __slots__ = ("p", "m", "registers")
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    @staticmethod
+    def _hash(value: Any) -> int:
+        raw = str(value).encode("utf-8")
+        return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "big")
+
+    def add(self, value: Any) -> None:
+        h = self._hash(value)
+        idx = h >> (64 - self.p)
+        rest = (h << self.p) & 0xFFFFFFFFFFFFFFFF
+        rank = 1
+        while rank <= 64 - self.p and not (rest & (1 << 63)):
+            rank += 1
+            rest <<= 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.p != self.p:
+            raise ValueError("cannot merge HyperLogLog sketches of different precision")
+        regs = self.registers
+        for i, r in enumerate(other.registers):
+            if r > regs[i]:
+                regs[i] = r
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def count(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return raw
+
+
+# ---- t-digest quantile sketch ----
+class TDigest:
+    """
+    Merging t-digest with the arcsine (k1) scale function: at most
+    `compression` centroids regardless of input size, with small centroids
+    near the tails so p95/p99 stay accurate.
+    """
+
+    __slots__ = ("compression", "means", "weights", "count", "min", "max", "_buffer")
+
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[Tuple[float, float]] = []
+
+    def add(self, x: float, w: float = 1.0) -> None:
+        x = float(x)
+        self._buffer.append((x, w))
+        self.count += w
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other._compress()
+        for m, w in zip(other.means, other.weights):
+            self._buffer.append((m, w))
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+        means: List[float] = []
+        weights: List[float] = []
+        cum = 0.0
+        k_lo = self._k(0.0)
+        cur_m, cur_w = points[0]
+        for m, w in points[1:]:
+            if self._k((cum + cur_w + w) / total) - k_lo <= 1.0:
+                cur_w += w
+                cur_m += (m - cur_m) * w / cur_w
+            else:
+                means.append(cur_m)
+                weights.append(cur_w)
+                cum += cur_w
+                k_lo = self._k(cum / total)
+                cur_m, cur_w = m, w
+        means.append(cur_m)
+        weights.append(cur_w)
+        self.means, self.weights = means, weights
+
+    def _k(self, q: float) -> float:
+        q = min(1.0, max(0.0, q))
+        return self.compression / (2.0 * math.pi) * math.asin(2.0 * q - 1.0)
+
+    def quantile(self, q: float) -> Tuple[float, float, float]:
+        """Returns (estimate, lower_bound, upper_bound) for quantile q in [0, 1]."""
+        self._compress()
+        if not self.means:
+            return 0.0, 0.0, 0.0
+        if len(self.means) == 1:
+            return self.means[0], self.min, self.max
+        target = q * self.count
+        # cumulative weight at each centroid's midpoint
+        mids: List[float] = []
+        cum = 0.0
+        for w in self.weights:
+            mids.append(cum + w / 2.0)
+            cum += w
+        i = bisect_left(mids, target)
+        if i == 0:
+            return self.min + (self.means[0] - self.min) * (target / mids[0] if mids[0] else 0.0), self.min, self.means[0]
+        if i >= len(mids):
+            return self.means[-1], self.means[-1], self.max
+        lo_m, hi_m = self.means[i - 1], self.means[i]
+        span = mids[i] - mids[i - 1]
+        frac = (target - mids[i - 1]) / span if span else 0.0
+        return lo_m + (hi_m - lo_m) * frac, lo_m, hi_m
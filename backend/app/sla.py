@@ -0,0 +1,188 @@
+# app/sla.py
+"""
+Incident aging and SLA analytics, computed in SQL.
+
+  - open: incidents not in RESOLVED_STATUSES, bucketed by age (AGE_BUCKETS)
+    per severity, with the number already past their severity's SLA
+  - resolved: incidents resolved in [date_from, date_to], with count, mean
+    and nearest-rank P50/P90/P95 time-to-resolve per severity and breaches
+
+Both read only tenant/status/severity/created_at/resolved_at, which
+ix_incidents_tenant_status covers. Percentiles use row_number() over each
+severity's sorted durations, so SQLite and Postgres share one query.
+
+The open section depends on the clock and is always computed. The resolved
+section of a range that ended before today is cached without TTL in the
+shared cache; the incidents change log (app/outbox.py) is followed on each
+call, with its position kept in the cache next to the entries
+(outbox.follow()), and a tenant's entries are dropped when a change
+touches a past resolved_at (e.g. a closed incident is reopened).
+"""
+from __future__ import annotations
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, case, extract, func, literal, select
+from sqlalchemy.orm import Session
+
+from . import outbox
+from .cache import get_cache
+from .models import RESOLVED_STATUSES, Incident
+
+# upper bound (hours, exclusive) -> label; the last bucket is open-ended
+AGE_BUCKETS: List[Tuple[Optional[float], str]] = [
+    (1, "<1h"), (4, "1-4h"), (24, "4-24h"), (72, "1-3d"), (168, "3-7d"), (None, "7d+"),
+]
+PERCENTILES = (50, 90, 95)
+
+
+def _sla_hours() -> Dict[str, float]:
+    raw = os.getenv("INCIDENT_SLA_HOURS") or "HIGH:4,MEDIUM:24,LOW:72"
+    out = {}
+    for part in raw.split(","):
+        sev, _, hours = part.partition(":")
+        if sev.strip() and hours.strip():
+            out[sev.strip().upper()] = float(hours)
+    return out
+
+
+SLA_HOURS = _sla_hours()
+DEFAULT_SLA_HOURS = max(SLA_HOURS.values(), default=72.0)
+
+
+def _hours(db: Session, later, earlier):
+    """Elapsed hours between two DateTime expressions, per dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        return extract("epoch", later - earlier) / 3600.0
+    return (func.julianday(later) - func.julianday(earlier)) * 24.0
+
+
+def _sla_for(severity_col):
+    return case(SLA_HOURS, value=func.upper(severity_col), else_=DEFAULT_SLA_HOURS)
+
+
+def _bucket(age):
+    whens = [(age < upper, label) for upper, label in AGE_BUCKETS if upper is not None]
+    return case(*whens, else_=AGE_BUCKETS[-1][1])
+
+
+def open_aging(db: Session, tenant: str, now: datetime) -> Dict[str, Any]:
+    age = _hours(db, literal(now, DateTime), Incident.created_at)
+    aged = (
+        select(
+            Incident.severity.label("severity"),
+            _bucket(age).label("bucket"),
+            case((age > _sla_for(Incident.severity), 1), else_=0).label("breached"),
+        )
+        .where(Incident.tenant_id == tenant, Incident.status.notin_(RESOLVED_STATUSES))
+        .subquery()
+    )
+    rows = db.execute(
+        select(aged.c.severity, aged.c.bucket, func.count(), func.sum(aged.c.breached))
+        .group_by(aged.c.severity, aged.c.bucket)
+    ).all()
+
+    by_severity: Dict[str, Any] = {}
+    for severity, bucket, n, breached in rows:
+        entry = by_severity.setdefault(severity, {
+            "count": 0, "breached": 0, "sla_hours": SLA_HOURS.get(severity.upper(), DEFAULT_SLA_HOURS),
+            "histogram": {label: 0 for _, label in AGE_BUCKETS},
+        })
+        entry["count"] += n
+        entry["breached"] += int(breached or 0)
+        entry["histogram"][bucket] = n
+    return {
+        "total": sum(e["count"] for e in by_severity.values()),
+        "breached": sum(e["breached"] for e in by_severity.values()),
+        "by_severity": dict(sorted(by_severity.items())),
+    }
+
+
+def resolution_times(db: Session, tenant: str, date_from: date, date_to: date) -> Dict[str, Any]:
+    start = datetime.combine(date_from, datetime.min.time())
+    stop = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    ttr = _hours(db, Incident.resolved_at, Incident.created_at)
+    ranked = (
+        select(
+            Incident.severity.label("severity"),
+            ttr.label("ttr"),
+            case((ttr > _sla_for(Incident.severity), 1), else_=0).label("breached"),
+            func.row_number().over(partition_by=Incident.severity, order_by=ttr).label("rn"),
+            func.count().over(partition_by=Incident.severity).label("n"),
+        )
+        .where(
+            Incident.tenant_id == tenant,
+            Incident.status.in_(RESOLVED_STATUSES),
+            Incident.resolved_at >= start,
+            Incident.resolved_at < stop,
+        )
+        .subquery()
+    )
+    # nearest rank: the smallest duration whose rank reaches p% of the group
+    pcts = [func.min(case((ranked.c.rn * 100 >= ranked.c.n * p, ranked.c.ttr))) for p in PERCENTILES]
+    rows = db.execute(
+        select(ranked.c.severity, func.count(), func.avg(ranked.c.ttr), func.sum(ranked.c.breached), *pcts)
+        .group_by(ranked.c.severity)
+    ).all()
+
+    by_severity = {}
+    for severity, n, avg, breached, *values in rows:
+        by_severity[severity] = {
+            "count": n,
+            "breached": int(breached or 0),
+            "sla_hours": SLA_HOURS.get(severity.upper(), DEFAULT_SLA_HOURS),
+            "avg_hours": round(float(avg or 0.0), 2),
+            **{f"p{p}_hours": round(float(v or 0.0), 2) for p, v in zip(PERCENTILES, values)},
+        }
+    return {
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "total": sum(e["count"] for e in by_severity.values()),
+        "breached": sum(e["breached"] for e in by_severity.values()),
+        "by_severity": dict(sorted(by_severity.items())),
+    }
+
+
+# --- caching of closed ranges -----------------------------------------------
+
+def _namespace(prefix: str, tenant: str) -> str:
+    return f"{prefix}/{tenant}"
+
+
+def _invalidate_changed(db: Session, today: date) -> str:
+    """Drop a tenant's cached ranges when a change moved a resolved_at before today; returns the prefix."""
+    cache = get_cache()
+
+    def apply(changes: List[outbox.Change], prefix: str) -> None:
+        for c in changes:
+            stamps = {str(image.get("resolved_at") or "")[:10] for image in (c.old, c.new) if image}
+            if any(s and s < today.isoformat() for s in stamps):
+                cache.invalidate(_namespace(prefix, c.tenant_id))
+
+    return outbox.follow(db, "sla", ("incidents",), apply)
+
+
+def sla(db: Session, tenant: str, date_from: Optional[date] = None, date_to: Optional[date] = None,
+        now: Optional[datetime] = None) -> Dict[str, Any]:
+    now = now or datetime.utcnow()
+    today = now.date()
+    date_to = date_to or today
+    date_from = date_from or date_to - timedelta(days=29)
+
+    if date_to < today:
+        prefix = _invalidate_changed(db, today)
+        resolved = get_cache().get_or_compute(
+            _namespace(prefix, tenant), f"{date_from.isoformat()}..{date_to.isoformat()}",
+            lambda: resolution_times(db, tenant, date_from, date_to),
+        )
+    else:
+        resolved = resolution_times(db, tenant, date_from, date_to)
+    return {
+        "generated_at": now.isoformat(timespec="seconds") + "Z",
+        "sla_hours": SLA_HOURS,
+        "open": open_aging(db, tenant, now),
+        "resolved": resolved,
+    }
+
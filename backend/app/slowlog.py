@@ -0,0 +1,342 @@
+# app/slowlog.py
+"""
+Slow-query log.
+
+Engine hooks time every statement (before/after_cursor_execute; failures
+such as statement timeouts via handle_error). One that runs for
+SLOW_QUERY_MS or longer is written as a JSON line to SLOW_QUERY_LOG, a
+rotating file (SLOW_QUERY_LOG_BYTES per file, SLOW_QUERY_LOG_BACKUPS old
+files kept), with:
+
+  - sql, params, duration_ms, error if any; params are redacted to their
+    type ("<str>", "<date>"), as are string literals in Postgres plans,
+    because they carry guest names and notes; SLOW_QUERY_LOG_PARAMS=on
+    records the values (cut to PARAM_CHARS)
+  - tenant and route ("GET /api/analytics/compare") of the request that ran
+    it; RequestContextMiddleware keeps the ASGI scope in a context
+    variable, and FastAPI has put the matched route in it by query time
+  - plan: EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (Postgres) of the same
+    statement and parameters, run on the raw DBAPI connection so it is not
+    timed or logged itself; reads only, and not after an error
+
+The timing covers cursor.execute(); rows fetched afterwards are not
+included. read_log() and summarize() group records by fingerprint(): the
+SQL with literals and placeholders replaced by ?, IN lists and repeated
+UNION ALL arms collapsed, so one query shape is one row whatever its
+parameters. app/scripts/slow_queries.py prints that summary.
+
+SLOW_QUERY_LOG=off disables the hooks' logging (timing still costs two
+perf_counter() calls per statement).
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS") or 500)
+SLOW_QUERY_LOG = (os.getenv("SLOW_QUERY_LOG") or "./slow_queries.log").strip()
+SLOW_QUERY_LOG_BYTES = int(os.getenv("SLOW_QUERY_LOG_BYTES") or 10 * 1024 * 1024)
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS") or 5)
+SLOW_QUERY_EXPLAIN = (os.getenv("SLOW_QUERY_EXPLAIN") or "on").strip().lower() not in ("0", "off", "false")
+SLOW_QUERY_LOG_PARAMS = (os.getenv("SLOW_QUERY_LOG_PARAMS") or "off").strip().lower() in ("1", "on", "true")
+PARAM_CHARS = 200
+MAX_PARAM_SETS = 5  # executemany: first few parameter sets only
+
+_logger = logging.getLogger("steward.slow_queries")
+_logger.propagate = False
+_handler_lock = threading.Lock()
+_handler: Optional[RotatingFileHandler] = None
+
+_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_scope", default=None)
+
+
+def enabled() -> bool:
+    return SLOW_QUERY_LOG.lower() not in ("", "0", "off", "false")
+
+
+def configure(path: Optional[str] = None, threshold_ms: Optional[float] = None) -> None:
+    """Point the log somewhere else and/or change the threshold (tests, scripts)."""
+    global SLOW_QUERY_LOG, SLOW_QUERY_MS, _handler
+    with _handler_lock:
+        if path is not None:
+            SLOW_QUERY_LOG = str(path)
+            if _handler is not None:
+                _logger.removeHandler(_handler)
+                _handler.close()
+                _handler = None
+        if threshold_ms is not None:
+            SLOW_QUERY_MS = float(threshold_ms)
+
+
+def _ensure_handler() -> None:
+    global _handler
+    if _handler is not None:
+        return
+    with _handler_lock:
+        if _handler is None:
+            Path(SLOW_QUERY_LOG).parent.mkdir(parents=True, exist_ok=True)
+            _handler = RotatingFileHandler(
+                SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS, encoding="utf-8",
+            )
+            _handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(_handler)
+            _logger.setLevel(logging.INFO)
+
+
+# --- request context ----------------------------------------------------------
+
+class RequestContextMiddleware:
+    """Makes the current request's scope visible to the engine hooks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
+
+
+def _request_info() -> Dict[str, Optional[str]]:
+    scope = _scope.get()
+    if scope is None:
+        return {"tenant": None, "route": None}
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path")
+    tenant = dict(scope.get("headers") or []).get(b"x-tenant")
+    return {
+        "tenant": tenant.decode("latin-1").strip() if tenant else None,
+        "route": f"{scope.get('method', '')} {path}".strip(),
+    }
+
+
+# --- engine hooks -------------------------------------------------------------
+
+def _short(value: Any) -> Any:
+    if value is None:
+        return value
+    if not SLOW_QUERY_LOG_PARAMS:
+        return f"<{type(value).__name__}>"
+    if isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= PARAM_CHARS else text[:PARAM_CHARS] + "..."
+
+
+def _params(parameters: Any, executemany: bool) -> Any:
+    if executemany:
+        return [_params(p, False) for p in list(parameters)[:MAX_PARAM_SETS]]
+    if isinstance(parameters, dict):
+        return {k: _short(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_short(v) for v in parameters]
+    return _short(parameters)
+
+
+def _explain(dbapi_conn, dialect: str, statement: str, parameters: Any) -> List[str]:
+    if dialect == "sqlite":
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [str(r[-1]) for r in cursor.fetchall()]
+        finally:
+            cursor.close()
+    # a failed EXPLAIN must not abort the caller's Postgres transaction
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute("SAVEPOINT slowlog_explain")
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT slowlog_explain")
+            raise
+        cursor.execute("RELEASE SAVEPOINT slowlog_explain")
+        lines = [str(r[0]) for r in rows]
+        # Postgres plans show the bound values as literals
+        return lines if SLOW_QUERY_LOG_PARAMS else [_STRINGS.sub("'?'", line) for line in lines]
+    finally:
+        cursor.close()
+
+
+def _is_read(statement: str) -> bool:
+    return statement.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+def _record(conn, statement: str, parameters: Any, executemany: bool, elapsed_ms: float,
+            error: Optional[BaseException] = None) -> None:
+    entry: Dict[str, Any] = {
+        "ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        "duration_ms": round(elapsed_ms, 2),
+        **_request_info(),
+        "sql": statement,
+        "params": _params(parameters, executemany),
+    }
+    if error is not None:
+        entry["error"] = f"{type(error).__name__}: {error}"
+    elif SLOW_QUERY_EXPLAIN and not executemany and _is_read(statement):
+        try:
+            entry["plan"] = _explain(conn.connection.dbapi_connection, conn.dialect.name, statement, parameters)
+        except Exception as exc:  # the plan is a nice-to-have; never fail the request over it
+            entry["plan_error"] = f"{type(exc).__name__}: {exc}"
+    _ensure_handler()
+    _logger.info(json.dumps(entry, default=str))
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context._slowlog_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_slowlog_started", None)
+    if started is None or not enabled():
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    if elapsed_ms >= SLOW_QUERY_MS:
+        _record(conn, statement, parameters, executemany, elapsed_ms)
+
+
+@event.listens_for(Engine, "handle_error")
+def _failed(exc_context) -> None:
+    started = getattr(exc_context.execution_context, "_slowlog_started", None)
+    if started is None or not enabled() or exc_context.statement is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    if elapsed_ms >= SLOW_QUERY_MS:
+        _record(exc_context.connection, exc_context.statement, exc_context.parameters,
+                bool(exc_context.execution_context.executemany), elapsed_ms, exc_context.original_exception)
+
+
+# --- summarizing ---------------------------------------------------------------
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bin \((?:\?|, )+\)")
+_REPEATED_ARMS = re.compile(r"(select [^()]*?)(?: union all \1)+")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    s = _COMMENTS.sub(" ", sql)
+    s = _STRINGS.sub("?", s)
+    s = _PLACEHOLDERS.sub("?", s)
+    s = _NUMBERS.sub("?", s)
+    s = _SPACES.sub(" ", s).strip().lower()
+    s = _IN_LISTS.sub("in (...)", s)
+    return _REPEATED_ARMS.sub(r"\1 union all ...", s)
+
+
+def log_files(path: Optional[str] = None) -> List[Path]:
+    """The log and its rotated backups, oldest first."""
+    base = Path(path or SLOW_QUERY_LOG)
+    backups = sorted(base.parent.glob(base.name + ".*"),
+                     key=lambda p: int(p.suffix[1:]) if p.suffix[1:].isdigit() else 0, reverse=True)
+    return [p for p in (*backups, base) if p.is_file()]
+
+
+def read_log(paths: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:  # a line cut short by a crash or rotation
+                    continue
+
+
+def _p95(sorted_values: Sequence[float]) -> float:
+    # nearest rank, like the SLA percentiles
+    rank = max(1, -(-95 * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class QueryStats:
+    fingerprint: str
+    durations: List[float] = field(default_factory=list)
+    routes: Dict[str, int] = field(default_factory=dict)
+    tenants: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+    slowest: Optional[Dict[str, Any]] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.durations)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.durations)
+
+    @property
+    def p95_ms(self) -> float:
+        return _p95(sorted(self.durations)) if self.durations else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "p95_ms": round(self.p95_ms, 2),
+            "max_ms": round(max(self.durations, default=0.0), 2),
+            "errors": self.errors,
+            "routes": dict(sorted(self.routes.items(), key=lambda kv: -kv[1])),
+            "tenants": dict(sorted(self.tenants.items(), key=lambda kv: -kv[1])),
+            "slowest": self.slowest,
+        }
+
+
+SORT_KEYS = {"total": "total_ms", "count": "count", "p95": "p95_ms"}
+
+
+def summarize(records: Iterable[Dict[str, Any]], sort: str = "total", since: Optional[datetime] = None,
+              tenant: Optional[str] = None, route: Optional[str] = None) -> List[QueryStats]:
+    stats: Dict[str, QueryStats] = {}
+    cutoff = since.isoformat() if since else None
+    for r in records:
+        if cutoff and str(r.get("ts", "")) < cutoff:
+            continue
+        if tenant and r.get("tenant") != tenant:
+            continue
+        if route and route not in str(r.get("route") or ""):
+            continue
+        fp = fingerprint(r.get("sql") or "")
+        s = stats.get(fp)
+        if s is None:
+            s = stats[fp] = QueryStats(fp)
+        ms = float(r.get("duration_ms") or 0.0)
+        s.durations.append(ms)
+        key = r.get("route") or "-"
+        s.routes[key] = s.routes.get(key, 0) + 1
+        key = r.get("tenant") or "-"
+        s.tenants[key] = s.tenants.get(key, 0) + 1
+        s.errors += 1 if r.get("error") else 0
+        if s.slowest is None or ms > float(s.slowest.get("duration_ms") or 0.0):
+            s.slowest = r
+    attr = SORT_KEYS[sort]
+    return sorted(stats.values(), key=lambda s: getattr(s, attr), reverse=True)
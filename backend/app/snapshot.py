@@ -0,0 +1,217 @@
+# app/snapshot.py
+"""
+Tenant snapshot / restore.
+
+dump() streams one tenant's rows out of every SNAPSHOT_TABLES table in id
+order (server-side batches of BATCH_ROWS) into one zstd-compressed Parquet
+file per table, plus manifest.json with row counts and column lists. The
+manifest is written last and doubles as the "snapshot is complete" marker.
+
+restore() reads the files back batch by batch and bulk-loads them with Core
+executemany inserts inside one transaction, optionally under another tenant
+id. Ids are kept when they cannot collide; otherwise each table is shifted
+past the target's current max id (handover_top_sales.handover_id follows
+its handover). Restoring into a tenant that already has rows needs
+replace=True, which deletes them first in the same transaction.
+
+Inserts go through the tables, so the search and change-log triggers see
+every restored row. They bypass the ORM session events, so after the commit
+restore() drops what this process caches about the tenant (analytics
+results, including top sales; approximate month sketches; forecast fits)
+instead of waiting for those consumers to poll the change log. pyarrow is
+optional (requirements-optional.txt) and only imported here.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Integer, SmallInteger, delete, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+from . import approx, forecast
+from .cache import get_cache
+from .models import GuestNote, Handover, HandoverTopSale, Incident, RevenueEntry, SaleItem
+
+FORMAT_VERSION = 1
+BATCH_ROWS = 50_000
+COMPRESSION = "zstd"
+MANIFEST = "manifest.json"
+
+# parents before children: restore inserts in this order and deletes in reverse
+SNAPSHOT_TABLES = [m.__table__ for m in (Handover, HandoverTopSale, Incident, SaleItem, RevenueEntry, GuestNote)]
+# child table -> {column: parent table} for ids that move with their parent
+_REFERENCES = {"handover_top_sales": {"handover_id": "handovers"}}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as exc:  # pragma: no cover - depends on the environment
+        raise SnapshotError("snapshots need the optional pyarrow package (pip install pyarrow)") from exc
+    return pyarrow
+
+
+def _schema(pa, table):
+    fields = []
+    for col in table.columns:
+        t = col.type
+        if isinstance(t, (Integer, BigInteger, SmallInteger)):
+            arrow_type = pa.int64()
+        elif isinstance(t, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(t, Date):
+            arrow_type = pa.date32()
+        elif isinstance(t, Boolean):
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(col.name, arrow_type, nullable=col.nullable))
+    return pa.schema(fields)
+
+
+# --- dump -------------------------------------------------------------------
+
+def dump(engine: Engine, tenant: str, out_dir: Path, batch_rows: int = BATCH_ROWS) -> Dict[str, Any]:
+    """Write `tenant`'s rows to out_dir; returns the manifest."""
+    pa = _arrow()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / MANIFEST).unlink(missing_ok=True)
+    tables: Dict[str, Any] = {}
+    with engine.connect() as conn:
+        for table in SNAPSHOT_TABLES:
+            schema = _schema(pa, table)
+            names = schema.names
+            path = out_dir / f"{table.name}.parquet"
+            count = 0
+            result = conn.execution_options(yield_per=batch_rows).execute(
+                select(*table.columns).where(table.c.tenant_id == tenant).order_by(table.c.id)
+            )
+            with pa.parquet.ParquetWriter(path, schema, compression=COMPRESSION) as writer:
+                for rows in result.partitions():
+                    columns = list(zip(*rows))
+                    writer.write_batch(pa.record_batch(
+                        [pa.array(values, type=schema.field(i).type) for i, values in enumerate(columns)],
+                        schema=schema,
+                    ))
+                    count += len(rows)
+            tables[table.name] = {"file": path.name, "rows": count, "columns": names}
+    manifest = {
+        "version": FORMAT_VERSION,
+        "tenant": tenant,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "tables": tables,
+    }
+    (out_dir / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+# --- restore ----------------------------------------------------------------
+
+def read_manifest(src_dir: Path) -> Dict[str, Any]:
+    path = Path(src_dir) / MANIFEST
+    if not path.exists():
+        raise SnapshotError(f"{src_dir} is not a complete snapshot (no {MANIFEST})")
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("version") != FORMAT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version: {manifest.get('version')}")
+    return manifest
+
+
+def _id_range(pa, path: Path) -> tuple:
+    bounds = pa.compute.min_max(pa.parquet.read_table(path, columns=["id"]).column("id"))
+    return bounds["min"].as_py(), bounds["max"].as_py()
+
+
+def _offsets(conn: Connection, pa, src_dir: Path, manifest: Dict[str, Any]) -> Dict[str, int]:
+    """Per-table id shift: 0 when the snapshot ids are free in the target."""
+    offsets: Dict[str, int] = {}
+    for table in SNAPSHOT_TABLES:
+        meta = manifest["tables"].get(table.name)
+        offsets[table.name] = 0
+        if not meta or not meta["rows"]:
+            continue
+        lo, hi = _id_range(pa, Path(src_dir) / meta["file"])
+        taken = conn.execute(
+            select(func.count()).select_from(table).where(table.c.id >= lo, table.c.id <= hi)
+        ).scalar()
+        if taken:
+            top = conn.execute(select(func.max(table.c.id))).scalar() or 0
+            offsets[table.name] = top - lo + 1
+    return offsets
+
+
+def _reset_sequences(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    for table in SNAPSHOT_TABLES:
+        conn.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT coalesce(max(id), 0) + 1 FROM {table.name}), false)"
+        )
+
+
+def _invalidate_caches(tenant: str) -> None:
+    from .api import analytics
+
+    cache = get_cache()
+    for t in (tenant, None):
+        cache.invalidate(analytics._namespace(t))
+    approx.store.drop(tenant)
+    forecast.clear_cache(tenant)
+
+
+def restore(
+    engine: Engine,
+    src_dir: Path,
+    tenant: Optional[str] = None,
+    replace: bool = False,
+    batch_rows: int = BATCH_ROWS,
+) -> Dict[str, int]:
+    """Load a snapshot as `tenant` (default: the tenant it was taken from); returns rows per table."""
+    pa = _arrow()
+    src_dir = Path(src_dir)
+    manifest = read_manifest(src_dir)
+    tenant = tenant or manifest["tenant"]
+    loaded: Dict[str, int] = {}
+    with engine.begin() as conn:
+        existing = [t.name for t in SNAPSHOT_TABLES
+                    if conn.execute(select(t.c.id).where(t.c.tenant_id == tenant).limit(1)).first()]
+        if existing and not replace:
+            raise SnapshotError(f"tenant {tenant!r} already has rows in {', '.join(existing)}; pass replace")
+        for table in reversed(SNAPSHOT_TABLES):
+            conn.execute(delete(table).where(table.c.tenant_id == tenant))
+
+        offsets = _offsets(conn, pa, src_dir, manifest)
+        for table in SNAPSHOT_TABLES:
+            meta = manifest["tables"].get(table.name)
+            loaded[table.name] = 0
+            if not meta:
+                continue
+            columns: List[str] = [c for c in meta["columns"] if c in table.c]
+            shifts = {"id": offsets[table.name]}
+            for col, parent in _REFERENCES.get(table.name, {}).items():
+                shifts[col] = offsets[parent]
+            shifts = {c: n for c, n in shifts.items() if n}
+            stmt = insert(table)
+            for batch in pa.parquet.ParquetFile(src_dir / meta["file"]).iter_batches(batch_rows, columns=columns):
+                rows = batch.to_pylist()
+                for row in rows:
+                    row["tenant_id"] = tenant
+                    for col, n in shifts.items():
+                        row[col] += n
+                if rows:
+                    conn.execute(stmt, rows)
+                    loaded[table.name] += len(rows)
+        _reset_sequences(conn)
+    _invalidate_caches(tenant)
+    return loaded
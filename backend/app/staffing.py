@@ -0,0 +1,158 @@
+# app/staffing.py
+"""
+Covers heatmap by outlet x shift x weekday, with a rolling average and a
+period-over-period delta for every outlet/shift/day.
+
+One SQL pass over ix_handovers_tenant_date (tenant, date, outlet, shift,
+covers -- index-only) sums covers per outlet/shift/day, and window
+functions partitioned by outlet, shift and weekday add:
+  - rolling_avg: mean of the last ROLLING_WEEKS same-weekday values
+  - delta: change against the same weekday one week earlier
+
+Results are cached per closed ISO week (Monday..Sunday before today) in
+the shared cache, one namespace per week. Closed weeks only change when a
+past handover is edited, so instead of dropping everything on every write,
+the handovers change log (app/outbox.py) is followed on each call and only
+the affected weeks (and the ROLLING_WEEKS after them, whose windows reach
+back into the edit) are invalidated. The change-log position is kept in
+the cache next to the weeks (outbox.follow()), so edits made while a
+worker was down are still applied to a persistent cache.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session
+
+from . import outbox
+from .cache import get_cache
+from .models import Handover
+
+ROLLING_WEEKS = 4
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MISSING = object()
+
+
+def _monday(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def _namespace(prefix: str, tenant: Optional[str], week: date) -> str:
+    return f"{prefix}/{tenant or '-'}/{week.isoformat()}"
+
+
+def _apply_handover_changes(changes: List[outbox.Change], prefix: str) -> None:
+    cache = get_cache()
+    for c in changes:
+        for image in (c.old, c.new):
+            if not image:
+                continue
+            week = _monday(date.fromisoformat(str(image["date"])[:10]))
+            for i in range(ROLLING_WEEKS + 1):
+                later = week + timedelta(weeks=i)
+                cache.invalidate(_namespace(prefix, image["tenant_id"], later))
+                cache.invalidate(_namespace(prefix, None, later))
+
+
+def _invalidate_changed_weeks(db: Session) -> str:
+    """Drop cached weeks touched by handover changes not yet applied; returns the namespace prefix."""
+    return outbox.follow(db, "staffing", ("handovers",), _apply_handover_changes)
+
+
+def _query(db: Session, tenant: Optional[str], start: date, end: date) -> List[Dict[str, Any]]:
+    lookback = start - timedelta(weeks=ROLLING_WEEKS)
+    q = select(
+        Handover.outlet, Handover.shift, Handover.date, func.sum(Handover.covers).label("covers")
+    ).where(Handover.date >= lookback, Handover.date <= end)
+    if tenant:
+        q = q.where(Handover.tenant_id == tenant)
+    daily = q.group_by(Handover.outlet, Handover.shift, Handover.date).cte("daily")
+
+    window = {
+        "partition_by": [daily.c.outlet, daily.c.shift, extract("dow", daily.c.date)],
+        "order_by": daily.c.date,
+    }
+    stmt = select(
+        daily.c.outlet,
+        daily.c.shift,
+        daily.c.date,
+        daily.c.covers,
+        func.avg(daily.c.covers).over(**window, rows=(-(ROLLING_WEEKS - 1), 0)).label("rolling_avg"),
+        func.lag(daily.c.covers).over(**window).label("prev_covers"),
+        func.lag(daily.c.date).over(**window).label("prev_date"),
+    )
+    rows = []
+    for outlet, shift, d, covers, rolling, prev, prev_d in db.execute(stmt):
+        d = d if isinstance(d, date) else date.fromisoformat(str(d))
+        if d < start:
+            continue
+        if prev_d is not None and not isinstance(prev_d, date):
+            prev_d = date.fromisoformat(str(prev_d))
+        week_ago = prev_d is not None and (d - prev_d).days == 7
+        rows.append({
+            "outlet": outlet,
+            "shift": shift,
+            "date": d.isoformat(),
+            "covers": int(covers or 0),
+            "rolling_avg": round(float(rolling or 0.0), 2),
+            "delta": int(covers - prev) if week_ago else None,
+            "delta_pct": round((covers - prev) * 100.0 / prev, 1) if week_ago and prev else None,
+        })
+    return rows
+
+
+def _weeks_rows(db: Session, prefix: str, tenant: Optional[str], weeks: List[date]) -> Dict[date, List[Dict[str, Any]]]:
+    cache = get_cache()
+    out: Dict[date, List[Dict[str, Any]]] = {}
+    missing: List[date] = []
+    for w in weeks:
+        rows = cache.get(_namespace(prefix, tenant, w), "rows", _MISSING)
+        if rows is _MISSING:
+            missing.append(w)
+        else:
+            out[w] = rows
+    if missing:
+        fetched: Dict[date, List[Dict[str, Any]]] = {w: [] for w in missing}
+        for row in _query(db, tenant, min(missing), max(missing) + timedelta(days=6)):
+            w = _monday(date.fromisoformat(row["date"]))
+            if w in fetched:
+                fetched[w].append(row)
+        for w, rows in fetched.items():
+            cache.set(_namespace(prefix, tenant, w), "rows", rows)  # closed week: no TTL
+            out[w] = rows
+    return out
+
+
+def staffing(db: Session, tenant: Optional[str], weeks: int = 12, today: Optional[date] = None) -> Dict[str, Any]:
+    last_week = _monday(today or date.today()) - timedelta(weeks=1)
+    week_starts = [last_week - timedelta(weeks=i) for i in range(weeks - 1, -1, -1)]
+
+    prefix = _invalidate_changed_weeks(db)
+    by_week = _weeks_rows(db, prefix, tenant, week_starts)
+
+    series = [row for w in week_starts for row in by_week[w]]
+    cells: Dict[tuple, List[int]] = defaultdict(list)
+    for row in series:
+        wd = date.fromisoformat(row["date"]).weekday()
+        cells[(row["outlet"], row["shift"], wd)].append(row["covers"])
+    heatmap = [
+        {
+            "outlet": outlet,
+            "shift": shift,
+            "weekday": WEEKDAYS[wd],
+            "avg_covers": round(sum(v) / len(v), 2),
+            "days": len(v),
+        }
+        for (outlet, shift, wd), v in sorted(cells.items())
+    ]
+    return {
+        "from": week_starts[0].isoformat(),
+        "to": (last_week + timedelta(days=6)).isoformat(),
+        "weeks": weeks,
+        "heatmap": heatmap,
+        "series": series,
+    }
+
@@ -1,4 +1,5 @@
 # app/tenant.py
+import hmac
 import os
 from fastapi import Header, HTTPException, Depends
 
@@ -16,6 +17,29 @@ async def require_tenant(x_tenant: str = Header(..., alias="X-Tenant")) -> str:
         raise HTTPException(status_code=400, detail=f"tenant not allowed: {t}")
     return t
 
+async def optional_tenant(x_tenant: str | None = Header(None, alias="X-Tenant")) -> str | None:
+    """
+    Same validation as require_tenant, but a missing header yields None
+    (used by endpoints that predate tenant scoping, e.g. analytics).
+    """
+    if x_tenant is None:
+        return None
+    return await require_tenant(x_tenant)
+
+ADMIN = "*admin"  # pseudo-tenant key for admin endpoints (rate limiting, logs)
+
+async def require_admin(x_admin_token: str | None = Header(None, alias="X-Admin-Token")) -> str:
+    """
+    Cross-tenant endpoints: the X-Admin-Token header must match ADMIN_TOKEN.
+    With no ADMIN_TOKEN configured the admin API is disabled.
+    """
+    expected = os.getenv("ADMIN_TOKEN") or ""
+    if not expected:
+        raise HTTPException(status_code=403, detail="admin API disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+    return ADMIN
+
 # ---- Backwards compatibility ----
 # older modules import `get_tenant`; keep it as an alias to `require_tenant`
 get_tenant = require_tenant
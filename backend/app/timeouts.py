@@ -0,0 +1,251 @@
+# app/timeouts.py
+"""
+Statement timeouts and cancellation of abandoned requests.
+
+Every HTTP request gets a QueryBudget in a context variable
+(CancelOnDisconnectMiddleware); sync endpoints see it too because the
+thread pool runs them in a copy of the request context. Endpoints pick a
+per-statement limit with Depends(statement_timeout("analytics")), like
+rate_limited() budgets; anything else gets TIMEOUTS["default"].
+
+Enforcement happens at the connection:
+  - Postgres: SET statement_timeout before a statement whenever the
+    connection's current value differs from the request's
+  - SQLite: a progress handler (every PROGRESS_OPS VM steps) interrupts a
+    statement once it has run past the limit
+
+When the client disconnects, the middleware cancels the budget: the
+statement in flight is interrupted (sqlite3 interrupt() / the driver's
+cancel()) and the SQLite progress handler stops anything that follows.
+Interrupted statements raise QueryTimeout (504) or QueryCancelled (499)
+instead of the driver's error. Work outside a request (scheduler, scripts)
+has no budget and no limit.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+PROGRESS_OPS = 1000
+
+TIMEOUTS = {
+    "default": float(os.getenv("STATEMENT_TIMEOUT_SECONDS") or 30),
+    "analytics": float(os.getenv("ANALYTICS_STATEMENT_TIMEOUT_SECONDS") or 15),
+}
+
+
+class QueryInterrupted(Exception):
+    pass
+
+
+class QueryTimeout(QueryInterrupted):
+    pass
+
+
+class QueryCancelled(QueryInterrupted):
+    pass
+
+
+class QueryBudget:
+    """Per-request statement limit plus a cancel switch for the statement in flight."""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.cancelled = False
+        self.started: Optional[float] = None  # monotonic start of the current statement
+        self.active = None                    # DBAPI connection running it
+        self.children: List["QueryBudget"] = []
+        self._lock = threading.Lock()
+
+    def child(self) -> "QueryBudget":
+        """Budget for a worker thread doing part of this request's work (cancelled with it)."""
+        c = QueryBudget(self.timeout)
+        with self._lock:
+            c.cancelled = self.cancelled
+            self.children.append(c)
+        return c
+
+    def expired(self) -> bool:
+        return self.timeout is not None and self.started is not None and time.monotonic() - self.started > self.timeout
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            conn, children = self.active, list(self.children)
+        if conn is not None:
+            _interrupt(conn)
+        for c in children:
+            c.cancel()
+
+
+_current: contextvars.ContextVar[Optional[QueryBudget]] = contextvars.ContextVar("query_budget", default=None)
+
+
+def current() -> Optional[QueryBudget]:
+    return _current.get()
+
+
+@contextmanager
+def scope(budget: Optional[QueryBudget]) -> Iterator[Optional[QueryBudget]]:
+    token = _current.set(budget)
+    try:
+        yield budget
+    finally:
+        _current.reset(token)
+
+
+def statement_timeout(name: str = "default"):
+    """Dependency: limit each statement of this request to TIMEOUTS[name] seconds."""
+    async def dependency() -> None:
+        budget = _current.get()
+        if budget is not None:
+            budget.timeout = TIMEOUTS[name]
+    return dependency
+
+
+# --- connection hooks ---------------------------------------------------------
+
+def _interrupt(dbapi_conn) -> None:
+    stop = getattr(dbapi_conn, "interrupt", None) or getattr(dbapi_conn, "cancel", None)
+    if stop is not None:
+        try:
+            stop()
+        except Exception:  # connection already gone; nothing left to stop
+            pass
+
+
+def _sqlite_progress() -> int:
+    budget = _current.get()
+    if budget is None:
+        return 0
+    return 1 if budget.cancelled or budget.expired() else 0
+
+
+@event.listens_for(Pool, "connect")
+def _on_connect(dbapi_conn, record) -> None:
+    if hasattr(dbapi_conn, "set_progress_handler"):  # sqlite3
+        dbapi_conn.set_progress_handler(_sqlite_progress, PROGRESS_OPS)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    budget = _current.get()
+    if conn.dialect.name == "postgresql":
+        ms = int(budget.timeout * 1000) if budget is not None and budget.timeout else 0
+        if conn.info.get("statement_timeout_ms", 0) != ms:
+            cursor.execute(f"SET statement_timeout = {ms}")
+            conn.info["statement_timeout_ms"] = ms
+    if budget is None:
+        return
+    if budget.cancelled:
+        raise QueryCancelled("client disconnected")
+    budget.started = time.monotonic()
+    budget.active = conn.connection.dbapi_connection
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    budget = _current.get()
+    if budget is not None:
+        budget.active = None
+
+
+@event.listens_for(Engine, "handle_error")
+def _translate(context) -> Optional[Exception]:
+    budget = _current.get()
+    if budget is None:
+        return None
+    budget.active = None
+    if budget.cancelled:
+        return QueryCancelled("client disconnected")
+    err = context.original_exception
+    timed_out = "interrupted" in str(err) or getattr(err, "pgcode", None) == "57014" or budget.expired()
+    if timed_out and budget.timeout is not None:
+        return QueryTimeout(f"statement exceeded {budget.timeout:g}s")
+    return None
+
+
+# --- request lifecycle --------------------------------------------------------
+
+class CancelOnDisconnectMiddleware:
+    """
+    Gives each request a QueryBudget and cancels it when the client goes
+    away. Once the request body has been read, the only message left is
+    http.disconnect, so a watcher task waits for it while the app runs;
+    later receive() calls from the app get the same disconnect.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope_, receive, send) -> None:
+        if scope_["type"] != "http":
+            await self.app(scope_, receive, send)
+            return
+        budget = QueryBudget(TIMEOUTS["default"])
+        disconnected = asyncio.Event()
+        watcher: Optional[asyncio.Task] = None
+
+        async def watch() -> None:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    budget.cancel()
+                    return
+
+        def start_watching() -> None:
+            nonlocal watcher
+            if watcher is None:
+                watcher = asyncio.get_running_loop().create_task(watch())
+
+        headers = dict(scope_.get("headers") or [])
+        pending_body = {"type": "http.request", "body": b"", "more_body": False}
+        has_body = headers.get(b"content-length", b"0") not in (b"", b"0") or b"transfer-encoding" in headers
+        if not has_body:
+            start_watching()
+
+        async def wrapped_receive():
+            nonlocal pending_body
+            if watcher is not None:
+                if pending_body is not None:
+                    message, pending_body = pending_body, None
+                    return message
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                budget.cancel()
+            elif not message.get("more_body", False):
+                pending_body = None
+                start_watching()
+            return message
+
+        token = _current.set(budget)
+        try:
+            await self.app(scope_, wrapped_receive, send)
+        finally:
+            _current.reset(token)
+            if watcher is not None:
+                watcher.cancel()
+
+
+async def query_timeout_handler(request: Request, exc: QueryTimeout) -> JSONResponse:
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+async def query_cancelled_handler(request: Request, exc: QueryCancelled) -> JSONResponse:
+    # nobody is listening; 499 keeps these out of 5xx error rates
+    return JSONResponse(status_code=499, content={"detail": str(exc)})
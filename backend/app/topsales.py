@@ -0,0 +1,68 @@
+# app/topsales.py
+"""
+Queries and backfill for the normalized handover_top_sales table.
+
+"Top sold from handovers" is an indexed GROUP BY over
+ix_handover_top_sales_tenant_item_date instead of decoding every
+Handover.top_sales value in Python.
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .models import HandoverTopSale, parse_top_sales
+
+
+def top_sold(
+    db: Session,
+    tenant: Optional[str] = None,
+    limit: int = 10,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    n = func.count().label("n")
+    q = select(HandoverTopSale.item, n)
+    if tenant:
+        q = q.where(HandoverTopSale.tenant_id == tenant)
+    if date_from:
+        q = q.where(HandoverTopSale.date >= date_from)
+    if date_to:
+        q = q.where(HandoverTopSale.date <= date_to)
+    q = q.group_by(HandoverTopSale.item).order_by(n.desc(), HandoverTopSale.item).limit(limit)
+    return [{"item": item, "count": int(count)} for item, count in db.execute(q)]
+
+
+def backfill_from_legacy(conn: Connection, batch_size: int = 1000) -> int:
+    """
+    Copy items out of a legacy handovers.top_sales column (JSON list,
+    stringified JSON or comma-joined text) into handover_top_sales.
+    Handovers that already have rows are skipped, so re-running is safe.
+    Returns the number of rows inserted.
+    """
+    if "top_sales" not in {c["name"] for c in sa.inspect(conn).get_columns("handovers")}:
+        return 0
+    handovers = sa.table("handovers", sa.column("id"), sa.column("tenant_id"), sa.column("date", sa.Date), sa.column("top_sales"))
+    done = select(HandoverTopSale.handover_id).distinct()
+    rows = conn.execute(
+        select(handovers.c.id, handovers.c.tenant_id, handovers.c.date, handovers.c.top_sales)
+        .where(handovers.c.top_sales.isnot(None), handovers.c.id.not_in(done))
+    )
+    inserted = 0
+    pending: List[Dict[str, Any]] = []
+    for hid, tenant, day, raw in rows:
+        for item in parse_top_sales(raw):
+            pending.append({"handover_id": hid, "tenant_id": tenant, "date": day, "item": item})
+        if len(pending) >= batch_size:
+            conn.execute(sa.insert(HandoverTopSale), pending)
+            inserted += len(pending)
+            pending = []
+    if pending:
+        conn.execute(sa.insert(HandoverTopSale), pending)
+        inserted += len(pending)
+    return inserted
@@ -0,0 +1,147 @@
+# app/warmup.py
+"""
+Startup warm-up and readiness.
+
+The lifespan handler in app/main.py starts run() in the background as soon
+as the app boots; /readyz answers 503 until it finishes, so a load balancer
+keeps traffic on the old instances meanwhile (/healthz stays a liveness
+probe). Steps:
+
+  1. pages: SQLite reads the database file once to load it into the OS
+     page cache (up to WARMUP_PAGE_BYTES); Postgres runs pg_prewarm on the
+     hot tables when that extension is installed
+  2. per tenant in ALLOWED_TENANTS, at most WARMUP_CONCURRENCY at a time:
+     the dashboard's last-WARMUP_DAYS KPI summary, revenue trend and top
+     items are computed through the route functions, so they land in the
+     shared cache under the exact keys the dashboard asks for; the list
+     endpoints run once with limit=1, which compiles their statements
+     into the engine's statement cache
+
+A failing step is logged and recorded; the instance still becomes ready.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+
+from .db import SessionLocal, engine
+from .tenant import ALLOWED
+
+log = logging.getLogger(__name__)
+
+WARMUP_ENABLED = (os.getenv("WARMUP") or "on").strip().lower() not in ("0", "off", "false")
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY") or 2)
+WARMUP_DAYS = int(os.getenv("WARMUP_DAYS") or 30)
+WARMUP_PAGE_BYTES = int(os.getenv("WARMUP_PAGE_BYTES") or 256 * 1024 * 1024)
+DASHBOARD_TARGET = 10_000.0
+DASHBOARD_TOP_ITEMS = 5
+
+_PREWARM_TABLES = ("revenue_entries", "sale_items", "handovers", "incidents")
+
+
+class Readiness:
+    def __init__(self):
+        self.state = "starting"      # starting -> warming -> ready
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: List[Dict[str, Any]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def record(self, step: str, started: float, error: Optional[BaseException] = None) -> None:
+        entry = {"step": step, "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1)}
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        self.steps.append(entry)
+
+    def as_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"ready": self.ready, "state": self.state, "steps": self.steps}
+        if self.started_at is not None:
+            out["elapsed_ms"] = round(((self.finished_at or time.perf_counter()) - self.started_at) * 1000.0, 1)
+        return out
+
+
+readiness = Readiness()
+
+
+def warm_pages() -> None:
+    url = engine.url
+    if url.get_backend_name() == "sqlite":
+        path = url.database
+        if not path or path == ":memory:" or not os.path.exists(path):
+            return
+        remaining = WARMUP_PAGE_BYTES
+        with open(path, "rb") as f:
+            while remaining > 0 and f.read(min(remaining, 1024 * 1024)):
+                remaining -= 1024 * 1024
+    elif url.get_backend_name() == "postgresql":
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm'")).first():
+                for table in _PREWARM_TABLES:
+                    conn.execute(text("SELECT pg_prewarm(:t)"), {"t": table})
+
+
+def warm_tenant(tenant: str, today: Optional[date] = None) -> None:
+    # route functions, so cache keys match real requests
+    from .api import analytics, handover, incidents
+
+    date_to = today or date.today()
+    date_from = date_to - timedelta(days=WARMUP_DAYS - 1)
+    db = SessionLocal()
+
+    async def dashboard() -> None:
+        # the dashboard routes are async (single-flight, app/singleflight.py)
+        await analytics.kpi_summary(date_from=date_from, date_to=date_to, target=DASHBOARD_TARGET,
+                                    db=db, tenant=tenant, encoding=None)
+        await analytics.revenue_trend(date_from=date_from, date_to=date_to, approx=False, bucket="day",
+                                      db=db, tenant=tenant, encoding=None)
+        await analytics.top_items(limit=DASHBOARD_TOP_ITEMS, date_from=date_from, date_to=date_to, approx=False,
+                                  db=db, tenant=tenant, encoding=None)
+
+    try:
+        asyncio.run(dashboard())
+        handover.list_handovers(db=db, tenant=tenant, limit=1, offset=0, fields=None)
+        incidents.list_incidents(db=db, tenant=tenant, limit=1, offset=0, status=["OPEN", "IN_PROGRESS"], fields=None)
+    finally:
+        db.close()
+
+
+def run(tenants: Sequence[str] = (), today: Optional[date] = None) -> Readiness:
+    """Blocking warm-up (call it off the event loop); marks `readiness` ready at the end."""
+    readiness.state, readiness.started_at, readiness.steps = "warming", time.perf_counter(), []
+    started = time.perf_counter()
+    try:
+        warm_pages()
+        readiness.record("pages", started)
+    except Exception as exc:
+        log.exception("warm-up: page cache step failed")
+        readiness.record("pages", started, exc)
+
+    def one(tenant: str) -> None:
+        t0 = time.perf_counter()
+        try:
+            warm_tenant(tenant, today)
+            readiness.record(f"tenant:{tenant}", t0)
+        except Exception as exc:
+            log.exception("warm-up failed for tenant %s", tenant)
+            readiness.record(f"tenant:{tenant}", t0, exc)
+
+    with ThreadPoolExecutor(max_workers=max(1, WARMUP_CONCURRENCY), thread_name_prefix="warmup") as pool:
+        list(pool.map(one, sorted(tenants or ALLOWED)))
+    readiness.state, readiness.finished_at = "ready", time.perf_counter()
+    log.info("warm-up finished in %.0f ms", (readiness.finished_at - readiness.started_at) * 1000.0)
+    return readiness
+
+
+def skip() -> None:
+    """Warm-up disabled: ready straight away."""
+    readiness.state, readiness.steps = "ready", []
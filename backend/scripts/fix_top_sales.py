@@ -1,21 +1,15 @@
 from __future__ import annotations
-import json
-from sqlalchemy import select
-from app.db import get_session
-from app.models import Handover
+
+from app.db import engine
+from app.topsales import backfill_from_legacy
+
 
 def fix() -> None:
-    with get_session() as db:
-        rows = db.execute(select(Handover)).scalars().all()
-        for row in rows:
-            if isinstance(row.top_sales, str):
-                try:
-                    parsed = json.loads(row.top_sales)
-                    row.top_sales = parsed if isinstance(parsed, list) else [str(parsed)]
-                except Exception:
-                    row.top_sales = [row.top_sales]
-        db.commit()
-        print(f"Fixed {len(rows)} handover rows (if any were stringified).")
+    # top_sales used to be a JSON/text column in three different shapes; the
+    # normalized handover_top_sales table replaces it. Copy anything left over.
+    with engine.begin() as conn:
+        inserted = backfill_from_legacy(conn)
+    print(f"Inserted {inserted} handover_top_sales rows from legacy top_sales values.")
 
 if __name__ == "__main__":
     fix()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from datetime import date
+
+# Point the app at a throwaway SQLite file before anything imports app.db;
+# an in-memory URL would give every pooled connection its own empty database.
+_TMP = tempfile.mkdtemp(prefix="steward-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ.setdefault("ALLOWED_TENANTS", "legacy,azure")
+os.environ["REPORTS_DIR"] = f"{_TMP}/reports"
+os.environ["REPORT_SCHEDULER"] = "off"
+os.environ["CHANGE_LOG_PRUNE"] = "off"
+os.environ["SLOW_QUERY_LOG"] = f"{_TMP}/slow_queries.log"
+os.environ["WARMUP"] = "off"  # tests call app.warmup.run() themselves
+# a short calendar keeps the per-test dim_date fill cheap
+os.environ["DIM_DATE_START"] = "2023-01-01"
+os.environ["DIM_DATE_END"] = f"{date.today().year + 1}-12-31"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import anomaly
+from app.cache import get_cache
+from app.db import Base, SessionLocal, engine
+from app.main import app
+from app.ratelimit import limiter
+from app.singleflight import flights
+
+
+@pytest.fixture()
+def db_schema():
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture()
+def db(db_schema):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture()
+def api(db_schema) -> TestClient:
+    limiter.reset()
+    flights.reset()
+    get_cache().clear()
+    anomaly.reset()
+    with TestClient(app, headers={"X-Tenant": "legacy"}) as test_client:
+        yield test_client
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from app import fanout
+from app.models import SaleItem
+
+
+@pytest.fixture()
+def admin(api, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    del api.headers["X-Tenant"]
+    api.headers["X-Admin-Token"] = "s3cret"
+    return api
+
+
+def test_admin_requires_token(api, monkeypatch) -> None:
+    assert api.get("/api/admin/analytics/kpi-summary").status_code == 403  # no ADMIN_TOKEN configured
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    res = api.get("/api/admin/analytics/kpi-summary", headers={"X-Admin-Token": "wrong"})
+    assert res.status_code == 403
+
+
+def test_merge_top_k_uses_summed_totals() -> None:
+    a = [("Steak", 0, 50.0), ("Fries", 0, 30.0), ("Soda", 0, 1.0)]
+    b = [("Wings", 0, 45.0), ("Fries", 0, 30.0), ("Steak", 0, 1.0)]
+    # Fries is second for both tenants but first chain-wide
+    assert fanout.merge_top_k([a, b], 2) == [("Fries", 0, 60.0), ("Steak", 0, 51.0)]
+
+
+def test_chain_wide_fan_out(admin, db) -> None:
+    for tenant, name, qty in [("legacy", "Burger", 3), ("legacy", "Fries", 5), ("azure", "Burger", 4), ("azure", "Cola", 1)]:
+        db.add(SaleItem(tenant_id=tenant, name=name, qty=qty, sold_on=date(2024, 1, 2)))
+    db.add(SaleItem(tenant_id="azure", name="Cola", qty=2, sold_on=date(2024, 1, 3)))
+    db.commit()
+
+    top = admin.get("/api/admin/analytics/top-items", params={"limit": 2}).json()
+    assert [(i["name"], i["units_sold"]) for i in top["items"]] == [("Burger", 7), ("Fries", 5)]
+    assert {t["tenant"] for t in top["tenants"]} == {"legacy", "azure"}
+    assert all(t["ok"] and t["elapsed_ms"] >= 0 for t in top["tenants"])
+
+    trend = admin.get("/api/admin/analytics/revenue-trend").json()
+    assert [d["date"] for d in trend["trend"]] == ["2024-01-02", "2024-01-03"]
+
+    kpi = admin.get("/api/admin/analytics/kpi-summary", params={"tenant": "azure"}).json()
+    assert list(kpi["by_tenant"]) == ["azure"]
+    assert admin.get("/api/admin/analytics/kpi-summary", params={"tenant": "nope"}).status_code == 400
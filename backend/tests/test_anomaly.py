@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import anomaly
+from app.models import RevenueEntry
+
+MONDAY_7PM = datetime(2024, 3, 4, 19, 0)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_detectors():
+    anomaly.reset()
+    yield
+    anomaly.reset()
+
+
+def _entry(db, at: datetime, amount: float, outlet: str = "Main", tenant: str = "legacy") -> RevenueEntry:
+    e = RevenueEntry(tenant_id=tenant, outlet=outlet, category="Food", amount_cents=int(amount * 100), occurred_at=at)
+    db.add(e)
+    return e
+
+
+def _history(db, hour: datetime, amounts) -> None:
+    for weeks_back, amount in enumerate(amounts, start=1):
+        _entry(db, hour - timedelta(weeks=weeks_back) + timedelta(minutes=5), amount)
+
+
+def test_welford_state_matches_batch_statistics() -> None:
+    det = anomaly.TenantDetector("legacy", open_hour=0)
+    samples = [120.0, 80.0, 100.0, 95.0, 130.0]
+    h = anomaly.hour_number(MONDAY_7PM) - len(samples) * anomaly.SLOTS
+    det.advance(h)
+    for x in samples:
+        det.add("Main", h, x)
+        det.advance(h + anomaly.SLOTS)
+        h += anomaly.SLOTS
+    i, s = det.outlets["Main"], anomaly.slot(h)
+    assert det.n[i, s] >= len(samples)
+    window = [0.0] * (int(det.n[i, s]) - len(samples)) + samples
+    assert np.isclose(det.mean[i, s], np.mean(window))
+    assert np.isclose(det.m2[i, s], np.var(window) * len(window))
+
+    det._replace(i, s, 130.0, 30.0)
+    window[-1] = 30.0
+    assert np.isclose(det.mean[i, s], np.mean(window))
+    assert np.isclose(det.m2[i, s], np.var(window) * len(window))
+
+
+def test_spike_is_flagged_while_the_hour_is_open(db) -> None:
+    _history(db, MONDAY_7PM, [100, 110, 90, 105, 95, 100, 102, 98])
+    db.commit()
+    assert anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(minutes=1))["anomalies"] == []
+
+    _entry(db, MONDAY_7PM + timedelta(minutes=10), 400)
+    _entry(db, MONDAY_7PM + timedelta(minutes=12), 900, tenant="azure")
+    db.commit()
+    found = anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(minutes=20))["anomalies"]
+    assert [(a["outlet"], a["kind"], a["direction"]) for a in found] == [("Main", "running", "high")]
+    assert found[0]["actual"] == 400.0 and found[0]["expected"] == 100.0
+
+    # closing the hour does not report the same spike twice
+    later = anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(hours=2))["anomalies"]
+    assert len(later) == 1
+
+
+def test_quiet_hour_is_flagged_when_it_closes(db) -> None:
+    _history(db, MONDAY_7PM, [100, 110, 90, 105, 95, 100, 102, 98])
+    db.commit()
+    anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(minutes=1))
+    found = anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(hours=1, minutes=1))["anomalies"]
+    assert [(a["kind"], a["direction"], a["actual"]) for a in found] == [("closed", "low", 0.0)]
+
+
+def test_live_feed_streams_new_anomalies(api, db, monkeypatch) -> None:
+    monkeypatch.setattr(anomaly, "ANOMALY_FEED_SECONDS", 0)
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    _history(db, now, [100, 110, 90, 105, 95, 100, 102, 98])
+    db.commit()
+    api.get("/api/analytics/anomalies")  # bootstrap from history
+
+    _entry(db, datetime.utcnow(), 5000)
+    db.commit()
+    with api.stream("GET", "/api/analytics/anomalies/stream") as r:
+        assert r.headers["content-type"].startswith("text/event-stream")
+        body = "".join(r.iter_text())
+    events = [json.loads(line[len("data: "):]) for line in body.splitlines() if line.startswith("data: ")]
+    assert events and events[0]["direction"] == "high" and events[0]["actual"] == 5000.0
+    assert f"id: {events[-1]['id']}" in body
+
+
+def test_feed_resumes_on_another_worker(db) -> None:
+    _history(db, MONDAY_7PM, [100, 110, 90, 105, 95, 100, 102, 98])
+    _history(db, MONDAY_7PM + timedelta(hours=1), [100, 110, 90, 105, 95, 100, 102, 98])
+    db.commit()
+    workers = []
+    for _ in range(2):  # two workers, each with its own state
+        anomaly.reset()
+        anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(minutes=1))
+        workers.append(dict(anomaly._detectors))
+    _entry(db, MONDAY_7PM + timedelta(minutes=10), 400)
+    db.commit()
+
+    anomaly._detectors.update(workers[0])
+    first = anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(minutes=20))["anomalies"]
+    anomaly._detectors.update(workers[1])
+    later = anomaly.anomalies(db, "legacy", now=MONDAY_7PM + timedelta(hours=2, minutes=1))["anomalies"]
+    assert [(a["hour"][11:16], a["kind"]) for a in later] == [("19:00", "running"), ("20:00", "closed")]
+    assert later[0]["id"] == first[0]["id"]
+    assert later[1]["id"] == anomaly.anomaly_id("legacy", "Main", anomaly.hour_number(MONDAY_7PM) + 1, "closed")
+
+    det = anomaly._detectors["legacy"]
+    assert det.since(first[0]["id"]) == later[1:]
+    # an id this worker does not have resumes from its hour
+    other = anomaly.anomaly_id("legacy", "Bar", anomaly.hour_number(MONDAY_7PM), "closed")
+    assert det.since(other) == later[1:]
+    assert det.since(None) == later
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import approx
+from app.models import RevenueEntry, SaleItem
+from app.sketches import HyperLogLog, Reservoir, TDigest
+
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    approx.store.clear()
+    yield
+    approx.store.clear()
+
+
+def test_hyperloglog_within_bound() -> None:
+    hll = HyperLogLog(12)
+    for i in range(20_000):
+        hll.add(f"item-{i}")
+    assert abs(hll.count() - 20_000) < 4 * hll.relative_error * 20_000
+
+
+def test_tdigest_percentiles_close() -> None:
+    rnd = random.Random(7)
+    values = [rnd.expovariate(1 / 50.0) for _ in range(50_000)]
+    td = TDigest(100)
+    for v in values:
+        td.add(v)
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        est, lo, hi = td.quantile(q)
+        exact = values[int(q * len(values))]
+        assert lo <= est <= hi
+        assert abs(est - exact) / exact < 0.03
+    assert len(td.means) <= 100
+
+
+def test_reservoir_is_bounded_and_exact_when_small() -> None:
+    r: Reservoir[int] = Reservoir(100, seed=1)
+    for i in range(10):
+        r.add(i)
+    assert r.estimate_sum(45, sum(i * i for i in range(10))) == (45.0, 0.0)
+    for i in range(10, 10_000):
+        r.add(i)
+    assert len(r.items) == 100 and r.seen == 10_000
+
+
+def test_approx_endpoints(api, db) -> None:
+    start = date(2023, 1, 1)
+    for day in range(120):
+        d = start + timedelta(days=day)
+        db.add(SaleItem(tenant_id="legacy", name=f"Dish {day % 7}", qty=3, sold_on=d))
+        db.add(RevenueEntry(tenant_id="legacy", outlet=f"Outlet {day % 3}", category="Food",
+                            amount_cents=1000 + day, occurred_at=datetime.combine(d, datetime.min.time())))
+    db.commit()
+
+    params = {"approx": "true", "date_from": "2023-01-01", "date_to": "2023-04-30"}
+    trend = api.get("/api/analytics/revenue-trend", params=params).json()
+    assert trend["approx"] is True
+    assert len(trend["points"]) == 120
+    assert round(trend["distinct_outlets"]["estimate"]) == 3
+    p50 = trend["check_size_cents"]["p50"]
+    assert p50["lower"] <= p50["value"] <= p50["upper"]
+
+    top = api.get("/api/analytics/top-items", params={**params, "limit": 3}).json()
+    assert len(top["items"]) == 3
+    assert round(top["distinct_items"]["estimate"]) == 7
+    # every month has fewer rows than the reservoir, so the sample is exact
+    assert sum(i["units_error"] for i in top["items"]) == 0
+
+
+def test_month_sketches_follow_committed_changes(api, db) -> None:
+    params = {"approx": "true", "date_from": "2023-01-01", "date_to": "2023-01-31"}
+
+    def units() -> dict:
+        return {i["name"]: i["units_sold"] for i in api.get("/api/analytics/top-items", params=params).json()["items"]}
+
+    db.add(SaleItem(tenant_id="legacy", name="Tea", qty=2, sold_on=date(2023, 1, 5)))
+    db.commit()
+    assert units() == {"Tea": 2}
+
+    db.add(SaleItem(tenant_id="legacy", name="Tea", qty=9, sold_on=date(2023, 1, 6)))
+    db.rollback()  # never committed, never observed
+    db.add(SaleItem(tenant_id="legacy", name="Coffee", qty=1, sold_on=date(2023, 1, 6)))
+    db.commit()
+    assert units() == {"Tea": 2, "Coffee": 1}
+
+    db.execute(SaleItem.__table__.update().where(SaleItem.name == "Tea").values(qty=5))  # Core: month rebuilt
+    db.execute(SaleItem.__table__.insert().values(tenant_id="legacy", name="Cake", qty=3, sold_on=date(2023, 1, 7)))
+    db.commit()
+    assert units() == {"Tea": 5, "Coffee": 1, "Cake": 3}
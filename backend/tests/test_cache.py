@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import date
+
+from app.api import analytics
+from app.cache import MemoryCache, SQLiteCache
+from app.models import SaleItem
+
+
+def test_memory_cache_lru_ttl_and_invalidate() -> None:
+    cache = MemoryCache(max_entries=2)
+    cache.set("ns", "a", 1)
+    cache.set("ns", "b", 2)
+    cache.get("ns", "a")
+    cache.set("ns", "c", 3)  # evicts b, the least recently used
+    assert (cache.get("ns", "a"), cache.get("ns", "b"), cache.get("ns", "c")) == (1, None, 3)
+    cache.set("other", "x", 9, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("other", "x") is None
+    cache.invalidate("ns")
+    assert cache.get("ns", "a") is None
+
+
+def test_sqlite_cache_shared_single_compute(tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    workers = [SQLiteCache(path) for _ in range(3)]  # separate owners, like separate processes
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"total": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda c=c: results.append(c.get_or_compute("analytics/legacy", "k", slow)))
+        for c in workers for _ in range(2)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"total": 42}] * 6
+
+    workers[0].invalidate("analytics/legacy")
+    assert workers[2].get("analytics/legacy", "k") is None
+    assert workers[1].generation("analytics/legacy") == 1
+
+
+def test_analytics_results_cached_until_write(api, db, monkeypatch) -> None:
+    monkeypatch.setattr(analytics, "ANALYTICS_CHANGES_POLL_SECONDS", 3600)
+    monkeypatch.setattr(analytics, "_next_poll", 0.0)
+    db.add(SaleItem(tenant_id="legacy", name="IPA", qty=5, sold_on=date(2024, 5, 1)))
+    db.commit()
+    first = api.get("/api/analytics/top-items").json()
+    assert first[0]["units_sold"] == 5
+
+    # a write that bypasses the ORM is picked up from the change log on the next poll
+    db.execute(SaleItem.__table__.update().values(qty=7))
+    db.commit()
+    assert api.get("/api/analytics/top-items").json() == first
+    monkeypatch.setattr(analytics, "_next_poll", 0.0)
+    assert api.get("/api/analytics/top-items").json()[0]["units_sold"] == 7
+
+    db.add(SaleItem(tenant_id="legacy", name="IPA", qty=1, sold_on=date(2024, 5, 2)))
+    db.commit()
+    assert api.get("/api/analytics/top-items").json()[0]["units_sold"] == 8
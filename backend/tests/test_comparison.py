@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from app import crud
+from app.db import engine
+from app.models import Handover, RevenueEntry
+from app.queryplan import capture_statements
+
+ANCHOR = date(2024, 3, 13)  # Wednesday, ISO week 2024-W11
+
+
+def _day(d: date, outlet: str, cents: int, covers: int, tenant: str = "legacy"):
+    return [
+        RevenueEntry(tenant_id=tenant, outlet=outlet, category="Food", amount_cents=cents,
+                     occurred_at=datetime.combine(d, datetime.min.time()) + timedelta(hours=19)),
+        Handover(tenant_id=tenant, date=d, outlet=outlet, shift="PM", covers=covers),
+    ]
+
+
+def test_week_over_week_and_year_over_year(api, db) -> None:
+    monday = ANCHOR - timedelta(days=ANCHOR.weekday())
+    db.add_all(_day(monday, "Main", 20_000, 40))                          # this week
+    db.add_all(_day(monday - timedelta(days=1), "Main", 10_000, 25))      # last Sunday: previous week
+    db.add_all(_day(monday - timedelta(weeks=52), "Main", 16_000, 40))    # year ago
+    db.add_all(_day(monday, "Bar", 5_000, 10))
+    db.add_all(_day(monday, "Main", 99_999, 99, tenant="azure"))
+    db.commit()
+
+    out = api.get("/api/analytics/compare",
+                  params={"kind": "week", "prior": 2, "anchor": ANCHOR.isoformat(), "yoy": "true"}).json()
+    assert out["kind"] == "week"
+    assert [p["label"] for p in out["periods"]] == ["2024-W11", "2024-W10", "2024-W09"]
+    assert out["periods"][0]["year_ago"]["label"] == "2023-W11"
+
+    main = next(o for o in out["outlets"] if o["outlet"] == "Main")["series"]
+    assert main[0]["revenue"] == 200.0 and main[0]["covers"] == 40 and main[0]["avg_check"] == 5.0
+    assert main[0]["vs_prev_pct"] == {"revenue": 100.0, "covers": 60.0, "avg_check": 25.0}
+    assert main[0]["vs_year_ago_pct"]["revenue"] == 25.0
+    assert main[1]["vs_prev_pct"]["revenue"] is None  # nothing two weeks back
+    assert "vs_prev_pct" not in main[2]
+
+    total = out["total"][0]
+    assert (total["revenue"], total["covers"]) == (250.0, 50)
+
+
+def test_one_statement_regardless_of_period_count(api, db) -> None:
+    db.add_all(_day(ANCHOR, "Main", 1_000, 2))
+    db.commit()
+    for prior in (1, 12):
+        with capture_statements(engine) as captured:
+            resp = api.get("/api/analytics/compare", params={"kind": "month", "prior": prior, "yoy": "true",
+                                                             "anchor": ANCHOR.isoformat()})
+        assert resp.status_code == 200
+        assert len(resp.json()["total"]) == prior + 1
+        assert len([s for s in captured if "revenue_entries" in s.sql]) == 1
+
+
+def test_explicit_ranges_and_outlet_filter(api, db) -> None:
+    db.add_all(_day(ANCHOR, "Main", 3_000, 3))
+    db.add_all(_day(ANCHOR, "Bar", 7_000, 7))
+    db.commit()
+    day = ANCHOR.isoformat()
+    out = api.get("/api/analytics/compare",
+                  params=[("period", f"{day}..{day}"), ("period", f"{ANCHOR - timedelta(days=5)}..{day}"),
+                          ("outlet", "Bar")]).json()
+    assert out["kind"] == "custom"
+    assert [o["outlet"] for o in out["outlets"]] == ["Bar"]
+    assert [s["revenue"] for s in out["total"]] == [70.0, 70.0]  # overlapping ranges both see the row
+
+    bad = api.get("/api/analytics/compare", params={"period": "2024-03-10..2024-03-01"})
+    assert bad.status_code == 400
+
+
+def test_crud_kpi_summary_uses_comparison(db) -> None:
+    today = date.today()
+    db.add_all(_day(today, "Main", 30_000, 30))
+    db.add_all(_day(today - timedelta(days=7), "Main", 20_000, 10))
+    db.commit()
+    out = crud.kpi_summary(db, target=500.0, tenant="legacy")
+    assert (out["revenue"], out["covers"], out["avg_check"]) == (300.0, 30, 10.0)
+    assert (out["revenue_vs_prev"], out["revenue_vs_prev_pct"], out["target_gap"]) == (100.0, 50.0, 200.0)
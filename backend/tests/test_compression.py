@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+from app.models import SaleItem
+
+
+def test_negotiate() -> None:
+    assert negotiate(None) is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("deflate, gzip;q=0.5") == "gzip"
+    assert negotiate("*") == next(iter(compression.CODECS))
+
+
+def test_large_json_compressed_small_left_alone(api, db) -> None:
+    for i in range(120):
+        db.add(SaleItem(tenant_id="legacy", name="Latte", qty=1, sold_on=date(2024, 1, 1) + timedelta(days=i)))
+    db.commit()
+
+    res = api.get("/api/analytics/revenue-trend", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in res.headers["vary"]
+    assert len(res.json()) == 120
+
+    assert "content-encoding" not in api.get("/healthz", headers={"Accept-Encoding": "gzip"}).headers
+    plain = api.get("/api/analytics/revenue-trend", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.json() == res.json()
+
+
+def test_cached_analytics_compressed_once(api, db, monkeypatch) -> None:
+    for i in range(60):
+        db.add(SaleItem(tenant_id="legacy", name=f"Item {i}", qty=i, sold_on=date(2024, 1, 1) + timedelta(days=i)))
+    db.commit()
+    calls = []
+    real = compression.gzip.compress
+    monkeypatch.setattr(compression.gzip, "compress", lambda data, **kw: calls.append(1) or real(data, **kw))
+
+    bodies = [api.get("/api/analytics/revenue-trend", headers={"Accept-Encoding": "gzip"}).json() for _ in range(3)]
+    assert bodies[0] == bodies[2]
+    assert len(calls) == 1
+
+
+def test_streaming_body_compressed_per_chunk() -> None:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=10)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" for i in range(200)), media_type="text/plain")
+
+    res = TestClient(app).get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert res.headers["content-encoding"] == "gzip"
+    assert "content-length" not in res.headers
+    assert res.text.splitlines()[-1] == "line 199"
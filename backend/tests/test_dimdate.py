@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from app import crud, dimdate, queryplan
+from app.db import engine
+from app.models import DimDate, Handover, RevenueEntry, SaleItem
+
+
+def test_calendar_attributes() -> None:
+    r = {row["date"]: row for row in dimdate.rows(date(2024, 3, 28), date(2025, 1, 1))}
+    assert r[date(2024, 3, 29)]["holiday_name"] == "Good Friday"
+    assert r[date(2024, 4, 1)]["holiday_name"] == "Easter Monday"
+    assert r[date(2024, 12, 30)]["iso_week_label"] == "2025-W01"
+    assert r[date(2024, 12, 30)]["week_start"] == date(2024, 12, 30)
+    assert r[date(2024, 3, 30)]["is_weekend"] and not r[date(2024, 3, 30)]["is_holiday"]
+    assert dimdate.fiscal(date(2024, 4, 1), start_month=4) == (2025, 1)
+    assert dimdate.fiscal(date(2025, 3, 31), start_month=4) == (2025, 12)
+    assert dimdate.fiscal(date(2024, 7, 9), start_month=1) == (2024, 7)
+
+
+def test_table_filled_on_create(db) -> None:
+    first = db.get(DimDate, date(2024, 2, 29))
+    assert (first.month_label, first.next_day, first.fiscal_label) == ("2024-02", date(2024, 3, 1), "FY2024-P02")
+    assert dimdate.ensure(db.connection(), date(2024, 1, 1), date(2024, 12, 31)) == 0
+
+
+def test_trend_buckets_join_dim_date(api, db) -> None:
+    for d in (date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)):
+        db.add(SaleItem(tenant_id="legacy", name="Latte", qty=1, sold_on=d))
+    db.commit()
+
+    months = api.get("/api/analytics/revenue-trend", params={"bucket": "month"}).json()
+    assert [m["period"] for m in months] == ["2024-01", "2024-02"]
+    weeks = api.get("/api/analytics/revenue-trend", params={"bucket": "week", "date_from": "2024-01-31"}).json()
+    assert [w["period"] for w in weeks] == ["2024-W05"]
+
+    queryplan.seed_sample_data(db, tenants=("legacy",), days=40)
+    with queryplan.capture_statements(engine) as captured:
+        api.get("/api/analytics/revenue-trend", params={"bucket": "fiscal_period", "date_from": "2024-01-02"})
+    for report in queryplan.check(engine, "trend", captured):
+        assert report.ok, report.plan
+
+
+def test_trend_buckets_keep_days_outside_the_calendar(api, db) -> None:
+    for d in (date(2022, 12, 30), date(2022, 12, 31), date(2023, 1, 2)):  # DIM_DATE_START is 2023-01-01
+        db.add(SaleItem(tenant_id="legacy", name="Latte", qty=1, sold_on=d))
+    db.commit()
+
+    months = api.get("/api/analytics/revenue-trend", params={"bucket": "month"}).json()
+    assert [m["period"] for m in months] == ["2022-12", "2023-01"]
+    weeks = api.get("/api/analytics/revenue-trend", params={"bucket": "week"}).json()
+    assert [w["period"] for w in weeks] == ["2022-W52", "2023-W01"]
+    assert dimdate.label("fiscal_period", date(2022, 12, 31)) == "FY2022-P12"
+
+
+def test_weekly_revenue_buckets_by_iso_week(db) -> None:
+    monday = date.today() - timedelta(days=date.today().weekday())
+    db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=1250,
+                        occurred_at=datetime.combine(monday, datetime.min.time()) + timedelta(hours=20)))
+    db.add(Handover(tenant_id="legacy", date=monday, outlet="Main", shift="PM", covers=30))
+    db.commit()
+    label = "{}-W{:02d}".format(*monday.isocalendar()[:2])
+    assert crud.weekly_revenue(db, 2, tenant="legacy") == [{"week": label, "revenue": 12.5, "covers": 30}]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import forecast
+from app.models import Handover, RevenueEntry
+
+TODAY = date(2024, 3, 4)  # a Monday
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    forecast.clear_cache()
+    yield
+    forecast.clear_cache()
+
+
+def _seed(db, days: int, start: date = TODAY - timedelta(days=28)) -> None:
+    for i in range(days):
+        d = start + timedelta(days=i)
+        weekend = d.weekday() >= 5
+        for outlet, base in (("Main", 100), ("Bar", 40)):
+            db.add(Handover(tenant_id="legacy", date=d, outlet=outlet, shift="PM", covers=base * (2 if weekend else 1)))
+            db.add(RevenueEntry(tenant_id="legacy", outlet=outlet, category="Food", amount_cents=base * 100,
+                                occurred_at=datetime.combine(d, datetime.min.time()) + timedelta(hours=19)))
+    db.commit()
+
+
+def test_forecast_models_per_outlet(db) -> None:
+    _seed(db, 28)
+    out = forecast.forecast(db, "legacy", "covers", horizon=7, today=TODAY)
+    assert out["dates"][0] == str(TODAY)
+    main = next(o for o in out["outlets"] if o["outlet"] == "Main")
+    # Mon..Sun: weekends doubled, which seasonal-naive and day-of-week both capture
+    assert main["seasonal_naive"] == [100, 100, 100, 100, 100, 200, 200]
+    assert main["day_of_week_mean"] == main["seasonal_naive"]
+    assert 100 <= main["exp_smoothing"][0] <= 200
+
+    revenue = forecast.forecast(db, "legacy", "revenue", today=TODAY)
+    bar = next(o for o in revenue["outlets"] if o["outlet"] == "Bar")
+    assert bar["exp_smoothing"][0] == pytest.approx(40.0)
+
+
+def test_incremental_refit_matches_full_fit(db) -> None:
+    _seed(db, 35)
+    forecast.fit(db, "legacy", "covers", today=TODAY)
+    incremental = forecast.fit(db, "legacy", "covers", today=TODAY + timedelta(days=7))
+    assert incremental.last_day == TODAY + timedelta(days=6)
+
+    forecast.clear_cache()
+    full = forecast.fit(db, "legacy", "covers", today=TODAY + timedelta(days=7))
+    assert np.allclose(incremental.levels, full.levels)
+    assert np.allclose(incremental.sse, full.sse)
+    assert np.array_equal(incremental.dow_sums, full.dow_sums)
+
+
+def test_forecast_endpoint_requires_tenant(api) -> None:
+    assert api.get("/api/analytics/forecast").json()["outlets"] == []
+    del api.headers["X-Tenant"]
+    assert api.get("/api/analytics/forecast").status_code == 422
+
+
+def test_late_entries_for_folded_days_are_refolded(db) -> None:
+    _seed(db, 35)
+    forecast.fit(db, "legacy", "covers", today=TODAY)
+
+    # recorded after the fit: one day inside the refold window, one long before it
+    db.add(Handover(tenant_id="legacy", date=TODAY - timedelta(days=2), outlet="Main", shift="AM", covers=50))
+    db.commit()
+    refolded = forecast.fit(db, "legacy", "covers", today=TODAY)
+    db.add(Handover(tenant_id="legacy", date=TODAY - timedelta(days=20), outlet="Bar", shift="AM", covers=30))
+    db.commit()
+    refitted = forecast.fit(db, "legacy", "covers", today=TODAY)
+    assert refolded.dow_sums[refolded.outlets.index("Main"), (TODAY - timedelta(days=2)).weekday()] == 4 * 200 + 50
+
+    forecast.clear_cache()
+    full = forecast.fit(db, "legacy", "covers", today=TODAY)
+    assert np.allclose(refitted.levels, full.levels)
+    assert np.allclose(refitted.sse, full.sse)
+    assert np.array_equal(refitted.dow_sums, full.dow_sums)
+
+
+def test_revenue_history_outside_the_calendar_is_kept(db) -> None:
+    before = date(2023, 1, 1)  # DIM_DATE_START in the tests
+    _seed(db, 14, start=before - timedelta(days=7))
+    points = forecast._daily(db, "legacy", "revenue", None, before + timedelta(days=6))
+    assert len(points) == 28 and points[("Main", date(2022, 12, 25))] == 100.0
+    assert forecast._daily(db, "legacy", "revenue", date(2022, 12, 30), date(2022, 12, 31)) == {
+        ("Main", date(2022, 12, 31)): 100.0, ("Bar", date(2022, 12, 31)): 40.0,
+    }
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+
+def test_batch_create_reports_per_item(api) -> None:
+    body = {
+        "items": [
+            {"outlet": "Main", "severity": "high", "title": "Freezer alarm"},
+            {"outlet": "Main", "severity": "urgent", "title": "Bad severity"},
+            {"outlet": "Bar", "title": "Ice machine", "tenant_id": "azure"},
+            {"outlet": "Bar", "title": "Keg empty"},
+        ]
+    }
+    res = api.post("/api/incidents/batch", json=body)
+    assert res.status_code == 200
+    out = res.json()
+    assert (out["succeeded"], out["failed"]) == (2, 2)
+    ok = [r for r in out["results"] if r["ok"]]
+    assert [r["index"] for r in ok] == [0, 3]
+    assert ok[0]["id"] < ok[1]["id"]
+    assert out["results"][1]["error"].startswith("severity")
+    assert "X-Tenant" in out["results"][2]["error"]
+
+    listed = api.get("/api/incidents").json()
+    assert {i["title"] for i in listed} == {"Freezer alarm", "Keg empty"}
+    assert all(i["status"] == "OPEN" for i in listed)
+
+
+def test_batch_status_update(api) -> None:
+    created = api.post("/api/incidents/batch", json={"items": [
+        {"outlet": "Main", "title": "A"}, {"outlet": "Main", "title": "B"},
+    ]}).json()
+    a, b = (r["id"] for r in created["results"])
+    res = api.patch("/api/incidents/batch/status", json={"items": [
+        {"id": a, "status": "closed"},
+        {"id": b, "status": "open"},
+        {"id": 999_999, "status": "closed"},
+        {"id": a, "status": "archived"},
+    ]}).json()
+    assert [r["ok"] for r in res["results"]] == [True, True, False, False]
+    assert res["results"][2]["error"] == "not found"
+
+    still_open = api.get("/api/incidents").json()
+    assert [i["id"] for i in still_open] == [b]
+    # other tenants cannot touch these rows
+    other = api.patch("/api/incidents/batch/status", headers={"X-Tenant": "azure"},
+                      json={"items": [{"id": b, "status": "closed"}]}).json()
+    assert other["succeeded"] == 0
+
+
+def test_batch_status_update_rejects_conflicting_duplicates(api) -> None:
+    created = api.post("/api/incidents/batch", json={"items": [
+        {"outlet": "Main", "title": "A"}, {"outlet": "Main", "title": "B"},
+    ]}).json()
+    a, b = (r["id"] for r in created["results"])
+    res = api.patch("/api/incidents/batch/status", json={"items": [
+        {"id": a, "status": "closed"},
+        {"id": b, "status": "closed"},
+        {"id": a, "status": "open"},
+        {"id": b, "status": "closed"},
+    ]}).json()
+    assert [(r["ok"], r["error"]) for r in res["results"]] == [
+        (False, "conflicting status for id"), (True, None), (False, "conflicting status for id"), (True, None),
+    ]
+    assert [i["id"] for i in api.get("/api/incidents").json()] == [a]
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from datetime import date
+
+from app.modelmeta import META, encoder, row_dicts
+from app.models import GuestNote, Handover, Incident, SaleItem
+from app.readmodels import GuestNoteRow, HandoverRow, projection
+
+
+def test_registry_resolved_once() -> None:
+    assert META[SaleItem].amount is META[SaleItem].amount
+    assert str(META[SaleItem].amount.compile(compile_kwargs={"literal_binds": True})) == "0.0"  # no price column yet
+    assert META[Handover].amount is None
+    assert META[Incident].row_type._fields == tuple(Incident.__table__.columns.keys())
+
+
+def test_list_statement_built_once_per_projection(api, db) -> None:
+    narrow = projection(HandoverRow, "covers,date")
+    assert META[Handover].list_statement(narrow) is META[Handover].list_statement(narrow)
+    assert META[Handover].list_statement() is not META[Handover].list_statement(narrow)
+
+    for d, covers in ((date(2024, 1, 1), 10), (date(2024, 1, 3), 30), (date(2024, 1, 2), 20)):
+        db.add(Handover(tenant_id="legacy", date=d, outlet="Main", shift="AM", covers=covers))
+    db.add(Handover(tenant_id="azure", date=date(2024, 1, 4), outlet="Main", shift="AM", covers=99))
+    db.commit()
+    rows = db.execute(META[Handover].list_statement(narrow), {"tenant": "legacy", "limit": 2, "offset": 0})
+    assert row_dicts(narrow, rows) == [{"date": date(2024, 1, 3), "covers": 30}, {"date": date(2024, 1, 2), "covers": 20}]
+    assert api.get("/api/handover", params={"fields": "covers", "limit": 5}).json() == [
+        {"covers": 30}, {"covers": 20}, {"covers": 10},
+    ]
+
+
+def test_encoder_handles_orm_objects_and_rows() -> None:
+    note = GuestNote(id=1, tenant_id="legacy", guest_name="Ada", room="12", note="late checkout")
+    encode = encoder(GuestNoteRow, ("tenant_id",))
+    assert encode is encoder(GuestNoteRow, ("tenant_id",))
+    assert encode(note) == {"id": 1, "guest_name": "Ada", "room": "12", "note": "late checkout", "created_at": None}
+    row = GuestNoteRow(1, "legacy", "Ada", "12", "late checkout", None)
+    assert encode(row) == encode(note)
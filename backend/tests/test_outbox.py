@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+
+from app import outbox
+from app.cache import get_cache
+from app.models import ChangeLog, Handover, SaleItem
+
+
+def test_orm_and_core_writes_are_captured(api, db) -> None:
+    h = Handover(tenant_id="legacy", date=date(2024, 3, 1), outlet="Main", shift="AM", covers=10)
+    db.add(h)
+    db.commit()
+    h.covers = 12
+    db.commit()
+    db.delete(h)
+    db.commit()
+
+    db.add(SaleItem(tenant_id="legacy", name="Tea", qty=1, sold_on=date(2024, 3, 1)))
+    db.rollback()  # never committed, never logged
+
+    api.post("/api/incidents/batch", json={"items": [{"outlet": "Main", "title": "A"}, {"outlet": "Bar", "title": "B"}]})
+
+    changes = outbox.read_changes(db)
+    assert [(c.table, c.op) for c in changes] == [
+        ("handovers", "I"), ("handovers", "U"), ("handovers", "D"), ("incidents", "I"), ("incidents", "I"),
+    ]
+    update = changes[1]
+    assert (update.old["covers"], update.new["covers"]) == (10, 12)
+    assert changes[2].old["id"] == changes[0].row_id and changes[2].new is None
+    assert changes[3].new["status"] == "OPEN"
+
+
+def test_consume_advances_checkpoint_atomically(db) -> None:
+    for qty in (1, 2, 3):
+        db.add(SaleItem(tenant_id="legacy", name="Tea", qty=qty, sold_on=date(2024, 3, 1)))
+    db.commit()
+
+    seen = []
+    with pytest.raises(RuntimeError):
+        outbox.consume(db, "units", lambda batch: (_ for _ in ()).throw(RuntimeError("boom")), limit=2)
+    assert outbox.get_checkpoint(db, "units") == 0
+
+    assert outbox.consume(db, "units", lambda batch: seen.extend(c.new["qty"] for c in batch), limit=2) == 2
+    assert outbox.consume(db, "units", lambda batch: seen.extend(c.new["qty"] for c in batch), limit=2) == 1
+    assert outbox.consume(db, "units", lambda batch: seen.extend(c.new["qty"] for c in batch), limit=2) == 0
+    assert seen == [1, 2, 3]
+
+
+def test_changes_api_pages_from_checkpoint(api, db, monkeypatch) -> None:
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    api.headers["X-Admin-Token"] = "s3cret"
+    for d in (1, 2, 3):
+        db.add(Handover(tenant_id="legacy" if d < 3 else "azure", date=date(2024, 3, d), outlet="Main", shift="AM", covers=d))
+    db.commit()
+
+    first = api.get("/api/changes", params={"consumer": "rollup", "limit": 2}).json()
+    assert len(first["changes"]) == 2 and first["has_more"]
+    ack = api.post("/api/changes/checkpoint", json={"consumer": "rollup", "position": first["next"]}).json()
+    assert ack["position"] == first["next"]
+    assert api.post("/api/changes/checkpoint", json={"consumer": "rollup", "position": 0}).json()["position"] == first["next"]
+
+    rest = api.get("/api/changes", params={"consumer": "rollup"}).json()
+    assert [c["new"]["covers"] for c in rest["changes"]] == [3] and not rest["has_more"]
+    assert api.get("/api/changes", params={"tenant": "azure"}).json()["changes"][0]["tenant_id"] == "azure"
+    assert api.get("/api/changes/consumers").json()[0]["consumer"] == "rollup"
+
+
+def test_migrations_capture_the_columns_of_their_revision(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "migrated.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    cfg = Config()
+    cfg.set_main_option("script_location", str(Path(__file__).resolve().parents[1] / "alembic"))
+
+    def captured_incident(title: str) -> dict:
+        with sqlite3.connect(path) as conn:
+            conn.execute("INSERT INTO incidents (tenant_id, outlet, severity, title, status) "
+                         "VALUES ('legacy', 'Main', 'Low', ?, 'OPEN')", (title,))
+            (new,) = conn.execute("SELECT new_data FROM change_log ORDER BY id DESC LIMIT 1").fetchone()
+        return json.loads(new)
+
+    command.upgrade(cfg, "g7d4_dim_date")
+    assert "status_changed_at" not in captured_incident("before")
+    command.upgrade(cfg, "head")
+    assert "status_changed_at" in captured_incident("after")
+    command.downgrade(cfg, "g7d4_dim_date")
+    assert "resolved_at" not in captured_incident("downgraded")
+    with sqlite3.connect(path) as conn:  # the rebuilt table got its search triggers back
+        assert conn.execute("SELECT rowid FROM incidents_fts WHERE incidents_fts MATCH 'downgraded'").fetchall()
+
+
+def test_migrations_round_trip(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "round_trip.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+    cfg = Config()
+    cfg.set_main_option("script_location", str(Path(__file__).resolve().parents[1] / "alembic"))
+
+    command.upgrade(cfg, "head")
+    command.downgrade(cfg, "base")
+    with sqlite3.connect(path) as conn:
+        left = conn.execute("SELECT name FROM sqlite_master WHERE tbl_name NOT IN ('alembic_version', 'sqlite_sequence')")
+        assert left.fetchall() == []
+    command.upgrade(cfg, "head")
+
+
+def test_prune_keeps_unread_recent_and_newest_changes(db) -> None:
+    for qty in range(5):
+        db.add(SaleItem(tenant_id="legacy", name="Tea", qty=qty, sold_on=date(2024, 3, 1)))
+        db.commit()
+    ids = [c.id for c in outbox.read_changes(db)]
+    db.execute(update(ChangeLog).where(ChangeLog.id != ids[1]).values(created_at=datetime(2020, 1, 1)))
+    outbox.advance_checkpoint(db, "laggard", ids[2])
+    db.commit()
+
+    assert outbox.prune(db) == 2  # not ids[1] (recent) nor ids[3:] (unread by "laggard")
+    assert [c.id for c in outbox.read_changes(db)] == [ids[1], ids[3], ids[4]]
+    db.delete(db.get(outbox.ChangeConsumer, "laggard"))
+    db.commit()
+    assert outbox.prune(db) == 1  # everything old except the newest, whose id SQLite would reuse
+    assert [c.id for c in outbox.read_changes(db)] == [ids[1], ids[4]]
+
+
+def test_follow_starts_over_when_pruned_past_its_position(db) -> None:
+    seen = []
+    prefix = outbox.follow(db, "units", ("sale_items",), lambda changes, p: seen.extend(changes))
+    get_cache().set(f"{prefix}/x", "k", 1)
+    for qty in range(3):
+        db.add(SaleItem(tenant_id="legacy", name="Tea", qty=qty, sold_on=date(2024, 3, 1)))
+        db.commit()
+    outbox.prune(db, retention_days=-1)
+
+    assert outbox.follow(db, "units", ("sale_items",), lambda changes, p: seen.extend(changes)) != prefix
+    assert seen == [] and get_cache().get(f"{prefix}/x", "k") is None
+
+
+def test_postgres_reads_stop_before_open_writers() -> None:
+    sql = str(outbox._horizon(2).compile(dialect=postgresql.dialect()))
+    assert "clock_timestamp()" in sql and "pg_stat_activity" in sql and "backend_xid IS NOT NULL" in sql
+    assert "clock_timestamp()" in outbox._PG_FUNCTION
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from app import queryplan
+from app.db import engine
+
+
+def test_hot_queries_use_indexes(api, db) -> None:
+    queryplan.seed_sample_data(db)
+    reports = queryplan.check_hot_queries(api, engine)
+    assert {r.name for r in reports} == {name for name, _, _ in queryplan.HOT_QUERIES}
+    queryplan.assert_no_full_scans(reports)
+
+
+def test_untenanted_analytics_is_flagged(api, db) -> None:
+    queryplan.seed_sample_data(db)
+    del api.headers["X-Tenant"]
+    with queryplan.capture_statements(engine) as captured:
+        api.get("/api/analytics/top-items")
+    (report,) = queryplan.check(engine, "top-items", captured)
+    assert report.full_scans and not report.ok
+
+
+def test_suggest_covering_index() -> None:
+    sql = (
+        "SELECT sale_items.name, sum(sale_items.qty) FROM sale_items "
+        "WHERE sale_items.tenant_id = ? AND sale_items.sold_on >= ? GROUP BY sale_items.name"
+    )
+    assert queryplan.suggest_index(sql) == (
+        "CREATE INDEX ix_sale_items_tenant_id_sold_on_name_qty ON sale_items (tenant_id, sold_on, name, qty)"
+    )
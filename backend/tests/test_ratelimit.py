@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app import ratelimit
+from app.ratelimit import Budget, Limiter, limiter
+
+
+def test_list_budget_returns_429_with_retry_after(api, monkeypatch) -> None:
+    monkeypatch.setitem(ratelimit.BUDGETS, "list", Budget(rate=0.5, burst=2))
+    limiter.reset()
+
+    codes = [api.get("/api/incidents").status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+    shed = api.get("/api/incidents")
+    assert int(shed.headers["Retry-After"]) >= 1
+
+    # another tenant has its own bucket, analytics has its own budget
+    assert api.get("/api/incidents", headers={"X-Tenant": "azure"}).status_code == 200
+    assert api.get("/api/analytics/top-items").status_code == 200
+
+    assert api.get("/api/ops/limits").status_code == 403
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    stats = api.get("/api/ops/limits", headers={"X-Admin-Token": "s3cret"}).json()
+    assert stats["shed_total"] == 2
+    assert {"tenant": "legacy", "budget": "list", "reason": "rate_limited", "count": 2} in stats["shed"]
+
+
+def test_concurrency_cap_sheds_with_503(monkeypatch) -> None:
+    monkeypatch.setattr(ratelimit, "TENANT_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(ratelimit, "ADMISSION_MAX_QUEUE_MS", 20)
+    lim = Limiter()
+
+    async def scenario():
+        await lim.acquire("legacy", "list")
+        with pytest.raises(HTTPException) as exc:
+            await lim.acquire("legacy", "list")
+        lim.release("legacy")
+        return exc.value
+
+    err = asyncio.run(scenario())
+    assert err.status_code == 503
+    assert err.headers["Retry-After"] == "1"
+    assert lim.stats()["shed"][0]["reason"] == "queue_timeout"
+
+
+def test_sustained_queueing_sheds_before_waiting(monkeypatch) -> None:
+    monkeypatch.setattr(ratelimit, "TENANT_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(ratelimit, "ADMISSION_MAX_QUEUE_MS", 20)
+    lim = Limiter()
+
+    async def scenario():
+        await lim.acquire("legacy", "list")  # holds the only slot
+        reasons = []
+        for _ in range(6):
+            started = time.monotonic()
+            with pytest.raises(HTTPException) as exc:
+                await lim.acquire("legacy", "list")
+            reasons.append((exc.value.detail.split(":")[0], time.monotonic() - started))
+        lim.release("legacy")
+        return reasons
+
+    reasons = asyncio.run(scenario())
+    assert [r for r, _ in reasons[:4]] == ["queue_timeout"] * 4  # average wait climbs towards the timeout
+    assert reasons[4][0] == "overloaded" and reasons[4][1] < 0.01  # rejected without queueing
+    assert {"tenant": "legacy", "budget": "list", "reason": "overloaded", "count": 1} in lim.stats()["shed"]
+    # the average decays while shedding, so the tenant gets to queue again
+    assert reasons[5][0] == "queue_timeout"
+    # another tenant is not affected
+    asyncio.run(lim.acquire("azure", "list"))
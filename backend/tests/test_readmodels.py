@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from datetime import date
+
+from app.models import Handover
+from app.readmodels import HandoverRow, fetch_rows, select_rows
+
+
+def test_read_model_matches_table_columns(db) -> None:
+    db.add(Handover(tenant_id="legacy", date=date(2024, 1, 2), outlet="Main", shift="AM", covers=42))
+    db.commit()
+    db.expunge_all()
+    rows = fetch_rows(db, select_rows(HandoverRow), HandoverRow)
+    assert HandoverRow._fields == tuple(Handover.__table__.columns.keys())
+    assert rows[0].covers == 42 and rows[0].date == date(2024, 1, 2)
+    assert len(db.identity_map) == 0
+
+
+def test_list_endpoints_return_objects(api, db) -> None:
+    for d in (1, 2):
+        db.add(Handover(tenant_id="legacy", date=date(2024, 1, d), outlet="Main", shift="PM", covers=d))
+    db.add(Handover(tenant_id="azure", date=date(2024, 1, 3), outlet="Pool", shift="PM", covers=9))
+    db.commit()
+
+    listed = api.get("/api/handover").json()
+    assert [h["covers"] for h in listed] == [2, 1]
+    assert set(listed[0]) == set(HandoverRow._fields)
+
+    recent = api.get("/api/handovers/recent").json()["items"]
+    assert recent[0] == {"id": listed[0]["id"], "date": "2024-01-02", "outlet": "Main", "shift": "PM", "covers": 2}
+
+
+def test_fields_projection_is_validated_and_index_only(api, db) -> None:
+    from app.db import engine
+    from app.queryplan import capture_statements, check, seed_sample_data
+
+    seed_sample_data(db, tenants=("legacy",), days=30)
+
+    res = api.get("/api/handover", params={"fields": "covers, date,shift,outlet"})
+    assert res.status_code == 200
+    assert list(res.json()[0]) == ["date", "outlet", "shift", "covers"]
+    assert api.get("/api/handover", params={"fields": "date,secret"}).status_code == 400
+
+    for path, fields in (("/api/handover", "date,outlet,shift,covers"), ("/api/incidents", "id,title,status,severity")):
+        with capture_statements(engine) as captured:
+            api.get(path, params={"fields": fields}).raise_for_status()
+        (report,) = check(engine, path, captured)
+        assert report.ok
+        assert any("COVERING INDEX" in line for line in report.plan), report.plan
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from app import reports
+from app.models import Handover, Incident, RevenueEntry, SaleItem
+
+
+def _seed(db) -> None:
+    for d in (1, 15, 31):
+        day = date(2024, 1, d)
+        db.add(Handover(tenant_id="legacy", date=day, outlet="Main", shift="PM", covers=10))
+        db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=2500,
+                            occurred_at=datetime(2024, 1, d, 19)))
+        db.add(SaleItem(tenant_id="legacy", name="Burger", qty=d, sold_on=day))
+    db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=9900,
+                        occurred_at=datetime(2024, 2, 1, 9)))
+    db.add(RevenueEntry(tenant_id="azure", outlet="Pool", category="Bar", amount_cents=700,
+                        occurred_at=datetime(2024, 1, 5, 9)))
+    db.add(Incident(tenant_id="legacy", outlet="Main", severity="HIGH", title="Leak", status="OPEN",
+                    created_at=datetime(2024, 1, 20)))
+    db.commit()
+
+
+def test_last_closed_periods() -> None:
+    today = date(2024, 2, 7)  # a Wednesday
+    assert reports.last_closed("daily", today).label == "2024-02-06"
+    week = reports.last_closed("weekly", today)
+    assert (week.start, week.end, week.label) == (date(2024, 1, 29), date(2024, 2, 4), "2024-W05")
+    month = reports.last_closed("monthly", today)
+    assert (month.start, month.end, month.label) == (date(2024, 1, 1), date(2024, 1, 31), "2024-01")
+
+
+def test_monthly_report_contents(db) -> None:
+    _seed(db)
+    rep = reports.build_report(db, "legacy", reports.Period("monthly", date(2024, 1, 1), date(2024, 1, 31)))
+    assert rep["kpis"]["revenue"] == 75.0
+    assert rep["kpis"]["covers"] == 30
+    assert rep["kpis"]["revenue_per_cover"] == 2.5
+    assert len(rep["trend"]) == 31 and rep["trend"][14] == {"date": "2024-01-15", "revenue": 25.0, "covers": 10}
+    assert rep["top_items"] == [{"name": "Burger", "units_sold": 47}]
+    assert rep["incidents"] == {"total": 1, "by_status": {"OPEN": 1}, "by_severity": {"HIGH": 1}}
+    rows = list(csv.reader(io.StringIO(reports.render_csv(rep))))
+    assert ["kpi", "", "revenue", "75.0"] in rows
+
+
+def test_scheduled_build_and_download(api, db) -> None:
+    _seed(db)
+    built = reports.run_once(date(2024, 2, 7), tenants=["legacy"], workers=2, catchup_days=0)
+    assert sorted(built) == ["legacy/daily/2024-02-06", "legacy/monthly/2024-01", "legacy/weekly/2024-W05"]
+    assert reports.run_once(date(2024, 2, 7), tenants=["legacy"], workers=0, catchup_days=0) == []  # already stored
+
+    listed = api.get("/api/reports").json()["items"]
+    assert {"kind": "monthly", "period": "2024-01", "formats": ["json", "csv"]} in listed
+
+    res = api.get("/api/reports/monthly/2024-01.json")
+    assert res.status_code == 200
+    assert res.json()["kpis"]["revenue"] == 75.0
+    assert api.get("/api/reports/monthly/2024-01.csv").headers["content-type"].startswith("text/csv")
+
+    assert api.get("/api/reports/monthly/2024-01.json", headers={"X-Tenant": "azure"}).status_code == 404
+    assert api.get("/api/reports/monthly/..%2F2024-01.json").status_code == 404
+
+
+def test_missed_periods_are_caught_up(db, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(reports, "REPORTS_DIR", tmp_path)
+    jobs = reports.due(date(2024, 3, 6), tenants=["legacy"], catchup_days=40)
+    labels = {kind: sorted(reports.Period(k, s, e).label for _, k, s, e in jobs if k == kind) for kind in reports.KINDS}
+    assert labels["monthly"] == ["2024-01", "2024-02"]
+    assert labels["weekly"] == [f"2024-W{w:02d}" for w in range(4, 10)]  # W04 ends 2024-01-28
+    assert len(labels["daily"]) == 40 and labels["daily"][0] == "2024-01-26"
+
+    reports.run_once(date(2024, 3, 6), tenants=["legacy"], workers=0, catchup_days=40)
+    assert reports.due(date(2024, 3, 6), tenants=["legacy"], catchup_days=40) == []
+    # periods older than the horizon are left alone
+    assert not reports.artifact_path("legacy", "monthly", "2023-12", "json").exists()
+
+
+def test_late_changes_rebuild_stored_reports(db, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(reports, "REPORTS_DIR", tmp_path)
+    _seed(db)
+    reports.run_once(date(2024, 2, 7), tenants=["legacy"], workers=0, catchup_days=40)
+
+    db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=500,
+                        occurred_at=datetime(2024, 1, 15, 12)))
+    db.commit()
+    built = reports.run_once(date(2024, 2, 7), tenants=["legacy"], workers=0, catchup_days=40)
+    assert sorted(built) == ["legacy/daily/2024-01-15", "legacy/monthly/2024-01", "legacy/weekly/2024-W03"]
+    stored = json.loads(reports.artifact_path("legacy", "monthly", "2024-01", "json").read_text())
+    assert stored["kpis"]["revenue"] == 80.0
+    assert reports.run_once(date(2024, 2, 7), tenants=["legacy"], workers=0, catchup_days=40) == []
+
+
+def test_report_keeps_revenue_outside_the_calendar(db) -> None:
+    db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=1200,
+                        occurred_at=datetime(2022, 12, 31, 21)))  # before DIM_DATE_START
+    db.commit()
+    rep = reports.build_report(db, "legacy", reports.Period("monthly", date(2022, 12, 1), date(2022, 12, 31)))
+    assert rep["kpis"]["revenue"] == 12.0
+    assert rep["trend"][-1] == {"date": "2022-12-31", "revenue": 12.0, "covers": 0}
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+
+def test_guest_notes_roundtrip(api) -> None:
+    assert api.get("/api/guest-notes").json() == {"total": 0, "items": []}
+    created = api.post("/api/guest-notes", json={"guest_name": "Ms. Ode", "room": "204", "note": "Allergic to peanuts"})
+    assert created.status_code == 200
+    body = api.get("/api/guest-notes").json()
+    assert body["total"] == 1
+    assert body["items"][0]["note"] == "Allergic to peanuts"
+    assert api.get("/api/guest-notes", headers={"X-Tenant": "azure"}).json()["total"] == 0
+
+
+def test_search_ranked_scoped_and_synced(api) -> None:
+    api.post("/api/incidents/batch", json={"items": [
+        {"outlet": "Main", "title": "POS terminal froze"},
+        {"outlet": "Main", "title": "POS printer jam, POS restarted"},
+        {"outlet": "Bar", "title": "Glass washer leaking"},
+    ]})
+    api.post("/api/guest-notes", json={"guest_name": "Mr. Kay", "note": "Paid at POS, wants receipt emailed"})
+    api.post("/api/incidents/batch", headers={"X-Tenant": "azure"},
+             json={"items": [{"outlet": "Main", "title": "POS down"}]})
+
+    hits = api.get("/api/search", params={"q": "pos"}).json()
+    assert hits["total"] == 3
+    assert hits["items"][0]["text"] == "POS printer jam, POS restarted"
+    assert {h["kind"] for h in hits["items"]} == {"incidents", "guest_notes"}
+    assert "[POS]" in hits["items"][0]["snippet"]
+
+    page = api.get("/api/search", params={"q": "pos", "kind": "incidents", "limit": 1, "offset": 1}).json()
+    assert page["total"] == 2 and len(page["items"]) == 1
+
+    # prefix match and FTS syntax characters are treated as plain words
+    assert api.get("/api/search", params={"q": "leak"}).json()["total"] == 1
+    assert api.get("/api/search", params={"q": 'glass" (*'}).json()["total"] == 1
+
+
+def test_search_index_follows_deletes(api, db) -> None:
+    from app.models import Incident
+
+    api.post("/api/incidents/batch", json={"items": [{"outlet": "Main", "title": "Broken chair"}]})
+    db.query(Incident).delete()
+    db.commit()
+    assert api.get("/api/search", params={"q": "chair"}).json()["total"] == 0
+
+
+def test_search_falls_back_to_like_without_full_text(api, monkeypatch) -> None:
+    from app import search
+
+    monkeypatch.setattr(search, "_dialect", lambda db: "mysql")
+    api.post("/api/incidents/batch", json={"items": [
+        {"outlet": "Main", "title": "POS terminal froze"},
+        {"outlet": "Main", "title": "Ice_machine down"},
+        {"outlet": "Bar", "title": "Ice machine down"},
+    ]})
+    hits = api.get("/api/search", params={"q": "pos FROZE"}).json()
+    assert [h["text"] for h in hits["items"]] == ["POS terminal froze"] and hits["total"] == 1
+    assert api.get("/api/search", params={"q": "ice_machine"}).json()["total"] == 1  # _ is not a wildcard
+    assert api.get("/api/search", params={"q": "machine"}).json()["total"] == 2
+    assert api.get("/api/search", params={"q": "pos"}, headers={"X-Tenant": "azure"}).json()["total"] == 0
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app import queryplan, ratelimit
+from app.api import analytics
+from app.db import engine
+from app.main import app
+from app.scripts.load_herd import DASHBOARD, herd
+from app.singleflight import Group, flights
+
+CLIENTS = 25
+
+
+def _gate(monkeypatch, name: str, waiters: int) -> None:
+    """Hold the leader's computation until the rest of the herd is waiting on it."""
+    original = getattr(analytics, name)
+
+    def held(*args, **kwargs):
+        deadline = time.monotonic() + 5.0
+        while flights.stats()["waiting"] < waiters and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(analytics, name, held)
+
+
+def test_thundering_herd_runs_each_query_once(api, db, monkeypatch) -> None:
+    queryplan.seed_sample_data(db, tenants=("legacy",))
+    monkeypatch.setitem(ratelimit.BUDGETS, "analytics", ratelimit.Budget(1000, 1000))
+    monkeypatch.setattr(ratelimit, "TENANT_MAX_CONCURRENCY", 1000)
+    _gate(monkeypatch, "kpi_totals", CLIENTS - 1)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://herd", headers={"X-Tenant": "legacy"}) as c:
+            return await herd(c, DASHBOARD[:1], CLIENTS)
+
+    with queryplan.capture_statements(engine) as captured:
+        responses = asyncio.run(run())
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.content for r in responses}) == 1
+    assert len([s for s in captured if "sale_items" in s.sql]) == 1
+
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    stats = api.get("/api/ops/coalescing", headers={"X-Admin-Token": "s3cret"}).json()
+    assert stats["endpoints"]["kpi-summary"] == {
+        "calls": CLIENTS, "executed": 1, "coalesced": CLIENTS - 1, "errors": 0,
+        "coalesced_ratio": round((CLIENTS - 1) / CLIENTS, 3),
+    }
+    assert (stats["in_flight"], stats["waiting"]) == (0, 0)
+
+
+def test_leader_error_is_shared_and_not_cached() -> None:
+    group = Group()
+    release = threading.Event()
+    calls = []
+
+    def boom():
+        calls.append(1)
+        release.wait(5.0)
+        raise ValueError("db down")
+
+    async def run():
+        leader = asyncio.ensure_future(group.run("kpi", "k", boom))
+        await asyncio.sleep(0.05)
+        followers = [asyncio.ensure_future(group.run("kpi", "k", boom)) for _ in range(3)]
+        while group.waiting("k") < 3:
+            await asyncio.sleep(0.005)
+        release.set()
+        return await asyncio.gather(leader, *followers, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results) and len(calls) == 1
+    assert (group.executed["kpi"], group.coalesced["kpi"], group.errors["kpi"]) == (1, 3, 1)
+
+    release.set()
+    with pytest.raises(ValueError):
+        asyncio.run(group.run("kpi", "k", boom))  # the next call starts a new flight
+    assert len(calls) == 2
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from app import sla
+from app.cache import get_cache
+from app.models import Incident
+
+NOW = datetime(2024, 3, 10, 12, 0)
+
+
+def _incident(db, severity: str, created: datetime, resolved: datetime | None = None, tenant: str = "legacy") -> Incident:
+    inc = Incident(tenant_id=tenant, outlet="Main", severity=severity, title="x",
+                   status="CLOSED" if resolved else "OPEN", created_at=created, resolved_at=resolved)
+    db.add(inc)
+    return inc
+
+
+def test_status_transitions_are_stamped(db) -> None:
+    inc = _incident(db, "HIGH", NOW)
+    db.commit()
+    assert inc.resolved_at is None and inc.status_changed_at is not None
+    inc.status = "CLOSED"
+    db.commit()
+    assert inc.resolved_at is not None and inc.status_changed_at == inc.resolved_at
+    inc.status = "OPEN"
+    db.commit()
+    assert inc.resolved_at is None
+
+
+def test_open_aging_histogram_and_breaches(db) -> None:
+    _incident(db, "HIGH", NOW - timedelta(minutes=30))
+    _incident(db, "HIGH", NOW - timedelta(hours=5))       # past the 4h SLA
+    _incident(db, "LOW", NOW - timedelta(days=10))        # past 72h
+    _incident(db, "LOW", NOW - timedelta(days=10), tenant="azure")
+    _incident(db, "LOW", NOW - timedelta(days=2), resolved=NOW - timedelta(days=1))
+    db.commit()
+
+    out = sla.open_aging(db, "legacy", NOW)
+    assert (out["total"], out["breached"]) == (3, 2)
+    high = out["by_severity"]["HIGH"]
+    assert high["histogram"]["<1h"] == 1 and high["histogram"]["4-24h"] == 1
+    assert out["by_severity"]["LOW"]["histogram"]["7d+"] == 1
+
+
+def test_resolution_percentiles(db) -> None:
+    base = datetime(2024, 3, 1, 8, 0)
+    for hours in (1, 2, 3, 4, 10):
+        _incident(db, "HIGH", base, resolved=base + timedelta(hours=hours))
+    _incident(db, "HIGH", base, resolved=datetime(2024, 4, 2))  # outside the range
+    db.commit()
+
+    out = sla.resolution_times(db, "legacy", date(2024, 3, 1), date(2024, 3, 31))
+    high = out["by_severity"]["HIGH"]
+    assert high["count"] == 5
+    assert high["breached"] == 1
+    assert (high["p50_hours"], high["p90_hours"], high["p95_hours"]) == (3.0, 10.0, 10.0)
+    assert high["avg_hours"] == 4.0
+
+
+def test_closed_ranges_are_cached_until_a_past_resolution_changes(api, db) -> None:
+    base = datetime(2024, 3, 1, 8, 0)
+    inc = _incident(db, "HIGH", base, resolved=base + timedelta(hours=2))
+    _incident(db, "HIGH", base, resolved=base + timedelta(hours=3))
+    db.commit()
+
+    params = {"date_from": "2024-03-01", "date_to": "2024-03-31"}
+    first = api.get("/api/analytics/incident-sla", params=params).json()
+    assert first["resolved"]["total"] == 2
+    prefix = f"sla:{get_cache().generation('sla')}"
+    assert get_cache().get(f"{prefix}/legacy", "2024-03-01..2024-03-31") == first["resolved"]
+
+    inc.status = "OPEN"  # reopening clears a past resolved_at
+    db.commit()
+    again = api.get("/api/analytics/incident-sla", params=params).json()
+    assert again["resolved"]["total"] == 1
+    assert again["open"]["total"] == 1
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app import slowlog
+from app.models import RevenueEntry
+from app.scripts import slow_queries
+
+
+@pytest.fixture()
+def slow_log(tmp_path):
+    path = tmp_path / "slow.log"
+    previous = slowlog.SLOW_QUERY_LOG, slowlog.SLOW_QUERY_MS
+    slowlog.configure(path=str(path), threshold_ms=0)  # every statement counts as slow
+    yield path
+    slowlog.configure(*previous)
+
+
+def _records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_records_sql_params_request_and_plan(api, db, slow_log, monkeypatch) -> None:
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_LOG_PARAMS", True)
+    assert api.get("/api/analytics/top-items", params={"limit": 3, "date_from": "2024-01-01"}).status_code == 200
+    rec = next(r for r in _records(slow_log) if "sale_items" in r["sql"])
+    assert rec["tenant"] == "legacy"
+    assert rec["route"] == "GET /api/analytics/top-items"
+    assert "2024-01-01" in rec["params"] and rec["duration_ms"] >= 0
+    assert rec["plan"] and any("sale_items" in line for line in rec["plan"])
+
+
+def test_writes_are_logged_without_plan(db, slow_log) -> None:
+    db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=100))
+    db.commit()
+    rec = next(r for r in _records(slow_log) if r["sql"].startswith("INSERT INTO revenue_entries"))
+    assert rec["route"] is None and "plan" not in rec
+
+
+def test_params_are_redacted_by_default(api, slow_log) -> None:
+    assert api.post("/api/guest-notes", json={"guest_name": "Ms. Ode", "note": "Allergic to peanuts"}).status_code == 200
+    rec = next(r for r in _records(slow_log) if r["sql"].startswith("INSERT INTO guest_notes"))
+    assert "Ms. Ode" not in json.dumps(rec) and "peanuts" not in json.dumps(rec)
+    assert "<str>" in rec["params"]
+
+
+def test_fingerprint_normalizes_literals_and_lists() -> None:
+    a = slowlog.fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10")
+    b = slowlog.fingerprint("select *  from t where id in (?) and name = 'it''s'\n limit 5")
+    assert a == b == "select * from t where id in (...) and name = ? limit ?"
+    arms = "(SELECT ? AS idx, ? AS start UNION ALL SELECT ? AS idx, ? AS start UNION ALL SELECT ? AS idx, ? AS start)"
+    assert slowlog.fingerprint(arms) == "(select ? as idx, ? as start union all ...)"
+    assert slowlog.fingerprint("SELECT %(p1)s, $2, :name, x::date") == "select ?, ?, ?, x::date"
+
+
+def test_summary_cli_groups_by_fingerprint(tmp_path, capsys) -> None:
+    log = tmp_path / "slow.log"
+    rows = [
+        {"ts": "2024-05-01T08:00:00Z", "duration_ms": ms, "tenant": "legacy", "route": "GET /api/x",
+         "sql": f"SELECT * FROM t WHERE id = {i}", "params": []}
+        for i, ms in enumerate([10.0] * 19 + [500.0])
+    ] + [{"ts": "2024-05-01T08:00:00Z", "duration_ms": 900.0, "tenant": "azure", "route": "GET /api/y",
+          "sql": "SELECT count(*) FROM u", "params": [], "error": "QueryTimeout: statement exceeded 15s"}]
+    log.write_text("\n".join(json.dumps(r) for r in rows) + "\n{truncated", encoding="utf-8")
+
+    stats = slowlog.summarize(slowlog.read_log([log]))
+    assert [(s.count, s.total_ms, s.p95_ms) for s in stats] == [(1, 900.0, 900.0), (20, 690.0, 10.0)]
+    assert stats[0].errors == 1
+    assert slowlog.summarize(slowlog.read_log([log]), sort="count")[0].fingerprint == "select * from t where id = ?"
+
+    assert slow_queries.main([str(log), "--json", "--tenant", "legacy"]) == 0
+    (summary,) = json.loads(capsys.readouterr().out)
+    assert (summary["count"], summary["max_ms"], summary["routes"]) == (20, 500.0, {"GET /api/x": 20})
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+
+pytest.importorskip("pyarrow")
+
+from app import snapshot
+from app.db import Base, engine
+from app.models import GuestNote, Handover, HandoverTopSale, Incident, RevenueEntry
+
+
+def _seed(db) -> None:
+    for d in (1, 2):
+        h = Handover(tenant_id="legacy", date=date(2024, 5, d), outlet="Main", shift="PM", covers=10 * d)
+        h.top_sales = ["Burger", "Cola"]
+        db.add(h)
+    db.add(Incident(tenant_id="legacy", outlet="Main", severity="HIGH", title="Leak", status="OPEN",
+                    created_at=datetime(2024, 5, 1, 9, 30)))
+    db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=2500,
+                        occurred_at=datetime(2024, 5, 1, 19)))
+    db.add(GuestNote(tenant_id="legacy", guest_name="Ada", room="12", note="Allergic to nuts"))
+    db.add(Handover(tenant_id="azure", date=date(2024, 5, 1), outlet="Pool", shift="AM", covers=3))
+    db.commit()
+
+
+def test_dump_and_restore_into_a_fresh_database(db, tmp_path) -> None:
+    _seed(db)
+    manifest = snapshot.dump(engine, "legacy", tmp_path / "snap")
+    assert manifest["tables"]["handovers"]["rows"] == 2
+    assert manifest["tables"]["handover_top_sales"]["rows"] == 4
+
+    target = create_engine(f"sqlite:///{tmp_path}/clone.db")
+    Base.metadata.create_all(bind=target)
+    counts = snapshot.restore(target, tmp_path / "snap", batch_rows=3)
+    assert counts["handovers"] == 2 and counts["guest_notes"] == 1
+
+    with target.connect() as conn:
+        src = db.execute(select(Handover.id, Handover.date, Handover.covers).where(Handover.tenant_id == "legacy")).all()
+        assert conn.execute(select(Handover.id, Handover.date, Handover.covers)).all() == src
+        assert conn.execute(select(Incident.created_at)).scalar() == datetime(2024, 5, 1, 9, 30)
+        assert conn.execute(select(RevenueEntry.amount_cents)).scalar() == 2500
+    Base.metadata.drop_all(bind=target)
+
+
+def test_restore_as_another_tenant_shifts_colliding_ids(db, tmp_path) -> None:
+    _seed(db)
+    snapshot.dump(engine, "legacy", tmp_path / "snap")
+
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.restore(engine, tmp_path / "snap", tenant="azure")  # azure already has a handover
+    snapshot.restore(engine, tmp_path / "snap", tenant="azure", replace=True)
+
+    clones = db.execute(select(Handover).where(Handover.tenant_id == "azure").order_by(Handover.date)).scalars().all()
+    assert [h.covers for h in clones] == [10, 20]
+    assert [h.top_sales for h in clones] == [["Burger", "Cola"], ["Burger", "Cola"]]
+    originals = db.execute(select(Handover.id).where(Handover.tenant_id == "legacy")).scalars().all()
+    assert not set(originals) & {h.id for h in clones}
+    assert db.execute(select(HandoverTopSale.tenant_id).where(HandoverTopSale.handover_id == clones[0].id)).scalars().all() == ["azure", "azure"]
+
+
+def test_restore_needs_a_complete_snapshot(db, tmp_path) -> None:
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.restore(engine, tmp_path)
+
+
+def test_restore_drops_the_tenants_cached_results(api, db, tmp_path, monkeypatch) -> None:
+    from app import forecast
+    from app.api import analytics
+
+    monkeypatch.setattr(analytics, "ANALYTICS_CHANGES_POLL_SECONDS", 3600)
+    monkeypatch.setattr(analytics, "_next_poll", 0.0)
+    _seed(db)
+    snapshot.dump(engine, "legacy", tmp_path / "snap")
+    azure = {"X-Tenant": "azure"}
+    assert api.get("/api/analytics/handover-top-sales", headers=azure).json() == []
+    forecast._cache[("azure", "covers")] = forecast._cache[("legacy", "covers")] = object()
+
+    snapshot.restore(engine, tmp_path / "snap", tenant="azure", replace=True)
+    top = api.get("/api/analytics/handover-top-sales", headers=azure).json()
+    assert {t["item"] for t in top} == {"Burger", "Cola"}
+    assert list(forecast._cache) == [("legacy", "covers")]
+    forecast.clear_cache()
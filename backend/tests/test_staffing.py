@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from app import cache
+from app.db import engine
+from app.models import Handover
+from app.queryplan import capture_statements
+
+
+def _last_monday() -> date:
+    today = date.today()
+    return today - timedelta(days=today.weekday()) - timedelta(weeks=1)
+
+
+def test_heatmap_rolling_and_delta(api, db) -> None:
+    monday = _last_monday()
+    for weeks_back, covers in ((3, 10), (2, 20), (1, 30), (0, 60)):
+        d = monday - timedelta(weeks=weeks_back)
+        db.add(Handover(tenant_id="legacy", date=d, outlet="Main", shift="AM", covers=covers))
+        db.add(Handover(tenant_id="legacy", date=d + timedelta(days=4), outlet="Main", shift="PM", covers=5))
+    db.add(Handover(tenant_id="azure", date=monday, outlet="Main", shift="AM", covers=999))
+    db.commit()
+
+    out = api.get("/api/analytics/staffing", params={"weeks": 3}).json()
+    assert out["from"] == (monday - timedelta(weeks=2)).isoformat()
+    cell = next(c for c in out["heatmap"] if c["shift"] == "AM")
+    assert (cell["weekday"], cell["avg_covers"], cell["days"]) == ("Mon", 36.67, 3)
+    latest = [r for r in out["series"] if r["shift"] == "AM"][-1]
+    assert latest["covers"] == 60
+    assert latest["rolling_avg"] == 30.0  # (10 + 20 + 30 + 60) / 4, window reaches before the range
+    assert (latest["delta"], latest["delta_pct"]) == (30, 100.0)
+
+
+def test_closed_weeks_cached_until_edited(api, db) -> None:
+    monday = _last_monday()
+    h = Handover(tenant_id="legacy", date=monday - timedelta(weeks=1), outlet="Main", shift="AM", covers=10)
+    db.add(h)
+    db.commit()
+
+    first = api.get("/api/analytics/staffing", params={"weeks": 4}).json()
+    with capture_statements(engine) as captured:
+        assert api.get("/api/analytics/staffing", params={"weeks": 4}).json() == first
+    assert not any("handovers" in s.sql and "change_log" not in s.sql for s in captured)
+
+    h.covers = 15  # edit a closed week: only its weeks are recomputed
+    db.commit()
+    series = api.get("/api/analytics/staffing", params={"weeks": 4}).json()["series"]
+    assert [r["covers"] for r in series] == [15]
+
+
+def test_edits_while_no_worker_is_running_invalidate_a_persistent_cache(api, db, tmp_path, monkeypatch) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    monkeypatch.setattr(cache, "_cache", cache.SQLiteCache(path))
+    h = Handover(tenant_id="legacy", date=_last_monday() - timedelta(weeks=1), outlet="Main", shift="AM", covers=10)
+    db.add(h)
+    db.commit()
+    assert [r["covers"] for r in api.get("/api/analytics/staffing", params={"weeks": 4}).json()["series"]] == [10]
+
+    h.covers = 15  # written while the cache's workers are down
+    db.commit()
+    monkeypatch.setattr(cache, "_cache", cache.SQLiteCache(path))  # a restarted worker: only the file survives
+    assert [r["covers"] for r in api.get("/api/analytics/staffing", params={"weeks": 4}).json()["series"]] == [15]
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, text
+
+from app import timeouts
+from app.db import engine
+from app.models import SaleItem
+
+SLOW = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) SELECT count(*) FROM c")
+
+
+def test_sqlite_statement_timeout() -> None:
+    started = time.monotonic()
+    with timeouts.scope(timeouts.QueryBudget(0.1)), engine.connect() as conn:
+        with pytest.raises(timeouts.QueryTimeout):
+            conn.execute(SLOW)
+        assert time.monotonic() - started < 2
+    with engine.connect() as conn:  # no budget outside a request: no limit, connection still usable
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_cancel_interrupts_the_statement_in_flight() -> None:
+    budget = timeouts.QueryBudget(None)
+    errors = []
+
+    def run() -> None:
+        with timeouts.scope(budget), engine.connect() as conn:
+            try:
+                conn.execute(SLOW)
+            except Exception as exc:
+                errors.append(exc)
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    time.sleep(0.1)
+    budget.cancel()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert [type(e) for e in errors] == [timeouts.QueryCancelled]
+
+
+def test_endpoint_statement_timeout_is_a_504(api, db, monkeypatch) -> None:
+    db.execute(insert(SaleItem), [{"tenant_id": "legacy", "name": f"Item {i}", "qty": 1, "sold_on": date(2024, 1, 1)}
+                                  for i in range(3000)])
+    db.commit()
+    monkeypatch.setitem(timeouts.TIMEOUTS, "analytics", 1e-9)
+    r = api.get("/api/analytics/top-items")
+    assert r.status_code == 504
+    assert api.get("/api/handover").status_code != 504  # other routers keep the default
+
+
+def test_client_disconnect_cancels_the_request_budget() -> None:
+    seen = {}
+
+    async def app(scope, receive, send) -> None:
+        budget = timeouts.current()
+        for _ in range(100):
+            if budget.cancelled:
+                break
+            await asyncio.sleep(0.01)
+        seen["cancelled"] = budget.cancelled
+        seen["message"] = await receive()
+
+    async def receive():
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(message) -> None:
+        pass
+
+    middleware = timeouts.CancelOnDisconnectMiddleware(app)
+    asyncio.run(middleware({"type": "http", "method": "GET", "headers": []}, receive, send))
+    assert seen["cancelled"] is True
+    assert seen["message"]["type"] == "http.request"
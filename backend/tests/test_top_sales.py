@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import delete, text
+
+from app import crud
+from app.db import engine
+from app.models import Handover, HandoverTopSale, parse_top_sales
+from app.topsales import backfill_from_legacy, top_sold
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (["Ribeye", "IPA"], ["Ribeye", "IPA"]),
+    ('["Ribeye", "IPA"]', ["Ribeye", "IPA"]),
+    ('"[\\"Ribeye\\", \\"IPA\\"]"', ["Ribeye", "IPA"]),  # stringified JSON
+    ("Ribeye, IPA ,", ["Ribeye", "IPA"]),
+    ("Ribeye", ["Ribeye"]),
+    (None, []),
+])
+def test_parse_top_sales_shapes(raw, expected) -> None:
+    assert parse_top_sales(raw) == expected
+
+
+def test_rows_written_with_handover(api, db) -> None:
+    for i, sales in enumerate(["Ribeye, IPA", '["Ribeye", "Merlot"]', ["Ribeye"]]):
+        db.add(Handover(tenant_id="legacy", date=date(2024, 6, 1 + i), outlet="Main", shift="PM", covers=10, top_sales=sales))
+    db.add(Handover(tenant_id="azure", date=date(2024, 6, 1), outlet="Main", shift="PM", covers=10, top_sales="IPA"))
+    db.commit()
+
+    assert crud.top_items(db, 2, tenant="legacy") == [{"item": "Ribeye", "count": 3}, {"item": "IPA", "count": 1}]
+    ranged = api.get("/api/analytics/handover-top-sales", params={"date_from": "2024-06-02"}).json()
+    assert ranged == [{"item": "Ribeye", "count": 2}, {"item": "Merlot", "count": 1}]
+
+    h = db.query(Handover).filter_by(tenant_id="legacy", date=date(2024, 6, 1)).one()
+    h.date = date(2024, 7, 1)
+    db.commit()
+    assert {r.date for r in h.top_sale_rows} == {date(2024, 7, 1)}
+    db.delete(h)
+    db.commit()
+    assert db.query(HandoverTopSale).filter_by(tenant_id="legacy").count() == 3
+
+
+def test_backfill_from_legacy_column(db) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE handovers ADD COLUMN top_sales TEXT"))
+        conn.execute(text(
+            "INSERT INTO handovers (tenant_id, date, outlet, shift, covers, top_sales) VALUES "
+            "('legacy', '2024-01-01', 'Main', 'AM', 5, 'Ribeye, IPA'), "
+            "('legacy', '2024-01-02', 'Main', 'AM', 5, '[\"Ribeye\"]'), "
+            "('legacy', '2024-01-03', 'Main', 'AM', 5, NULL)"
+        ))
+        assert backfill_from_legacy(conn) == 3
+        assert backfill_from_legacy(conn) == 0
+    assert crud.top_items(db, 5)[0] == {"item": "Ribeye", "count": 2}
+
+
+def test_deleting_handover_cascades_in_the_database(db) -> None:
+    db.add(Handover(tenant_id="legacy", date=date(2024, 6, 1), outlet="Main", shift="PM", covers=10, top_sales="Ribeye, IPA"))
+    db.commit()
+    db.expunge_all()
+    db.execute(delete(Handover))  # not through the ORM relationship
+    db.commit()
+    assert db.query(HandoverTopSale).count() == 0
+    assert top_sold(db, "legacy") == []
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from app import warmup
+from app.api import analytics
+from app.models import RevenueEntry, SaleItem
+
+TODAY = date.today()
+
+
+def _seed(db) -> None:
+    for i in range(5):
+        d = TODAY - timedelta(days=i)
+        db.add(SaleItem(tenant_id="legacy", name="Burger", qty=2, sold_on=d))
+        db.add(RevenueEntry(tenant_id="legacy", outlet="Main", category="Food", amount_cents=1000,
+                            occurred_at=datetime.combine(d, datetime.min.time())))
+    db.commit()
+
+
+def test_readyz_is_separate_from_healthz(api) -> None:
+    assert api.get("/readyz").json()["ready"] is True  # WARMUP=off in tests
+    previous = warmup.readiness.state
+    warmup.readiness.state = "warming"
+    try:
+        assert api.get("/readyz").status_code == 503
+        assert api.get("/healthz").status_code == 200
+    finally:
+        warmup.readiness.state = previous
+
+
+def test_warmup_fills_the_dashboard_cache(api, db, monkeypatch) -> None:
+    _seed(db)
+    state = warmup.run(tenants=["legacy", "azure"], today=TODAY)
+    assert state.ready
+    assert sorted(s["step"] for s in state.steps) == ["pages", "tenant:azure", "tenant:legacy"]  # tenants finish in any order
+    assert not any("error" in s for s in state.steps)
+
+    def boom(*args, **kwargs):
+        raise AssertionError("dashboard request missed the warm cache")
+
+    monkeypatch.setattr(analytics, "kpi_totals", boom)
+    monkeypatch.setattr(analytics, "revenue_by_period", boom)
+    monkeypatch.setattr(analytics, "item_totals", boom)
+    params = {"date_from": (TODAY - timedelta(days=29)).isoformat(), "date_to": TODAY.isoformat()}
+    assert api.get("/api/analytics/kpi-summary", params={**params, "target": 10000}).status_code == 200
+    assert len(api.get("/api/analytics/revenue-trend", params=params).json()) == 5
+    assert api.get("/api/analytics/top-items", params={**params, "limit": 5}).json()[0]["name"] == "Burger"